@@ -0,0 +1,573 @@
+"""
+Analítica de la red social.
+Calcula métricas pesadas (PageRank, intermediación aproximada, triángulos,
+clustering y comunidades) sobre una instantánea del grafo en formato CSR, en
+un hilo de fondo que nunca mantiene el lock de peticiones del servidor
+mientras calcula.
+"""
+import heapq
+import os
+import threading
+import time
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Intentar importar NumPy para los cálculos vectorizados
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("Advertencia: NumPy no está instalado. La analítica usará la implementación en Python puro.")
+
+# Segundos mínimos entre dos cálculos de la analítica (con ráfagas de cambios
+# el hilo no recalcula sin pausa compitiendo por el GIL con los pedidos) y
+# espera tras un aviso para juntar los cambios seguidos en un solo cálculo
+ANALYTICS_MIN_INTERVAL = 10.0
+ANALYTICS_QUIET = 0.5
+
+
+class GraphSnapshot:
+    """Instantánea inmutable del grafo con índices enteros en formato CSR"""
+
+    def __init__(self, names, indptr, indices, version):
+        self.names = names          # índice entero -> nombre de usuario
+        self.indptr = indptr        # vecinos de i: indices[indptr[i]:indptr[i+1]]
+        self.indices = indices
+        self.version = version
+        self.index = {name: i for i, name in enumerate(names)}
+
+    @classmethod
+    def from_adjacency(cls, adjacency, version=0):
+        """Construye la instantánea desde {usuario: iterable de amigos}"""
+        names = sorted(adjacency)
+        index = {name: i for i, name in enumerate(names)}
+        indptr = [0]
+        indices = []
+        for name in names:
+            neighbors = sorted(index[friend] for friend in adjacency[name] if friend in index)
+            indices.extend(neighbors)
+            indptr.append(len(indices))
+
+        if NUMPY_AVAILABLE:
+            indptr = np.asarray(indptr, dtype=np.int64)
+            indices = np.asarray(indices, dtype=np.int32)
+        return cls(names, indptr, indices, version)
+
+    @property
+    def num_nodes(self):
+        return len(self.names)
+
+    def degrees(self):
+        """Grado de cada nodo"""
+        if NUMPY_AVAILABLE:
+            return np.diff(self.indptr)
+        return [self.indptr[i + 1] - self.indptr[i] for i in range(self.num_nodes)]
+
+    def neighbor_lists(self):
+        """Listas de vecinos en Python (para los recorridos que no se vectorizan)"""
+        indptr = self.indptr.tolist() if NUMPY_AVAILABLE else self.indptr
+        indices = self.indices.tolist() if NUMPY_AVAILABLE else self.indices
+        return [indices[indptr[i]:indptr[i + 1]] for i in range(self.num_nodes)]
+
+
+def pagerank(snapshot, damping=0.85, tol=1e-6, max_iter=100):
+    """PageRank por iteración de potencias; devuelve una lista de puntajes por índice"""
+    n = snapshot.num_nodes
+    if n == 0:
+        return []
+
+    if NUMPY_AVAILABLE:
+        degrees = snapshot.degrees()
+        sources = np.repeat(np.arange(n), degrees)  # origen de cada arista del CSR
+        dangling = degrees == 0
+        safe_degrees = np.where(dangling, 1, degrees)
+        ranks = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            contrib = np.where(dangling, 0.0, ranks / safe_degrees)
+            new_ranks = np.bincount(snapshot.indices, weights=contrib[sources], minlength=n)
+            dangling_mass = ranks[dangling].sum()
+            new_ranks = (1.0 - damping) / n + damping * (new_ranks + dangling_mass / n)
+            error = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if error < n * tol:
+                break
+        return ranks.tolist()
+
+    # Implementación en Python puro
+    neighbors = snapshot.neighbor_lists()
+    ranks = [1.0 / n] * n
+    for _ in range(max_iter):
+        new_ranks = [0.0] * n
+        dangling_mass = 0.0
+        for i, adj in enumerate(neighbors):
+            if adj:
+                share = ranks[i] / len(adj)
+                for j in adj:
+                    new_ranks[j] += share
+            else:
+                dangling_mass += ranks[i]
+        base = (1.0 - damping) / n + damping * dangling_mass / n
+        new_ranks = [base + damping * r for r in new_ranks]
+        error = sum(abs(a - b) for a, b in zip(new_ranks, ranks))
+        ranks = new_ranks
+        if error < n * tol:
+            break
+    return ranks
+
+
+def approximate_betweenness(snapshot, samples=64, seed=None):
+    """
+    Intermediación aproximada (Brandes con fuentes muestreadas).
+    Con samples >= n el resultado es exacto. Se normaliza al rango [0, 1].
+    """
+    n = snapshot.num_nodes
+    if n == 0:
+        return []
+
+    neighbors = snapshot.neighbor_lists()
+    rng = random.Random(seed)
+    sources = range(n) if samples >= n else rng.sample(range(n), samples)
+    num_sources = len(sources)
+    centrality = [0.0] * n
+
+    for s in sources:
+        # BFS desde la fuente contando caminos más cortos
+        stack = []
+        predecessors = [[] for _ in range(n)]
+        sigma = [0] * n
+        sigma[s] = 1
+        dist = [-1] * n
+        dist[s] = 0
+        queue = deque([s])
+        while queue:
+            v = queue.popleft()
+            stack.append(v)
+            for w in neighbors[v]:
+                if dist[w] < 0:
+                    dist[w] = dist[v] + 1
+                    queue.append(w)
+                if dist[w] == dist[v] + 1:
+                    sigma[w] += sigma[v]
+                    predecessors[w].append(v)
+
+        # Acumulación de dependencias en orden inverso
+        delta = [0.0] * n
+        while stack:
+            w = stack.pop()
+            for v in predecessors[w]:
+                delta[v] += (sigma[v] / sigma[w]) * (1.0 + delta[w])
+            if w != s:
+                centrality[w] += delta[w]
+
+    # Escalar la muestra al total y normalizar (grafo no dirigido)
+    scale = n / num_sources
+    norm = (n - 1) * (n - 2) if n > 2 else 1
+    return [c * scale / norm for c in centrality]
+
+
+def compute_rankings(snapshot, betweenness_samples=64, seed=None):
+    """Trabajo de analítica: PageRank e intermediación aproximada"""
+    ranks = pagerank(snapshot)
+    betweenness = approximate_betweenness(snapshot, samples=betweenness_samples, seed=seed)
+    return {
+        "pagerank": {snapshot.names[i]: score for i, score in enumerate(ranks)},
+        "betweenness": {snapshot.names[i]: score for i, score in enumerate(betweenness)},
+        "betweenness_samples": min(betweenness_samples, snapshot.num_nodes)
+    }
+
+
+def triangle_counts(snapshot, chunk_size=1_000_000):
+    """
+    Triángulos por nodo con el algoritmo "forward": cada arista se orienta del
+    nodo de menor grado al de mayor grado, así las listas de salida quedan
+    acotadas por O(sqrt(m)) y cada triángulo se encuentra una sola vez.
+    """
+    n = snapshot.num_nodes
+    if n == 0:
+        return []
+
+    if NUMPY_AVAILABLE:
+        degrees = snapshot.degrees()
+        # Rango por (grado, índice): define la orientación de las aristas
+        rank = np.empty(n, dtype=np.int64)
+        rank[np.lexsort((np.arange(n), degrees))] = np.arange(n)
+        sources = np.repeat(np.arange(n), degrees)
+        keep = rank[sources] < rank[snapshot.indices]
+        src = sources[keep]
+        dst = snapshot.indices[keep].astype(np.int64)
+
+        # Listas de salida ordenadas por rango, agrupadas por nodo de origen
+        order = np.lexsort((rank[dst], src))
+        src = src[order]
+        dst = dst[order]
+        edge_keys = np.sort(src * n + dst)  # aristas orientadas para búsqueda binaria
+        out_degree = np.bincount(src, minlength=n)
+        out_start = np.concatenate(([0], np.cumsum(out_degree)))
+
+        counts = np.zeros(n, dtype=np.int64)
+        # Agrupar nodos por grado de salida para generar las cuñas en bloque
+        for k in np.unique(out_degree[out_degree >= 2]):
+            nodes = np.nonzero(out_degree == k)[0]
+            first, second = np.triu_indices(int(k), 1)
+            rows_per_chunk = max(1, chunk_size // len(first))
+            for start in range(0, len(nodes), rows_per_chunk):
+                block = nodes[start:start + rows_per_chunk]
+                lists = dst[out_start[block][:, None] + np.arange(k)]
+                a = lists[:, first].ravel()
+                b = lists[:, second].ravel()
+                owners = np.repeat(block, len(first))
+                # La cuña (u, a, b) se cierra si existe la arista orientada a -> b
+                wanted = a * n + b
+                pos = np.searchsorted(edge_keys, wanted)
+                pos[pos == len(edge_keys)] = 0
+                closed = edge_keys[pos] == wanted
+                if closed.any():
+                    hits = np.concatenate((owners[closed], a[closed], b[closed]))
+                    counts += np.bincount(hits, minlength=n)
+        return counts.tolist()
+
+    # Implementación en Python puro con intersección ordenada por grado
+    neighbors = snapshot.neighbor_lists()
+    rank_key = [(len(neighbors[i]), i) for i in range(n)]
+    out_sets = [
+        {j for j in neighbors[i] if rank_key[i] < rank_key[j]}
+        for i in range(n)
+    ]
+    counts = [0] * n
+    for u in range(n):
+        out_u = out_sets[u]
+        for v in out_u:
+            for w in out_u & out_sets[v]:
+                counts[u] += 1
+                counts[v] += 1
+                counts[w] += 1
+    return counts
+
+
+def compute_clustering(snapshot):
+    """Trabajo de analítica: triángulos, clustering local y transitividad global"""
+    triangles = triangle_counts(snapshot)
+    degrees = snapshot.degrees()
+    degrees = degrees.tolist() if NUMPY_AVAILABLE else degrees
+
+    clustering = {}
+    total_triples = 0
+    for i, name in enumerate(snapshot.names):
+        d = degrees[i]
+        pairs = d * (d - 1) // 2
+        total_triples += pairs
+        clustering[name] = triangles[i] / pairs if pairs else 0.0
+
+    total_triangles = sum(triangles) // 3
+    n = snapshot.num_nodes
+    return {
+        "triangles": {name: triangles[i] for i, name in enumerate(snapshot.names)},
+        "clustering": clustering,
+        "total_triangles": total_triangles,
+        "transitivity": 3 * total_triangles / total_triples if total_triples else 0.0,
+        "average_clustering": sum(clustering.values()) / n if n else 0.0
+    }
+
+
+# A partir de este tamaño la propagación de etiquetas usa varios procesos
+PARALLEL_LPA_MIN_NODES = 50_000
+
+
+def _choose_labels(indptr, indices, labels, priority, nodes):
+    """
+    Nueva etiqueta de cada nodo de `nodes`: la más frecuente entre sus vecinos.
+    Empates: se conserva la etiqueta actual si está empatada; si no, gana la de
+    menor prioridad (permutación sembrada). Todas las lecturas son de `labels`,
+    por eso el resultado no depende del orden en que se procesen los bloques.
+    """
+    n = len(labels)
+    starts = indptr[nodes]
+    degrees = indptr[nodes + 1] - starts
+    current = labels[nodes]
+    new_labels = current.copy()
+    total = int(degrees.sum())
+    if total == 0:
+        return new_labels
+
+    owners = np.repeat(np.arange(len(nodes)), degrees)
+    offsets = np.arange(total) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+    neighbor_labels = labels[indices[np.repeat(starts, degrees) + offsets]]
+
+    keys, counts = np.unique(owners.astype(np.int64) * n + neighbor_labels, return_counts=True)
+    key_owner = keys // n
+    key_label = keys % n
+    is_current = key_label == current[key_owner]
+    order = np.lexsort((priority[key_label], ~is_current, -counts, key_owner))
+    sorted_owner = key_owner[order]
+    first = order[np.concatenate(([True], sorted_owner[1:] != sorted_owner[:-1]))]
+    new_labels[key_owner[first]] = key_label[first]
+    return new_labels
+
+
+def _choose_labels_python(neighbors, labels, priority, nodes):
+    """Misma regla que `_choose_labels` en Python puro"""
+    new_labels = {}
+    for v in nodes:
+        if not neighbors[v]:
+            continue
+        counts = {}
+        for w in neighbors[v]:
+            counts[labels[w]] = counts.get(labels[w], 0) + 1
+        best = max(counts.values())
+        if counts.get(labels[v]) == best:
+            continue
+        candidates = [label for label, count in counts.items() if count == best]
+        new_labels[v] = min(candidates, key=lambda label: priority[label])
+    return new_labels
+
+
+def _share_array(array):
+    """Copia un arreglo a memoria compartida; devuelve (segmento, vista, descriptor)"""
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+    view[:] = array
+    return segment, view, (segment.name, array.shape, array.dtype.str)
+
+
+_attached_segments = {}  # Segmentos abiertos en cada proceso trabajador
+
+
+def _attach_array(spec):
+    """Abre (una sola vez por proceso) un arreglo en memoria compartida"""
+    name, shape, dtype = spec
+    if name not in _attached_segments:
+        # Los trabajadores comparten el resource_tracker del proceso principal,
+        # que es el dueño del segmento y quien lo libera al terminar
+        _attached_segments[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attached_segments[name].buf)
+
+
+def _lpa_worker(specs, start, stop):
+    """Tarea de un proceso: actualiza las etiquetas de order[start:stop]"""
+    indptr = _attach_array(specs["indptr"])
+    indices = _attach_array(specs["indices"])
+    labels = _attach_array(specs["labels"])
+    next_labels = _attach_array(specs["next_labels"])
+    priority = _attach_array(specs["priority"])
+    nodes = _attach_array(specs["order"])[start:stop]
+    next_labels[nodes] = _choose_labels(indptr, indices, labels, priority, nodes)
+
+
+def _dense_communities(labels):
+    """Renumera las etiquetas 0..k-1 por tamaño descendente (y menor miembro)"""
+    members = {}
+    for v, label in enumerate(labels):
+        members.setdefault(label, []).append(v)
+    groups = sorted(members.values(), key=lambda group: (-len(group), group[0]))
+    community = [0] * len(labels)
+    for community_id, group in enumerate(groups):
+        for v in group:
+            community[v] = community_id
+    return community
+
+
+def label_propagation(snapshot, seed=0, max_iter=20, workers=None,
+                      parallel_threshold=PARALLEL_LPA_MIN_NODES):
+    """
+    Detección de comunidades por propagación de etiquetas semi-síncrona.
+    Los nodos se dividen (con la semilla) en dos mitades que se actualizan por
+    turnos leyendo las etiquetas del turno anterior, lo que evita oscilaciones
+    y hace el resultado determinista para una semilla, con o sin procesos.
+    Devuelve el ID de comunidad de cada nodo (0 = la comunidad más grande).
+    """
+    n = snapshot.num_nodes
+    if n == 0:
+        return []
+
+    rng = random.Random(seed)
+    priority = list(range(n))
+    rng.shuffle(priority)
+    order = list(range(n))
+    rng.shuffle(order)
+    half = n // 2
+    phases = ((0, half), (half, n))
+
+    if not NUMPY_AVAILABLE:
+        neighbors = snapshot.neighbor_lists()
+        labels = list(range(n))
+        for _ in range(max_iter):
+            changed = False
+            for start, stop in phases:
+                updates = _choose_labels_python(neighbors, labels, priority, order[start:stop])
+                for v, label in updates.items():
+                    labels[v] = label
+                changed = changed or bool(updates)
+            if not changed:
+                break
+        return _dense_communities(labels)
+
+    indptr = np.asarray(snapshot.indptr, dtype=np.int64)
+    indices = np.asarray(snapshot.indices, dtype=np.int64)
+    priority = np.asarray(priority, dtype=np.int64)
+    order = np.asarray(order, dtype=np.int64)
+    workers = workers or min(4, os.cpu_count() or 1)
+
+    if workers <= 1 or n < parallel_threshold:
+        labels = np.arange(n, dtype=np.int64)
+        for _ in range(max_iter):
+            changed = False
+            for start, stop in phases:
+                nodes = order[start:stop]
+                new_labels = _choose_labels(indptr, indices, labels, priority, nodes)
+                changed = changed or bool((new_labels != labels[nodes]).any())
+                labels[nodes] = new_labels
+            if not changed:
+                break
+        return _dense_communities(labels.tolist())
+
+    # Versión paralela: arreglos en memoria compartida y un bloque por tarea
+    shared = {}
+    try:
+        for name, array in (("indptr", indptr), ("indices", indices), ("priority", priority),
+                            ("order", order), ("labels", np.arange(n, dtype=np.int64)),
+                            ("next_labels", np.arange(n, dtype=np.int64))):
+            shared[name] = _share_array(array)
+        specs = {name: spec for name, (_, _, spec) in shared.items()}
+        labels = shared["labels"][1]
+        next_labels = shared["next_labels"][1]
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for _ in range(max_iter):
+                changed = False
+                for start, stop in phases:
+                    bounds = np.linspace(start, stop, workers * 4 + 1, dtype=np.int64)
+                    tasks = [pool.submit(_lpa_worker, specs, int(a), int(b))
+                             for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+                    for task in tasks:
+                        task.result()
+                    nodes = order[start:stop]
+                    changed = changed or bool((next_labels[nodes] != labels[nodes]).any())
+                    labels[nodes] = next_labels[nodes]
+                if not changed:
+                    break
+        return _dense_communities(labels.tolist())
+    finally:
+        for segment, _, _ in shared.values():
+            segment.close()
+            segment.unlink()
+
+
+def compute_communities(snapshot, seed=0):
+    """Trabajo de analítica: comunidades por propagación de etiquetas"""
+    community = label_propagation(snapshot, seed=seed)
+    sizes = {}
+    for community_id in community:
+        sizes[community_id] = sizes.get(community_id, 0) + 1
+    return {
+        "communities": {name: community[i] for i, name in enumerate(snapshot.names)},
+        "count": len(sizes),
+        "sizes": [sizes[c] for c in sorted(sizes)]
+    }
+
+
+def top_k(scores, k=10):
+    """Devuelve los k usuarios con mayor puntaje como [(usuario, puntaje)]"""
+    return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class AnalyticsWorker:
+    """
+    Hilo de fondo que recalcula la analítica cuando cambia la versión del grafo.
+    `snapshot_source(last_version)` debe devolver (version, {usuario: amigos}),
+    o None si la versión sigue siendo `last_version` (así no copia nada), y es
+    la única parte que toma el lock del servidor; el cálculo se hace sin el lock.
+    """
+
+    def __init__(self, snapshot_source, interval=5.0, betweenness_samples=64, seed=None,
+                 min_interval=ANALYTICS_MIN_INTERVAL, quiet=ANALYTICS_QUIET):
+        self.snapshot_source = snapshot_source
+        self.interval = interval
+        self.min_interval = min_interval
+        self.quiet = quiet
+        self.betweenness_samples = betweenness_samples
+        self.seed = seed
+        self.jobs = {
+            "rankings": self._rankings_job,
+            "clustering": compute_clustering,
+            "communities": self._communities_job
+        }
+        self.results = {}  # {trabajo: {"version", "compute_time_ms", "data"}}
+        self.results_lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.running = False
+        self.thread = None
+        self.last_version = None
+
+    def _rankings_job(self, snapshot):
+        return compute_rankings(snapshot, self.betweenness_samples, self.seed)
+
+    def _communities_job(self, snapshot):
+        return compute_communities(snapshot, self.seed or 0)
+
+    def start(self):
+        """Inicia el hilo de analítica"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Detiene el hilo de analítica"""
+        self.running = False
+        self.wake_event.set()
+
+    def notify_change(self):
+        """Avisa que el grafo cambió para recalcular lo antes posible"""
+        self.wake_event.set()
+
+    def get_result(self, job):
+        """Devuelve el último resultado publicado de un trabajo (o None)"""
+        with self.results_lock:
+            return self.results.get(job)
+
+    def run_once(self):
+        """Toma una instantánea y ejecuta todos los trabajos si la versión cambió"""
+        copied = self.snapshot_source(self.last_version)
+        if copied is None:
+            return False
+        version, adjacency = copied
+        snapshot = GraphSnapshot.from_adjacency(adjacency, version)
+        for name, job in list(self.jobs.items()):
+            start = time.perf_counter()
+            try:
+                data = job(snapshot)
+            except Exception as e:
+                print(f"[ANALYTICS] Error en el trabajo '{name}': {e}")
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self.results_lock:
+                self.results[name] = {
+                    "version": version,
+                    "compute_time_ms": round(elapsed_ms, 2),
+                    "data": data
+                }
+        self.last_version = version
+        return True
+
+    def _run(self):
+        while self.running:
+            # Limpiar antes de calcular para no perder avisos que lleguen durante el cálculo
+            self.wake_event.clear()
+            try:
+                if self.run_once():
+                    print(f"[ANALYTICS] Métricas actualizadas (versión {self.last_version})")
+            except Exception as e:
+                print(f"[ANALYTICS] Error: {e}")
+            finished = time.monotonic()
+            self.wake_event.wait(self.interval)
+            # Los avisos que lleguen hasta el plazo se juntan en el próximo cálculo
+            deadline = max(finished + self.min_interval, time.monotonic() + self.quiet)
+            while self.running and time.monotonic() < deadline:
+                self.wake_event.clear()
+                self.wake_event.wait(deadline - time.monotonic())
@@ -0,0 +1,257 @@
+"""
+Almacén de avatares del servidor.
+Las imágenes se suben por partes sobre la conexión existente, se guardan en
+disco direccionadas por su SHA-256 (dos usuarios con la misma foto comparten
+los archivos) y las miniaturas se generan una sola vez, al terminar la
+subida, en un pool de procesos. Como el contenido de un hash nunca cambia,
+el hash sirve de versión para los pedidos condicionales.
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+# Intentar importar PIL para decodificar y redimensionar
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Directorio raíz del almacén
+AVATAR_DIR = "avatars"
+
+# Tamaños de miniatura precalculados (lado del cuadrado, en píxeles)
+AVATAR_SIZES = (48, 120, 150)
+
+# Límites de la subida: archivo completo, cada parte y píxeles decodificados
+AVATAR_MAX_BYTES = 8 * 1024 * 1024
+AVATAR_CHUNK_BYTES = 256 * 1024
+AVATAR_MAX_PIXELS = 4096 * 4096
+
+# Segundos sin actividad tras los que se descarta una subida a medias
+UPLOAD_TIMEOUT = 300
+
+# Procesos que generan miniaturas
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ImageTooLargeError(ValueError):
+    """La imagen supera AVATAR_MAX_PIXELS (se detecta antes de decodificarla)"""
+
+
+def make_thumbnails(source_path, targets):
+    """
+    Decodifica la imagen original y escribe una miniatura PNG cuadrada por
+    cada (tamaño, ruta) de `targets`. Se ejecuta en un proceso del pool.
+    """
+    too_large = f"Imagen demasiado grande (máximo {AVATAR_MAX_PIXELS} píxeles)"
+    try:
+        opened = Image.open(source_path)
+    except Image.DecompressionBombError:
+        raise ImageTooLargeError(too_large)
+    with opened as image:
+        # open solo lee el encabezado: el tamaño se valida antes de decodificar
+        # (MAX_IMAGE_PIXELS de Pillow solo avisa hasta el doble de su límite)
+        width, height = image.size
+        if width * height > AVATAR_MAX_PIXELS:
+            raise ImageTooLargeError(too_large)
+        image = ImageOps.exif_transpose(image).convert("RGBA")
+    for size, path in targets:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        thumbnail.save(temp_path, format="PNG", optimize=True)
+        os.replace(temp_path, path)
+    return [size for size, _ in targets]
+
+
+class _Upload:
+    """Subida en curso: archivo temporal y hash incremental"""
+    __slots__ = ("owner", "total", "digest", "path", "received", "hasher", "touched")
+
+    def __init__(self, owner, total, digest, path):
+        self.owner = owner
+        self.total = total
+        self.digest = digest
+        self.path = path
+        self.received = 0
+        self.hasher = hashlib.sha256()
+        self.touched = time.monotonic()
+
+
+class AvatarStore:
+    """
+    Archivos en `root/<ab>/<hash>` (original) y `root/<ab>/<hash>_<tamaño>.png`.
+    Los errores de validación se reportan con ValueError (mensaje para el cliente).
+    """
+
+    def __init__(self, root=AVATAR_DIR, sizes=AVATAR_SIZES, workers=THUMBNAIL_WORKERS):
+        self.root = root
+        self.sizes = tuple(sorted(sizes))
+        self.workers = workers
+        self.uploads = {}  # id de subida -> _Upload
+        self.lock = threading.Lock()
+        self.pool = None
+        self.upload_dir = os.path.join(root, "subidas")
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+    def _dir(self, digest):
+        return os.path.join(self.root, digest[:2])
+
+    def original_path(self, digest):
+        return os.path.join(self._dir(digest), digest)
+
+    def thumbnail_path(self, digest, size):
+        return os.path.join(self._dir(digest), f"{digest}_{size}.png")
+
+    def has(self, digest):
+        """Si el contenido ya está almacenado con todas sus miniaturas"""
+        return (os.path.exists(self.original_path(digest)) and
+                all(os.path.exists(self.thumbnail_path(digest, size)) for size in self.sizes))
+
+    def best_size(self, size):
+        """Menor tamaño precalculado que cubre `size` (o el mayor disponible)"""
+        for available in self.sizes:
+            if available >= size:
+                return available
+        return self.sizes[-1]
+
+    def read_thumbnail(self, digest, size):
+        """Bytes PNG de la miniatura más adecuada: (tamaño, datos)"""
+        size = self.best_size(size)
+        with open(self.thumbnail_path(digest, size), 'rb') as f:
+            return size, f.read()
+
+    def _discard(self, upload_id):
+        """Quita una subida y su archivo temporal (llamar con el lock tomado)"""
+        upload = self.uploads.pop(upload_id, None)
+        if upload is not None:
+            try:
+                os.remove(upload.path)
+            except OSError:
+                pass
+        return upload
+
+    def begin(self, owner, total, digest):
+        """
+        Inicia una subida de `total` bytes con hash `digest`. Devuelve el id de
+        la subida, o None si ese contenido ya está almacenado (no hay que enviarlo).
+        """
+        if not PIL_AVAILABLE:
+            raise ValueError("El servidor no puede procesar imágenes (falta Pillow)")
+        if not isinstance(total, int) or not 0 < total <= AVATAR_MAX_BYTES:
+            raise ValueError(f"Tamaño inválido (máximo {AVATAR_MAX_BYTES // (1024 * 1024)} MB)")
+        if not isinstance(digest, str) or len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError("Hash SHA-256 inválido")
+        if self.has(digest):
+            return None
+
+        now = time.monotonic()
+        with self.lock:
+            # Una subida a la vez por usuario; las abandonadas expiran
+            for upload_id, upload in list(self.uploads.items()):
+                if upload.owner == owner or now - upload.touched > UPLOAD_TIMEOUT:
+                    self._discard(upload_id)
+            upload_id = uuid.uuid4().hex
+            path = os.path.join(self.upload_dir, f"{upload_id}.part")
+            open(path, 'wb').close()
+            self.uploads[upload_id] = _Upload(owner, total, digest, path)
+        return upload_id
+
+    def write_chunk(self, owner, upload_id, offset, data):
+        """Agrega una parte en `offset` (deben llegar en orden). Devuelve los bytes recibidos"""
+        with self.lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None or upload.owner != owner:
+                raise ValueError("Subida inexistente o expirada")
+            if len(data) > AVATAR_CHUNK_BYTES:
+                raise ValueError("Parte demasiado grande")
+            if offset != upload.received:
+                raise ValueError(f"Desplazamiento inesperado (se esperaba {upload.received})")
+            if upload.received + len(data) > upload.total:
+                self._discard(upload_id)
+                raise ValueError("Se recibieron más bytes de los anunciados")
+            with open(upload.path, 'ab') as f:
+                f.write(data)
+            upload.hasher.update(data)
+            upload.received += len(data)
+            upload.touched = time.monotonic()
+            return upload.received
+
+    def finish(self, owner, upload_id):
+        """
+        Verifica tamaño y hash, genera las miniaturas en el pool y mueve el
+        original a su lugar definitivo. Devuelve el hash del contenido.
+        """
+        with self.lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None or upload.owner != owner:
+                raise ValueError("Subida inexistente o expirada")
+            if upload.received != upload.total:
+                raise ValueError(f"Subida incompleta ({upload.received} de {upload.total} bytes)")
+            del self.uploads[upload_id]
+            if self.pool is None:
+                context = multiprocessing.get_context("spawn")
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            pool = self.pool
+
+        digest = upload.digest
+        try:
+            if upload.hasher.hexdigest() != digest:
+                raise ValueError("El hash no coincide con el contenido recibido")
+            if self.has(digest):
+                return digest  # otro usuario subió lo mismo mientras tanto
+            os.makedirs(self._dir(digest), exist_ok=True)
+            targets = [(size, self.thumbnail_path(digest, size)) for size in self.sizes]
+            try:
+                pool.submit(make_thumbnails, upload.path, targets).result()
+            except ImageTooLargeError:
+                raise
+            except Exception:
+                raise ValueError("El archivo no es una imagen válida")
+            # El original se publica al final: has() solo es cierto con todo escrito
+            os.replace(upload.path, self.original_path(digest))
+            return digest
+        finally:
+            try:
+                os.remove(upload.path)
+            except OSError:
+                pass
+
+    def cancel(self, owner):
+        """Descarta las subidas en curso de un usuario"""
+        with self.lock:
+            for upload_id, upload in list(self.uploads.items()):
+                if upload.owner == owner:
+                    self._discard(upload_id)
+
+    def collect_garbage(self, referenced):
+        """
+        Borra el contenido que ningún usuario referencia y las subidas a medias.
+        Se llama al iniciar, antes de aceptar conexiones.
+        """
+        removed = 0
+        for entry in os.listdir(self.root):
+            directory = os.path.join(self.root, entry)
+            if directory == self.upload_dir or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.split("_", 1)[0].split(".", 1)[0] not in referenced:
+                    os.remove(os.path.join(directory, name))
+                    removed += 1
+            if not os.listdir(directory):
+                os.rmdir(directory)
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        return removed
+
+    def shutdown(self):
+        """Detiene el pool de miniaturas"""
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
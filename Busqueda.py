@@ -0,0 +1,669 @@
+"""
+Índices de búsqueda de usuarios.
+TrigramIndex: índice invertido de trigramas para búsquedas por subcadena; se
+mantiene al registrar y eliminar usuarios, y las consultas intersectan listas
+de publicación en lugar de recorrer todos los nombres.
+IncrementalFilter: búsqueda por subcadena mientras se escribe que, si la
+consulta solo se alarga, filtra el resultado anterior en vez del índice.
+AutocompleteTrie: trie de prefijos (sin distinguir mayúsculas) donde cada nodo
+guarda los k usuarios más populares de su subárbol, para sugerir en cada tecla.
+FuzzyIndex: búsqueda tolerante a errores de escritura con un índice de
+borrados estilo SymSpell sobre las palabras de los nombres.
+ProfileIndex: índice invertido de texto completo sobre las descripciones de
+perfil (sin tildes ni palabras vacías) con ranking BM25.
+"""
+from array import array
+from bisect import bisect_left, insort
+import heapq
+import math
+import re
+import unicodedata
+
+from AmigosComunes import galloping_intersection, GALLOP_RATIO
+
+
+def normalize(text):
+    """Forma canónica para comparar nombres (sin distinguir mayúsculas)"""
+    return text.casefold()
+
+
+def fold_accents(text):
+    """Minúsculas y sin tildes ("María" -> "maria"); la ñ se conserva"""
+    decomposed = unicodedata.normalize('NFD', text.casefold())
+    folded = ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn' or c == '\u0303')
+    return unicodedata.normalize('NFC', folded)
+
+
+def trigrams(text):
+    """Trigramas distintos de un texto ya normalizado"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def match_rank(name, query):
+    """
+    Clave de orden para una coincidencia (menor = mejor):
+    exacta, prefijo, inicio de palabra y luego cualquier subcadena;
+    a igual tipo, gana la coincidencia más temprana y el nombre más corto.
+    """
+    position = name.find(query)
+    if name == query:
+        kind = 0
+    elif position == 0:
+        kind = 1
+    elif name[position - 1] == ' ':
+        kind = 2
+    else:
+        kind = 3
+    return (kind, position, len(name))
+
+
+class TrigramIndex:
+    """Índice invertido trigrama -> IDs de usuario (array('I') ordenado)"""
+
+    def __init__(self, usernames=()):
+        self.ids = {}          # nombre -> ID
+        self.names = []        # ID -> nombre (None si fue eliminado)
+        self.folded = []       # ID -> nombre normalizado
+        self.postings = {}     # trigrama -> array('I') ordenado de IDs
+        self.count = 0
+        for username in usernames:
+            self.add(username)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, username):
+        return username in self.ids
+
+    def add(self, username):
+        """Agrega un usuario al índice"""
+        if username in self.ids:
+            return False
+        uid = len(self.names)
+        folded = normalize(username)
+        self.ids[username] = uid
+        self.names.append(username)
+        self.folded.append(folded)
+        for gram in trigrams(folded):
+            posting = self.postings.get(gram)
+            if posting is None:
+                self.postings[gram] = array('I', [uid])
+            else:
+                posting.append(uid)  # los IDs nuevos siempre son los mayores
+        self.count += 1
+        return True
+
+    def remove(self, username):
+        """Elimina un usuario del índice"""
+        uid = self.ids.pop(username, None)
+        if uid is None:
+            return False
+        for gram in trigrams(self.folded[uid]):
+            posting = self.postings[gram]
+            del posting[bisect_left(posting, uid)]
+            if not posting:
+                del self.postings[gram]
+        self.names[uid] = None
+        self.folded[uid] = None
+        self.count -= 1
+        return True
+
+    def _candidates(self, query):
+        """IDs que contienen todos los trigramas de la consulta"""
+        lists = []
+        for gram in trigrams(query):
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            lists.append(posting)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for posting in lists[1:]:
+            if not candidates:
+                break
+            if len(posting) >= GALLOP_RATIO * len(candidates):
+                candidates = galloping_intersection(candidates, posting)
+            else:
+                candidates = sorted(set(candidates).intersection(posting))
+        return candidates
+
+    def matching_ids(self, query):
+        """IDs de los usuarios cuyo nombre normalizado contiene `query` (ya normalizada)"""
+        if len(query) < 3:
+            # Consultas muy cortas: no hay trigramas, se recorre la lista normalizada
+            return [uid for uid, name in enumerate(self.folded) if name is not None and query in name]
+        return [uid for uid in self._candidates(query) if query in self.folded[uid]]
+
+    def rank(self, uids, query, limit=None):
+        """Nombres de `uids` ordenados por relevancia para `query` (máximo `limit`)"""
+        ranked = ((match_rank(self.folded[uid], query), self.names[uid]) for uid in uids)
+        if limit is None:
+            return [name for _, name in sorted(ranked)]
+        return [name for _, name in heapq.nsmallest(limit, ranked)]
+
+    def search(self, query, limit=50):
+        """Usuarios que contienen `query`, ordenados por relevancia (máximo `limit`)"""
+        query = normalize(query.strip())
+        if not query:
+            return []
+        return self.rank(self.matching_ids(query), query, limit)
+
+
+class IncrementalFilter:
+    """
+    Filtro por subcadena sobre un TrigramIndex para búsquedas mientras se
+    escribe. Recuerda los IDs que coincidieron con la consulta anterior: si la
+    nueva la contiene (se siguió escribiendo), cualquier coincidencia nueva
+    también coincidía antes, así que solo se revisan esos IDs.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.query = None
+        self.uids = None
+
+    def search(self, query, limit=None):
+        """Como TrigramIndex.search, pero reutilizando el resultado anterior"""
+        query = normalize(query.strip())
+        if not query:
+            self.query = self.uids = None
+            return []
+        if self.query is not None and self.query in query:
+            folded = self.index.folded
+            uids = [uid for uid in self.uids if query in folded[uid]]
+        else:
+            uids = self.index.matching_ids(query)
+        self.query, self.uids = query, uids
+        return self.index.rank(uids, query, limit)
+
+
+# Sugerencias cacheadas por nodo del trie
+AUTOCOMPLETE_TOP_K = 10
+
+# Profundidad máxima del trie: más allá, las claves se guardan en el nodo hoja
+# y se filtran al consultar (acota la cantidad de nodos con millones de nombres)
+AUTOCOMPLETE_MAX_DEPTH = 8
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries", "top", "ranked")
+
+    def __init__(self):
+        self.children = {}   # carácter -> _TrieNode
+        self.entries = []    # (clave, nombre) que terminan aquí o pasan la profundidad máxima
+        self.top = []        # [(-puntaje, nombre)] mejores k del subárbol
+        self.ranked = None   # [(-puntaje, nombre)] de las entradas, ordenado al consultar (None = sin calcular)
+
+
+class AutocompleteTrie:
+    """
+    Trie de prefijos para autocompletar nombres de usuario. Cada nombre se
+    indexa completo y desde el inicio de cada palabra ("Vargas" sugiere a
+    "Christian Vargas"). Cada nodo cachea sus k mejores por puntaje (grado).
+    """
+
+    def __init__(self, scores=None, top_k=AUTOCOMPLETE_TOP_K, max_depth=AUTOCOMPLETE_MAX_DEPTH):
+        self.root = _TrieNode()
+        self.scores = {}  # nombre -> puntaje
+        self.top_k = top_k
+        self.max_depth = max_depth
+        if scores:
+            self._bulk_load(scores)
+
+    def _bulk_load(self, scores):
+        """Carga inicial: inserta todas las claves y calcula los mejores k en una pasada"""
+        self.scores.update(scores)
+        for username in scores:
+            for key in self._keys(username):
+                self._path(key, create=True)[-1].entries.append((key, username))
+        # Recorrido en postorden (hijos antes que padres)
+        order = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children.values())
+        for node in reversed(order):
+            self._recompute(node)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, username):
+        return username in self.scores
+
+    @staticmethod
+    def _keys(username):
+        """Claves indexadas: el nombre completo y cada sufijo que empieza una palabra"""
+        folded = normalize(username)
+        keys = {folded}
+        for i, char in enumerate(folded):
+            if char == ' ' and i + 1 < len(folded) and folded[i + 1] != ' ':
+                keys.add(folded[i + 1:])
+        return keys
+
+    def _path(self, key, create=False):
+        """Nodos desde la raíz hasta el de `key` (acotado a la profundidad máxima)"""
+        node = self.root
+        path = [node]
+        for char in key[:self.max_depth]:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = _TrieNode()
+            node = child
+            path.append(node)
+        return path
+
+    def _recompute(self, node):
+        """Mejores k de un nodo a partir de sus entradas y de los de sus hijos"""
+        candidates = {}
+        for _, name in node.entries:
+            candidates[name] = -self.scores[name]
+        for child in node.children.values():
+            for score, name in child.top:
+                candidates[name] = score
+        node.top = sorted((score, name) for name, score in candidates.items())[:self.top_k]
+
+    def _promote(self, path, username):
+        """Sube (o inserta) a un usuario en los mejores k de cada nodo del camino"""
+        entry = (-self.scores[username], username)
+        for node in path:
+            top = node.top
+            for i, (_, name) in enumerate(top):
+                if name == username:
+                    del top[i]
+                    break
+            if len(top) < self.top_k or entry < top[-1]:
+                insort(top, entry)
+                del top[self.top_k:]
+
+    def _demote(self, paths):
+        """
+        Recalcula una sola vez cada nodo de los caminos de un usuario, del más
+        profundo al más superficial. Los caminos de sus distintas claves
+        comparten ancestros ("m", "ma" para "María Martínez"), así que no se
+        puede cortar en el primer nodo que no lo incluye: un ancestro común
+        debe recalcularse después de todos sus hijos en cualquiera de los caminos.
+        """
+        nodes = {}
+        for path in paths:
+            for depth, node in enumerate(path):
+                nodes[id(node)] = (depth, node)
+        for _, node in sorted(nodes.values(), key=lambda item: item[0], reverse=True):
+            self._recompute(node)
+
+    def add(self, username, score=0):
+        """Agrega un usuario con su puntaje inicial"""
+        if username in self.scores:
+            return self.update_score(username, score)
+        self.scores[username] = score
+        for key in self._keys(username):
+            path = self._path(key, create=True)
+            path[-1].entries.append((key, username))
+            path[-1].ranked = None
+            self._promote(path, username)
+        return True
+
+    def remove(self, username):
+        """Elimina un usuario del trie"""
+        if username not in self.scores:
+            return False
+        paths = []
+        for key in self._keys(username):
+            path = self._path(key)
+            path[-1].entries.remove((key, username))
+            path[-1].ranked = None
+            # Podar nodos que quedaron vacíos
+            while len(path) > 1 and not path[-1].children and not path[-1].entries:
+                path.pop()
+                del path[-1].children[key[len(path) - 1]]
+            paths.append(path)
+        del self.scores[username]
+        self._demote(paths)
+        return True
+
+    def update_score(self, username, score):
+        """Actualiza el puntaje (grado) de un usuario y las cachés afectadas"""
+        old_score = self.scores.get(username)
+        if old_score is None:
+            return False
+        if old_score == score:
+            return True
+        self.scores[username] = score
+        paths = [self._path(key) for key in self._keys(username)]
+        for path in paths:
+            path[-1].ranked = None
+        if score > old_score:
+            for path in paths:
+                self._promote(path, username)
+        else:
+            self._demote(paths)
+        return True
+
+    def _best_first(self, node, limit, accept):
+        """
+        Mejores `limit` nombres del subárbol de `node` que pasan `accept`, por
+        puntaje. Un nodo se expande recién cuando su mejor nombre (top[0]) es
+        el próximo candidato, y sus entradas se recorren en orden con un cursor
+        sobre `ranked`: solo se visita lo que el filtro descarta.
+        """
+        result = []
+        seen = set()
+        # (clave, 0 = nodo / 1 = cursor de entradas, desempate, nodo, posición):
+        # a igual clave se expande el nodo primero
+        heap = [(node.top[0], 0, 0, node, 0)] if node.top else []
+        pushed = 1
+        while heap and len(result) < limit:
+            key, kind, _, current, position = heapq.heappop(heap)
+            if kind == 0:
+                if current.entries:
+                    if current.ranked is None:
+                        current.ranked = sorted({(-self.scores[name], name) for _, name in current.entries})
+                    heapq.heappush(heap, (current.ranked[0], 1, pushed, current, 0))
+                    pushed += 1
+                for child in current.children.values():
+                    if child.top:
+                        heapq.heappush(heap, (child.top[0], 0, pushed, child, 0))
+                        pushed += 1
+                continue
+            name = key[1]
+            if name not in seen:
+                seen.add(name)
+                if accept is None or accept(name):
+                    result.append(name)
+            if position + 1 < len(current.ranked):
+                heapq.heappush(heap, (current.ranked[position + 1], 1, pushed, current, position + 1))
+                pushed += 1
+        return result
+
+    def suggest(self, prefix, limit=AUTOCOMPLETE_TOP_K, accept=None):
+        """
+        Hasta `limit` usuarios cuyo nombre (o una de sus palabras) empieza con
+        `prefix`. Con `accept` solo se devuelven los nombres que lo cumplen, y
+        se siguen buscando hasta completar `limit`.
+        """
+        prefix = normalize(prefix.lstrip())
+        if not prefix:
+            return []
+        path = self._path(prefix)
+        if path is None:
+            return []
+        node = path[-1]
+        if len(prefix) <= self.max_depth:
+            if limit <= self.top_k:
+                cached = [name for _, name in node.top if accept is None or accept(name)]
+                # Con menos de k en la caché el subárbol entero ya está en ella
+                if len(cached) >= limit or len(node.top) < self.top_k:
+                    return cached[:limit]
+            # Más resultados de los cacheados: búsqueda por puntaje en el subárbol
+            return self._best_first(node, limit, accept)
+
+        # Prefijo más largo que el trie: filtrar las claves guardadas en la hoja
+        matches = {name: -self.scores[name] for key, name in node.entries
+                   if key.startswith(prefix) and (accept is None or accept(name))}
+        return [name for _, name in heapq.nsmallest(limit, ((s, n) for n, s in matches.items()))]
+
+
+# Distancia de edición máxima por defecto (y máxima soportada por el índice)
+FUZZY_MAX_DISTANCE = 2
+
+# Palabras: secuencias de letras o de dígitos ("rojas4213" -> "rojas", "4213")
+_WORD_RE = re.compile(r'[^\W\d_]+|\d+')
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Distancia de Damerau-Levenshtein (alineamiento óptimo de cadenas) acotada:
+    devuelve max_distance + 1 en cuanto se sabe que se supera el límite.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = 0 if char_a == char_b else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and char_a == b[j - 2] and a[i - 2] == char_b):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def deletes(word, max_distance):
+    """Variantes de una palabra con hasta `max_distance` caracteres borrados"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - variants
+        variants |= frontier
+    return variants
+
+
+class FuzzyIndex:
+    """
+    Búsqueda difusa de usuarios: cada nombre se separa en palabras (sin tildes
+    ni mayúsculas) y cada palabra del vocabulario se indexa por sus variantes
+    con borrados (SymSpell). Una consulta solo genera los borrados de sus propias
+    palabras, así que no se compara contra todos los nombres. Los números se
+    separan de las letras y solo coinciden exactos (no se generan sus borrados).
+    """
+
+    def __init__(self, usernames=(), max_distance=FUZZY_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.words = {}     # palabra -> set de usuarios que la contienen
+        self.variants = {}  # variante con borrados -> set de palabras
+        self.users = set()
+        for username in usernames:
+            self.add(username)
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, username):
+        return username in self.users
+
+    @staticmethod
+    def tokenize(text):
+        return _WORD_RE.findall(fold_accents(text))
+
+    def add(self, username):
+        """Agrega un usuario al índice"""
+        if username in self.users:
+            return False
+        self.users.add(username)
+        for word in set(self.tokenize(username)):
+            holders = self.words.get(word)
+            if holders is None:
+                holders = self.words[word] = set()
+                # Los números solo coinciden exactos: no se indexan sus borrados
+                if not word.isdigit():
+                    for variant in deletes(word, self.max_distance):
+                        self.variants.setdefault(variant, set()).add(word)
+            holders.add(username)
+        return True
+
+    def remove(self, username):
+        """Elimina un usuario del índice (y las palabras que quedaron sin usuarios)"""
+        if username not in self.users:
+            return False
+        self.users.discard(username)
+        for word in set(self.tokenize(username)):
+            holders = self.words[word]
+            holders.discard(username)
+            if not holders:
+                del self.words[word]
+                if word.isdigit():
+                    continue
+                for variant in deletes(word, self.max_distance):
+                    words = self.variants[variant]
+                    words.discard(word)
+                    if not words:
+                        del self.variants[variant]
+        return True
+
+    def lookup(self, word, max_distance):
+        """Palabras del vocabulario a distancia <= max_distance: {palabra: distancia}"""
+        if word.isdigit():
+            return {word: 0} if word in self.words else {}
+        matches = {}
+        candidates = set()
+        for variant in deletes(word, max_distance):
+            candidates.update(self.variants.get(variant, ()))
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                matches[candidate] = distance
+        return matches
+
+    def search(self, query, max_distance=FUZZY_MAX_DISTANCE, limit=50):
+        """
+        Usuarios cuyas palabras coinciden con todas las de la consulta con a lo
+        sumo `max_distance` ediciones en total. Devuelve [(nombre, distancia)]
+        ordenado por distancia y nombre.
+        """
+        max_distance = max(0, min(max_distance, self.max_distance))
+        query_words = self.tokenize(query)
+        if not query_words:
+            return []
+
+        # Por palabra de la consulta: levels[d] = usuarios con una palabra a distancia d
+        per_word = []
+        for word in query_words:
+            levels = [set() for _ in range(max_distance + 1)]
+            for match, distance in self.lookup(word, max_distance).items():
+                levels[distance] |= self.words[match]
+            if not any(levels):
+                return []
+            per_word.append(levels)
+
+        # Recorrer las combinaciones de distancias por palabra en orden de distancia
+        # total; cada usuario aparece primero en la combinación de sus distancias mínimas
+        results = []
+        seen = set()
+        for total in range(max_distance + 1):
+            found = set()
+            for combination in _compositions(total, len(per_word)):
+                sets = sorted((levels[d] for levels, d in zip(per_word, combination)), key=len)
+                if sets[0]:
+                    found |= sets[0].intersection(*sets[1:])
+            found -= seen
+            seen |= found
+            results.extend((username, total) for username in heapq.nsmallest(limit - len(results), found))
+            if len(results) >= limit:
+                break
+        return results
+
+
+def _compositions(total, parts):
+    """Tuplas de `parts` enteros no negativos que suman `total`"""
+    if parts == 1:
+        yield (total,)
+        return
+    for first in range(total + 1):
+        for rest in _compositions(total - first, parts - 1):
+            yield (first,) + rest
+
+
+# Parámetros de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Palabras vacías del español (ya sin tildes) que no se indexan
+SPANISH_STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante
+e el ella ellas ellos en entre era eran es esa esas ese eso esos esta estan estas este esto
+estos fue fueron ha hay la las le les lo los mas me mi mis muy nada ni no nos o os otra otros
+para pero poco por porque que quien se sea ser si sin sobre son su sus tambien te tiene tu tus
+un una uno unos y ya yo
+""".split())
+
+
+class ProfileIndex:
+    """
+    Índice invertido término -> {usuario: frecuencia} sobre las descripciones
+    de perfil. Se actualiza de forma incremental al cambiar una descripción y
+    las consultas solo recorren las listas de sus términos (BM25).
+    """
+
+    def __init__(self, documents=None):
+        self.postings = {}      # término -> {usuario: frecuencia}
+        self.doc_terms = {}     # usuario -> {término: frecuencia}
+        self.doc_lengths = {}   # usuario -> cantidad de términos indexados
+        self.total_length = 0
+        if documents:
+            for username, text in documents.items():
+                self.update(username, text)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @staticmethod
+    def tokenize(text):
+        """Términos de un texto: sin tildes, sin mayúsculas y sin palabras vacías"""
+        return [word for word in _WORD_RE.findall(fold_accents(text))
+                if word not in SPANISH_STOPWORDS and (len(word) > 1 or word.isdigit())]
+
+    def remove(self, username):
+        """Quita la descripción de un usuario del índice"""
+        terms = self.doc_terms.pop(username, None)
+        if terms is None:
+            return False
+        for term in terms:
+            posting = self.postings[term]
+            del posting[username]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(username)
+        return True
+
+    def update(self, username, text):
+        """Indexa (o reindexa) la descripción de un usuario"""
+        self.remove(username)
+        tokens = self.tokenize(text or "")
+        if not tokens:
+            return
+        terms = {}
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + 1
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[username] = frequency
+        self.doc_terms[username] = terms
+        self.doc_lengths[username] = len(tokens)
+        self.total_length += len(tokens)
+
+    def search(self, query, offset=0, limit=20):
+        """
+        Descripciones que contienen algún término de la consulta, ordenadas por
+        BM25. Devuelve (total de coincidencias, [(usuario, puntaje)] de la página).
+        """
+        terms = set(self.tokenize(query))
+        num_docs = len(self.doc_lengths)
+        if not terms or not num_docs:
+            return 0, []
+        # Normalización por longitud: k1 * (1 - b + b * largo / largo_promedio)
+        base = BM25_K1 * (1 - BM25_B)
+        slope = BM25_K1 * BM25_B * num_docs / self.total_length
+        doc_lengths = self.doc_lengths
+
+        scores = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            document_frequency = len(posting)
+            idf = math.log(1 + (num_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+            weight = idf * (BM25_K1 + 1)
+            for username, frequency in posting.items():
+                scores[username] = (scores.get(username, 0.0)
+                                    + weight * frequency / (frequency + base + slope * doc_lengths[username]))
+
+        ranked = heapq.nsmallest(offset + limit, ((-score, username) for username, score in scores.items()))
+        return len(scores), [(username, -score) for score, username in ranked[offset:]]
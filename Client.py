@@ -3,39 +3,84 @@ import json
 import ssl
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
-import subprocess
 import os
-import tempfile
-import urllib.request
-import io
 import base64
-
-# Intentar importar PIL para manejo de imágenes
-try:
-    from PIL import Image, ImageTk
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    print("Advertencia: PIL/Pillow no está instalado. Las fotos de perfil se mostrarán como texto.")
-
-# Ruta de Graphviz
-GRAPHVIZ_PATH = r"C:\Program Files\Graphviz\bin"
+import hashlib
+import threading
+import time
+import random
+import itertools
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from Busqueda import TrigramIndex, FuzzyIndex, IncrementalFilter, AUTOCOMPLETE_TOP_K
+from Fotos import PhotoLoader, PIL_AVAILABLE
+from ListaVirtual import VirtualList, NetworkView
+from Replica import NetworkReplica
+from Dibujo import GraphCanvas, LayoutCache
+from Renderizado import GraphvizRenderer, open_file
+from Tareas import RequestExecutor, RenderScheduler
 
 # Ruta del certificado SSL del servidor
 CERT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.crt")
 
+# Segundos máximos de espera por una respuesta
+REQUEST_TIMEOUT = 60
+
+# Reconexión automática: espera inicial, espera máxima (se duplica) e intentos
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 8.0
+RECONNECT_ATTEMPTS = 8
+
+# Espera tras la última tecla antes de filtrar la lista de usuarios
+FILTER_DELAY_MS = 120
+
+# Resultados pedidos al servidor en la búsqueda ordenada por cercanía
+SOCIAL_SEARCH_LIMIT = 200
+
+# Acciones que se pueden reenviar sin riesgo si se cortó la conexión antes de la respuesta
+IDEMPOTENT_ACTIONS = {
+    "get_pending_requests", "get_sent_requests", "get_friends", "get_all_users",
+    "get_mutual_friends", "get_mutual_counts", "are_friends", "get_network", "get_ego_network",
+    "autocomplete", "search_users", "search_profiles", "get_user_profile", "find_path",
+    "get_statistics", "get_rankings", "get_communities", "get_cache_stats", "get_avatar"
+}
+
 
 class SocialNetworkClient:
     def __init__(self, host='localhost', port=5000):
         self.host = host
         self.port = port
         self.socket = None
-        self.connected = False
+        self.reader = None
+        self.connected = False  # Sigue en True mientras se intenta reconectar
         self.logged_in = False
         self.username = None
+        self.session_token = None  # Para reanudar la sesión tras una reconexión
+        self.versioned_cache = {}  # {acción: respuesta con "version"} para pedidos condicionales
+        self.pending = {}  # {id: [pedido, Future, enviado]} pedidos esperando respuesta
+        self.request_ids = itertools.count(1)
+        self.state_lock = threading.Lock()  # Protege socket, pending y el estado de reconexión
+        self.write_lock = threading.Lock()  # Un mensaje completo a la vez en el socket
+        self.ready = threading.Event()  # Hay un socket utilizable
+        self.closing = False
+        self.reconnecting = False
+        self.generation = 0  # Cambia con cada desconexión voluntaria (invalida reconexiones en curso)
     
     def connect(self):
         """Conecta al servidor usando SSL/TLS"""
+        self.closing = False
+        self.reconnecting = False
+        sock, message = self._open()
+        if sock is not None:
+            self.connected = True
+            self._mark_ready()
+        return sock is not None, message
+    
+    def _open(self, generation=None):
+        """
+        Abre el socket TLS e inicia el hilo que lee las respuestas. Devuelve
+        (socket o None, mensaje). Con `generation`, se descarta si hubo una
+        desconexión voluntaria mientras se conectaba.
+        """
         try:
             # Crear contexto SSL
             ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
@@ -53,41 +98,215 @@ class SocialNetworkClient:
             
             # Crear socket TCP y envolverlo con SSL
             raw_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket = ssl_context.wrap_socket(raw_socket, server_hostname=self.host)
-            self.socket.connect((self.host, self.port))
-            self.connected = True
-            return True, "🔒 Conectado al servidor (conexión encriptada)"
+            sock = ssl_context.wrap_socket(raw_socket, server_hostname=self.host)
+            sock.connect((self.host, self.port))
+            reader = sock.makefile('rb')
         except ssl.SSLError as ssl_err:
-            return False, f"Error SSL: {str(ssl_err)}"
+            return None, f"Error SSL: {str(ssl_err)}"
         except ConnectionRefusedError:
-            return False, "No se pudo conectar al servidor. ¿Está el servidor ejecutándose?"
+            return None, "No se pudo conectar al servidor. ¿Está el servidor ejecutándose?"
         except Exception as e:
-            return False, f"Error de conexión: {str(e)}"
+            return None, f"Error de conexión: {str(e)}"
+        
+        with self.state_lock:
+            if generation is not None and generation != self.generation:
+                sock.close()
+                return None, "Conexión descartada"
+            self.socket = sock
+            self.reader = reader
+        threading.Thread(target=self._read_responses, args=(sock, reader), daemon=True).start()
+        return sock, "🔒 Conectado al servidor (conexión encriptada)"
     
     def disconnect(self):
         """Desconecta del servidor"""
-        if self.socket:
+        with self.state_lock:
+            self.closing = True
+            self.generation += 1
+            self.ready.clear()
+            sock, self.socket = self.socket, None
+            pending = list(self.pending.values())
+            self.pending.clear()
+        if sock:
             try:
-                self.socket.close()
+                sock.close()
             except:
                 pass
+        for _, future, _ in pending:
+            future.set_exception(ConnectionError("Desconectado del servidor"))
         self.connected = False
         self.logged_in = False
         self.username = None
+        self.session_token = None
+        self.versioned_cache.clear()
+    
+    def submit_request(self, request):
+        """
+        Envía una solicitud sin esperar la respuesta y devuelve un Future.
+        Cada pedido lleva un id, así varios pueden estar en vuelo por la misma
+        conexión y las respuestas se asocian aunque lleguen en otro orden.
+        """
+        future = Future()
+        with self.state_lock:
+            if not self.connected:
+                future.set_result({"status": "error", "message": "No conectado al servidor"})
+                return future
+            request_id = next(self.request_ids)
+            ready = self.ready.is_set()
+            # Si se está reconectando, queda sin enviar y se envía al reconectar
+            self.pending[request_id] = [request, future, ready]
+            sock = self.socket
+        if ready:
+            self._write(sock, request_id, request)
+        return future
     
     def send_request(self, request):
-        """Envía una solicitud al servidor y recibe la respuesta"""
-        if not self.connected:
-            return {"status": "error", "message": "No conectado al servidor"}
-        
+        """Envía una solicitud al servidor y espera su respuesta"""
+        future = self.submit_request(request)
         try:
-            self.socket.send(json.dumps(request).encode('utf-8'))
-            response = self.socket.recv(4096).decode('utf-8')
-            return json.loads(response)
+            return future.result(timeout=REQUEST_TIMEOUT)
+        except FutureTimeout:
+            with self.state_lock:
+                for request_id, entry in list(self.pending.items()):
+                    if entry[1] is future:
+                        del self.pending[request_id]
+            return {"status": "error", "message": "El servidor no respondió a tiempo"}
         except Exception as e:
-            self.connected = False
             return {"status": "error", "message": f"Error de comunicación: {str(e)}"}
     
+    def _write(self, sock, request_id, request):
+        """Envía un pedido con su id (un JSON por línea)"""
+        message = json.dumps(dict(request, id=request_id)).encode('utf-8') + b"\n"
+        try:
+            with self.write_lock:
+                sock.sendall(message)
+        except OSError:
+            self._connection_lost(sock)
+    
+    def _read_responses(self, sock, reader):
+        """Hilo lector: entrega cada respuesta al Future de su pedido"""
+        try:
+            while True:
+                line = reader.readline()
+                if not line:
+                    break
+                try:
+                    response = json.loads(line)
+                except ValueError:
+                    continue
+                request_id = response.pop("id", None) if isinstance(response, dict) else None
+                with self.state_lock:
+                    entry = self.pending.pop(request_id, None)
+                if entry is not None:
+                    entry[1].set_result(response)
+        except (OSError, ValueError):
+            pass
+        self._connection_lost(sock)
+    
+    def _connection_lost(self, sock):
+        """
+        Se cortó la conexión: los pedidos enviados que modifican datos fallan
+        (pudieron aplicarse o no); los demás se reenvían al reconectar.
+        """
+        with self.state_lock:
+            if sock is not self.socket:
+                return  # ya se manejó, o fue un cierre voluntario
+            self.socket = None
+            self.ready.clear()
+            lost = []
+            for request_id, entry in list(self.pending.items()):
+                request, future, sent = entry
+                if sent and request.get("action") not in IDEMPOTENT_ACTIONS:
+                    del self.pending[request_id]
+                    lost.append(future)
+                else:
+                    entry[2] = False
+            start = not self.closing and not self.reconnecting
+            if start:
+                self.reconnecting = True
+        try:
+            sock.close()
+        except OSError:
+            pass
+        for future in lost:
+            future.set_exception(ConnectionError("Se perdió la conexión durante la operación; verifique y reintente"))
+        if start:
+            threading.Thread(target=self._reconnect, args=(self.generation,), daemon=True).start()
+    
+    def _reconnect(self, generation):
+        """Reintenta la conexión con espera exponencial y reanuda la sesión"""
+        delay = RECONNECT_BASE_DELAY
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            time.sleep(delay * random.uniform(0.5, 1.0))  # con variación para no sincronizar clientes
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            if self.generation != generation:
+                return  # hubo una desconexión voluntaria mientras tanto
+            sock, message = self._open(generation)
+            if sock is None:
+                if self.generation != generation:
+                    return
+                print(f"[CLIENTE] Reconexión {attempt}/{RECONNECT_ATTEMPTS} fallida: {message}")
+                continue
+            
+            if self.session_token is not None:
+                # Reanudar la sesión antes de reenviar los pedidos pendientes
+                future = Future()
+                with self.state_lock:
+                    request_id = next(self.request_ids)
+                    self.pending[request_id] = [{"action": "resume_session"}, future, True]
+                self._write(sock, request_id, {"action": "resume_session", "token": self.session_token})
+                try:
+                    response = future.result(timeout=REQUEST_TIMEOUT)
+                except Exception:
+                    self._connection_lost(sock)
+                    continue
+                if response.get("status") != "success":
+                    # La sesión expiró: se sigue conectado, pero hay que iniciar sesión de nuevo
+                    self.logged_in = False
+                    self.session_token = None
+            
+            self._mark_ready()
+            print("[CLIENTE] Reconectado al servidor")
+            return
+        
+        # Sin éxito: fallar todo lo pendiente
+        with self.state_lock:
+            if self.generation != generation:
+                return
+            self.connected = False
+            self.reconnecting = False
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for _, future, _ in pending:
+            future.set_exception(ConnectionError("No se pudo reconectar con el servidor"))
+    
+    def _mark_ready(self):
+        """Habilita el socket actual y envía los pedidos que esperaban la reconexión"""
+        with self.state_lock:
+            sock = self.socket
+            unsent = [(request_id, entry[0]) for request_id, entry in sorted(self.pending.items()) if not entry[2]]
+            for request_id, _ in unsent:
+                self.pending[request_id][2] = True
+            self.reconnecting = False
+            self.ready.set()
+        for request_id, request in unsent:
+            self._write(sock, request_id, request)
+    
+    def send_conditional(self, request):
+        """
+        Envía la versión que ya se tiene (if_version); si el servidor responde
+        "not_modified" se devuelve la respuesta guardada sin volver a transferirla.
+        """
+        action = request["action"]
+        cached = self.versioned_cache.get(action)
+        if cached is not None:
+            request = dict(request, if_version=cached["version"])
+        response = self.send_request(request)
+        if response.get("status") == "not_modified" and cached is not None:
+            return cached
+        if response.get("status") == "success" and "version" in response:
+            self.versioned_cache[action] = response
+        return response
+    
     def register(self, username, password):
         """Registra un nuevo usuario"""
         return self.send_request({
@@ -107,6 +326,8 @@ class SocialNetworkClient:
         if response.get("status") == "success":
             self.logged_in = True
             self.username = username
+            self.session_token = response.get("session_token")
+            self.versioned_cache.clear()
         
         return response
     
@@ -116,6 +337,8 @@ class SocialNetworkClient:
         if response.get("status") == "success":
             self.logged_in = False
             self.username = None
+            self.session_token = None
+            self.versioned_cache.clear()
         return response
     
     # ==================== SOLICITUDES DE AMISTAD ====================
@@ -126,11 +349,11 @@ class SocialNetworkClient:
     
     def get_pending_requests(self):
         """Obtiene solicitudes recibidas pendientes"""
-        return self.send_request({"action": "get_pending_requests"})
+        return self.send_conditional({"action": "get_pending_requests"})
     
     def get_sent_requests(self):
         """Obtiene solicitudes enviadas"""
-        return self.send_request({"action": "get_sent_requests"})
+        return self.send_conditional({"action": "get_sent_requests"})
     
     def accept_friend_request(self, from_user):
         """Acepta una solicitud de amistad"""
@@ -152,23 +375,47 @@ class SocialNetworkClient:
     
     def get_friends(self):
         """Obtiene la lista de amigos"""
-        return self.send_request({"action": "get_friends"})
+        return self.send_conditional({"action": "get_friends"})
     
     def get_all_users(self):
         """Obtiene todos los usuarios"""
         return self.send_request({"action": "get_all_users"})
     
-    def get_mutual_friends(self, other_user):
-        """Obtiene amigos en común"""
-        return self.send_request({"action": "get_mutual_friends", "other_user": other_user})
+    def get_mutual_friends(self, other_user, count_only=False):
+        """Obtiene amigos en común (o solo su cantidad)"""
+        return self.send_request({
+            "action": "get_mutual_friends",
+            "other_user": other_user,
+            "count_only": count_only
+        })
+    
+    def get_mutual_counts(self, users=None):
+        """
+        Obtiene la cantidad de amigos en común con cada usuario de la lista, o
+        con todos los que tienen alguno en común si no se indica lista
+        """
+        request = {"action": "get_mutual_counts"}
+        if users is not None:
+            request["users"] = users
+        return self.send_request(request)
     
     def are_friends(self, other_user):
         """Verifica si son amigos"""
         return self.send_request({"action": "are_friends", "other_user": other_user})
     
     def get_network(self):
-        """Obtiene toda la red"""
-        return self.send_request({"action": "get_network"})
+        """Obtiene toda la red (condicional: no se retransmite si no cambió)"""
+        return self.send_conditional({"action": "get_network"})
+    
+    def get_ego_network(self, username=None, k=2, max_nodes=150, policy="degree"):
+        """Obtiene la red de hasta k saltos alrededor de un usuario"""
+        return self.send_request({
+            "action": "get_ego_network",
+            "username": username,
+            "k": k,
+            "max_nodes": max_nodes,
+            "policy": policy
+        })
     
     def delete_account(self):
         """Elimina la cuenta"""
@@ -176,18 +423,39 @@ class SocialNetworkClient:
         if response.get("logout"):
             self.logged_in = False
             self.username = None
+            self.session_token = None
+            self.versioned_cache.clear()
         return response
     
     # ==================== BÚSQUEDA Y PERFIL ====================
     
-    def search_users(self, query):
-        """Busca usuarios por nombre"""
-        return self.send_request({"action": "search_users", "query": query})
+    def search_users(self, query, limit=50, fuzzy=False, max_distance=2, rank="relevance"):
+        """
+        Busca usuarios por nombre (resultados ordenados por relevancia o, si es difusa, por distancia).
+        rank="social" ordena por cercanía: amigos, amigos de amigos y luego el resto.
+        """
+        return self.send_request({"action": "search_users", "query": query, "limit": limit,
+                                  "fuzzy": fuzzy, "max_distance": max_distance, "rank": rank})
+    
+    def autocomplete(self, prefix, limit=AUTOCOMPLETE_TOP_K, exclude_related=False):
+        """
+        Sugerencias de usuarios por prefijo (los más populares primero). Con
+        exclude_related el servidor omite al usuario, sus amigos y sus solicitudes.
+        """
+        request = {"action": "autocomplete", "prefix": prefix, "limit": limit}
+        if exclude_related:
+            request["exclude_related"] = True
+        return self.send_request(request)
     
     def get_user_profile(self, username):
         """Obtiene el perfil de un usuario"""
         return self.send_request({"action": "get_user_profile", "username": username})
     
+    def search_profiles(self, query, page=1, page_size=20):
+        """Busca en las descripciones de perfil (ranking BM25, paginado)"""
+        return self.send_request({"action": "search_profiles", "query": query,
+                                  "page": page, "page_size": page_size})
+    
     def update_profile(self, description=None, photo_url=None):
         """Actualiza el perfil del usuario actual"""
         return self.send_request({
@@ -196,6 +464,40 @@ class SocialNetworkClient:
             "photo_url": photo_url
         })
     
+    def upload_avatar(self, path):
+        """
+        Sube una imagen local como avatar, por partes. Si el servidor ya tiene
+        ese contenido (mismo SHA-256) no se envían los bytes.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            return {"status": "error", "message": f"No se pudo leer la imagen: {e}"}
+        
+        response = self.send_request({"action": "begin_avatar_upload", "size": len(data),
+                                      "sha256": hashlib.sha256(data).hexdigest()})
+        if response.get("status") != "success" or "upload_id" not in response:
+            return response
+        
+        upload_id = response["upload_id"]
+        chunk_size = response["chunk_size"]
+        for offset in range(0, len(data), chunk_size):
+            response = self.send_request({
+                "action": "upload_avatar_chunk",
+                "upload_id": upload_id,
+                "offset": offset,
+                "data": base64.b64encode(data[offset:offset + chunk_size]).decode('ascii')
+            })
+            if response.get("status") != "success":
+                return response
+        return self.send_request({"action": "finish_avatar_upload", "upload_id": upload_id})
+    
+    def get_avatar(self, username, size=150, if_version=None):
+        """Miniatura PNG del avatar de un usuario (base64 en "data", hash en "version")"""
+        return self.send_request({"action": "get_avatar", "username": username,
+                                  "size": size, "if_version": if_version})
+    
     def find_path(self, from_user, to_user):
         """Busca un camino de amigos entre dos usuarios"""
         return self.send_request({
@@ -207,6 +509,18 @@ class SocialNetworkClient:
     def get_statistics(self):
         """Obtiene estadísticas de la red social"""
         return self.send_request({"action": "get_statistics"})
+    
+    def get_cache_stats(self):
+        """Obtiene los contadores de la caché de respuestas del servidor"""
+        return self.send_request({"action": "get_cache_stats"})
+    
+    def get_rankings(self, limit=10):
+        """Obtiene los rankings de influencia (PageRank e intermediación)"""
+        return self.send_request({"action": "get_rankings", "limit": limit})
+    
+    def get_communities(self):
+        """Obtiene la comunidad de cada usuario"""
+        return self.send_request({"action": "get_communities"})
 
 
 class LoginWindow:
@@ -335,11 +649,14 @@ class LoginWindow:
 
 
 class MainWindow:
-    def __init__(self, root, client, username, on_logout):
+    def __init__(self, root, client, username, on_logout, photo_loader, executor, graphviz):
         self.root = root
         self.client = client
         self.username = username
         self.on_logout = on_logout
+        self.photo_loader = photo_loader  # Fotos de perfil asíncronas (compartido entre sesiones)
+        self.executor = executor  # Pedidos al servidor en segundo plano
+        self.graphviz = graphviz  # Imágenes de Graphviz cacheadas (compartido entre sesiones)
         
         self.root.title(f"SocialTEC - {username}")
         self.root.geometry("950x700")
@@ -350,6 +667,17 @@ class MainWindow:
         self.friends_cache = []
         self.sent_cache = []
         self.pending_cache = []
+        self.mutual_counts_cache = {}
+        self.users_listbox_items = []  # Usuario mostrado en cada fila de la lista
+        self.users_index = TrigramIndex()  # Índice local para filtrar sin recorrer todo
+        self.users_filter = IncrementalFilter(self.users_index)  # Reutiliza el resultado al seguir escribiendo
+        self.filter_job = None  # id del filtrado programado con root.after
+        self.users_fuzzy_index = None  # Índice difuso local (se construye al primer uso)
+        self.autocomplete_jobs = {}  # combo -> id de la consulta programada con root.after
+        self.my_avatar = ""  # Hash del avatar propio subido al servidor
+        self.replica = NetworkReplica(client)  # Red local para consultas sin ir al servidor
+        self.graph_version = None  # Versión del grafo del último refresco
+        self.layouts = LayoutCache()  # Disposiciones del dibujo por versión del grafo
         
         self.create_widgets()
         self.refresh_data()
@@ -363,6 +691,15 @@ class MainWindow:
         ttk.Button(header_frame, text="🚪 Cerrar Sesión", command=self.do_logout).pack(side='right')
         ttk.Button(header_frame, text="🗑️ Eliminar Cuenta", command=self.do_delete_account).pack(side='right', padx=5)
         
+        # Barra de estado: pedidos en curso, con opción de cancelarlos
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 5))
+        self.busy_label = ttk.Label(status_frame, text="", font=('Arial', 9), foreground='gray')
+        self.busy_label.pack(side='left')
+        self.busy_cancel_btn = ttk.Button(status_frame, text="✖ Cancelar", command=self.executor.cancel_all)
+        self.busy_progress = ttk.Progressbar(status_frame, mode='indeterminate', length=120)
+        self.executor.on_busy = self.show_busy
+        
         # Notebook (pestañas)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
@@ -375,6 +712,48 @@ class MainWindow:
         self.create_queries_tab()
         self.create_visualization_tab()
         self.create_network_tab()
+        
+        # Cada vista se redibuja solo si cambió su contenido y su pestaña está visible
+        tabs = self.notebook.tabs()
+        self.renderer = RenderScheduler(self.root, self.notebook)
+        self.renderer.register("solicitudes", self.render_requests, tabs[0])
+        self.renderer.register("amigos", self.render_friends, tabs[1])
+        self.renderer.register("usuarios", self.filter_users_list, tabs[2])
+        self.renderer.register("perfil", self.render_profile_stats, tabs[3])
+        self.renderer.register("consultas", self.render_query_combos, tabs[4])
+        self.renderer.register("grafo", self.render_graph_tab, tabs[5])
+        self.renderer.register("red", self.update_network_view, tabs[6])
+    
+    # ==================== PEDIDOS EN SEGUNDO PLANO ====================
+    def run_async(self, label, fn, *args, on_success=None, key=None):
+        """Ejecuta un pedido en segundo plano; los errores inesperados se muestran en un diálogo"""
+        return self.executor.submit(fn, *args, on_success=on_success, label=label, key=key,
+                                    on_error=lambda e: messagebox.showerror("Error", str(e)))
+    
+    def show_busy(self, labels):
+        """Indicador de carga con los pedidos en curso"""
+        if labels:
+            self.busy_label.config(text="⏳ " + ", ".join(dict.fromkeys(labels)) + "...")
+            if not self.busy_progress.winfo_manager():
+                self.busy_cancel_btn.pack(side='right')
+                self.busy_progress.pack(side='right', padx=5)
+                self.busy_progress.start(15)
+        else:
+            self.busy_label.config(text="")
+            self.busy_progress.stop()
+            self.busy_progress.pack_forget()
+            self.busy_cancel_btn.pack_forget()
+    
+    def show_action_result(self, response, window=None):
+        """Resultado de una acción que modifica datos: avisa y refresca"""
+        if response.get("status") == "success":
+            messagebox.showinfo("Éxito", response.get("message"))
+            if window is not None and window.winfo_exists():
+                window.destroy()
+            self.replica.invalidate()
+            self.refresh_data()
+        else:
+            messagebox.showerror("Error", response.get("message"))
     
     # ==================== PESTAÑA DE SOLICITUDES ====================
     def create_requests_tab(self):
@@ -386,8 +765,9 @@ class MainWindow:
         send_frame.pack(fill='x', padx=10, pady=10)
         
         ttk.Label(send_frame, text="Enviar solicitud a:").grid(row=0, column=0, padx=5)
-        self.send_request_combo = ttk.Combobox(send_frame, width=25, state="readonly")
+        self.send_request_combo = ttk.Combobox(send_frame, width=25)
         self.send_request_combo.grid(row=0, column=1, padx=5)
+        self.setup_autocomplete(self.send_request_combo, self.is_available_for_request, exclude_related=True)
         
         send_btn = tk.Button(send_frame, text="📤 Enviar Solicitud", command=self.send_friend_request,
                              bg='#2196F3', fg='white', font=('Arial', 10, 'bold'))
@@ -441,17 +821,13 @@ class MainWindow:
         ttk.Button(requests_frame, text="🔄 Actualizar", command=self.refresh_data).pack(side='bottom', pady=10)
     
     def send_friend_request(self):
-        to_user = self.send_request_combo.get()
+        to_user = self.send_request_combo.get().strip()
         if not to_user:
             messagebox.showwarning("Advertencia", "Seleccione un usuario")
             return
         
-        response = self.client.send_friend_request(to_user)
-        if response.get("status") == "success":
-            messagebox.showinfo("Éxito", response.get("message"))
-            self.refresh_data()
-        else:
-            messagebox.showerror("Error", response.get("message"))
+        self.run_async("Enviando solicitud", self.client.send_friend_request, to_user,
+                       on_success=self.show_action_result)
     
     def accept_request(self):
         selection = self.pending_listbox.curselection()
@@ -460,13 +836,8 @@ class MainWindow:
             return
         
         from_user = self.pending_listbox.get(selection[0]).replace("👤 ", "")
-        response = self.client.accept_friend_request(from_user)
-        
-        if response.get("status") == "success":
-            messagebox.showinfo("Éxito", response.get("message"))
-            self.refresh_data()
-        else:
-            messagebox.showerror("Error", response.get("message"))
+        self.run_async("Aceptando solicitud", self.client.accept_friend_request, from_user,
+                       on_success=self.show_action_result)
     
     def reject_request(self):
         selection = self.pending_listbox.curselection()
@@ -477,13 +848,8 @@ class MainWindow:
         from_user = self.pending_listbox.get(selection[0]).replace("👤 ", "")
         
         if messagebox.askyesno("Confirmar", f"¿Rechazar solicitud de '{from_user}'?"):
-            response = self.client.reject_friend_request(from_user)
-            
-            if response.get("status") == "success":
-                messagebox.showinfo("Éxito", response.get("message"))
-                self.refresh_data()
-            else:
-                messagebox.showerror("Error", response.get("message"))
+            self.run_async("Rechazando solicitud", self.client.reject_friend_request, from_user,
+                           on_success=self.show_action_result)
     
     def cancel_request(self):
         selection = self.sent_listbox.curselection()
@@ -494,13 +860,8 @@ class MainWindow:
         to_user = self.sent_listbox.get(selection[0]).replace("⏳ ", "")
         
         if messagebox.askyesno("Confirmar", f"¿Cancelar solicitud a '{to_user}'?"):
-            response = self.client.cancel_friend_request(to_user)
-            
-            if response.get("status") == "success":
-                messagebox.showinfo("Éxito", response.get("message"))
-                self.refresh_data()
-            else:
-                messagebox.showerror("Error", response.get("message"))
+            self.run_async("Cancelando solicitud", self.client.cancel_friend_request, to_user,
+                           on_success=self.show_action_result)
     
     # ==================== PESTAÑA DE AMIGOS ====================
     def create_friends_tab(self):
@@ -538,12 +899,8 @@ class MainWindow:
             return
         
         if messagebox.askyesno("Confirmar", f"¿Eliminar a '{friend}' de tus amigos?"):
-            response = self.client.remove_friend(friend)
-            if response.get("status") == "success":
-                messagebox.showinfo("Éxito", response.get("message"))
-                self.refresh_data()
-            else:
-                messagebox.showerror("Error", response.get("message"))
+            self.run_async("Eliminando amigo", self.client.remove_friend, friend,
+                           on_success=self.show_action_result)
     
     # ==================== PESTAÑA DE USUARIOS ====================
     def create_users_tab(self):
@@ -567,15 +924,27 @@ class MainWindow:
                               bg='#9E9E9E', fg='white', font=('Arial', 10))
         clear_btn.grid(row=0, column=3, padx=5)
         
+        self.fuzzy_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(search_frame, text="Tolerar errores", variable=self.fuzzy_var,
+                        command=self.filter_users_list).grid(row=0, column=4, padx=5)
+        
+        ttk.Label(search_frame, text="Orden:").grid(row=0, column=5, padx=(10, 2))
+        self.search_order_combo = ttk.Combobox(search_frame, width=10, state="readonly",
+                                               values=["relevancia", "cercanía"])
+        self.search_order_combo.set("relevancia")
+        self.search_order_combo.grid(row=0, column=6, padx=2)
+        self.search_order_combo.bind('<<ComboboxSelected>>', lambda e: self.filter_users_list())
+        self.search_info_label = ttk.Label(search_frame, text="", font=('Arial', 9), foreground='gray')
+        self.search_info_label.grid(row=0, column=7, padx=5)
+        
         list_frame = ttk.LabelFrame(users_frame, text="Usuarios Registrados", padding=10)
         list_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        self.users_listbox = tk.Listbox(list_frame, font=('Consolas', 11))
-        self.users_listbox.pack(fill='both', expand=True, side='left')
-        self.users_listbox.bind('<Double-Button-1>', self.on_user_double_click)
-        scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.users_listbox.yview)
-        scrollbar.pack(side='right', fill='y')
-        self.users_listbox.config(yscrollcommand=scrollbar.set)
+        # Solo se dibujan las filas visibles: la lista puede tener decenas de miles de usuarios
+        self.users_listbox = VirtualList(list_frame, font=('Consolas', 11),
+                                         empty_text="No se encontraron usuarios",
+                                         on_activate=lambda i: self.view_selected_profile())
+        self.users_listbox.pack(fill='both', expand=True)
         
         # Botón para ver perfil
         btn_frame = ttk.Frame(users_frame)
@@ -591,52 +960,145 @@ class MainWindow:
         ttk.Label(legend_frame, text="Leyenda: ✓ = Amigo | ⏳ = Solicitud enviada | 📬 = Te envió solicitud | Doble clic = Ver perfil", 
                   font=('Arial', 9)).pack()
     
+    # ==================== AUTOCOMPLETADO ====================
+    
+    def setup_autocomplete(self, combo, accept=None, delay_ms=150, exclude_related=False):
+        """
+        Combo editable que pide sugerencias al servidor mientras se escribe
+        (consulta diferida: solo se envía cuando se deja de teclear `delay_ms`).
+        Con `exclude_related` el servidor ya omite amigos y solicitudes y
+        completa las k sugerencias; `accept` vuelve a filtrar en el cliente.
+        """
+        def on_key(event):
+            if event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+                return
+            job = self.autocomplete_jobs.pop(combo, None)
+            if job is not None:
+                self.root.after_cancel(job)
+            self.autocomplete_jobs[combo] = self.root.after(delay_ms, lambda: self.load_suggestions(combo, accept, exclude_related))
+        
+        combo.bind('<KeyRelease>', on_key)
+    
+    def load_suggestions(self, combo, accept=None, exclude_related=False):
+        """Consulta el trie de autocompletado del servidor y llena el combo"""
+        self.autocomplete_jobs.pop(combo, None)
+        prefix = combo.get().strip()
+        if not prefix:
+            combo['values'] = []
+            return
+        
+        def show(response):
+            if response.get("status") != "success" or combo.get().strip() != prefix:
+                return  # el texto cambió mientras llegaba la respuesta
+            suggestions = response.get("suggestions", [])
+            if accept:
+                # Por si las listas locales cambiaron mientras llegaba la respuesta
+                suggestions = [u for u in suggestions if accept(u)]
+            combo['values'] = suggestions
+        
+        self.run_async(None, self.client.autocomplete, prefix, AUTOCOMPLETE_TOP_K, exclude_related,
+                       on_success=show, key=("autocompletar", str(combo)))
+    
+    def is_available_for_request(self, user):
+        """Usuarios a los que se puede enviar solicitud (no amigos, sin solicitudes pendientes)"""
+        return (user != self.username
+                and user not in self.friends_cache
+                and user not in self.sent_cache
+                and user not in self.pending_cache)
+    
     def on_search_key(self, event):
-        """Búsqueda en tiempo real al escribir (filtrado local)"""
-        self.filter_users_list()
+        """Búsqueda en tiempo real al escribir (diferida hasta dejar de teclear)"""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(FILTER_DELAY_MS, self.filter_users_list)
     
     def do_search(self):
         """Realiza la búsqueda de usuarios (filtrado local)"""
         self.filter_users_list()
     
     def filter_users_list(self):
-        """Filtra la lista de usuarios localmente según el texto de búsqueda"""
+        """
+        Filtra la lista de usuarios según el texto de búsqueda: localmente por
+        relevancia, o en el servidor (rank="social") al ordenar por cercanía
+        """
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+            self.filter_job = None
         query = self.search_entry.get().strip().lower()
         
-        # Usar los datos en caché
+        if query and self.search_order_combo.get() == "cercanía":
+            def show(response):
+                if self.search_entry.get().strip().lower() != query or self.search_order_combo.get() != "cercanía":
+                    return  # la búsqueda cambió mientras llegaba la respuesta
+                if response.get("status") != "success":
+                    self.search_info_label.config(text=response.get("message", ""))
+                    return
+                results = response.get("results", [])
+                if not results and self.fuzzy_var.get():
+                    self.show_local_search(query)  # sin coincidencias: búsqueda tolerante a errores
+                    return
+                self.search_info_label.config(text=f"Orden por cercanía: {response.get('ranking_ms')} ms en el servidor")
+                self.show_users_list(results, mutual_counts=response.get("mutual_counts", {}))
+            
+            self.run_async("Buscando", self.client.search_users, query, SOCIAL_SEARCH_LIMIT, False, 2, "social",
+                           on_success=show, key="busqueda")
+            return
+        self.show_local_search(query)
+    
+    def show_local_search(self, query):
+        """Filtrado local con el índice de trigramas (o difuso si no hay coincidencias)"""
+        self.search_info_label.config(text="")
+        distances = {}
         if query:
-            # Filtrar usuarios que contengan el texto de búsqueda
-            filtered_users = [u for u in self.all_users_cache if query in u.lower()]
+            # Filtrar con el índice de trigramas (ordenado por relevancia); si la
+            # consulta solo se alargó, se filtra el resultado anterior
+            filtered_users = self.users_filter.search(query)
+            if not filtered_users and self.fuzzy_var.get():
+                # Sin coincidencias exactas: buscar nombres con errores de escritura
+                if self.users_fuzzy_index is None:
+                    self.users_fuzzy_index = FuzzyIndex(self.all_users_cache)
+                matches = self.users_fuzzy_index.search(query, limit=100)
+                filtered_users = [user for user, _ in matches]
+                distances = dict(matches)
         else:
             # Mostrar todos los usuarios si no hay búsqueda
             filtered_users = self.all_users_cache
+        self.show_users_list(filtered_users, distances)
+    
+    def show_users_list(self, users, distances=None, mutual_counts=None):
+        """Actualiza la lista: las etiquetas se arman solo para las filas visibles"""
+        items = list(users)
+        distances = distances or {}
+        mutual_counts = self.mutual_counts_cache if mutual_counts is None else mutual_counts
+        friends, sent, pending = set(self.friends_cache), set(self.sent_cache), set(self.pending_cache)
+        
+        def label(i):
+            user = items[i]
+            if user == self.username:
+                return f"👤 {user} (tú)"
+            if user in friends:
+                text = f"👤 {user} ✓"
+            elif user in sent:
+                text = f"👤 {user} ⏳"
+            elif user in pending:
+                text = f"👤 {user} 📬"
+            else:
+                text = f"👤 {user}"
+            mutual = mutual_counts.get(user, 0)
+            if mutual:
+                text += f"  · {mutual} en común"
+            if user in distances:
+                text += f"  (~{distances[user]})"
+            return text
         
-        # Actualizar la lista
-        self.users_listbox.delete(0, tk.END)
-        if filtered_users:
-            for user in filtered_users:
-                if user == self.username:
-                    self.users_listbox.insert(tk.END, f"👤 {user} (tú)")
-                elif user in self.friends_cache:
-                    self.users_listbox.insert(tk.END, f"👤 {user} ✓")
-                elif user in self.sent_cache:
-                    self.users_listbox.insert(tk.END, f"👤 {user} ⏳")
-                elif user in self.pending_cache:
-                    self.users_listbox.insert(tk.END, f"👤 {user} 📬")
-                else:
-                    self.users_listbox.insert(tk.END, f"👤 {user}")
-        else:
-            self.users_listbox.insert(tk.END, "No se encontraron usuarios")
+        self.users_listbox_items = items
+        self.users_listbox.set_items(len(items), label)
     
     def clear_search(self):
         """Limpia la búsqueda y muestra todos los usuarios"""
         self.search_entry.delete(0, tk.END)
         self.refresh_data()
     
-    def on_user_double_click(self, event):
-        """Abre el perfil al hacer doble clic en un usuario"""
-        self.view_selected_profile()
-    
     def view_selected_profile(self):
         """Muestra el perfil del usuario seleccionado"""
         selection = self.users_listbox.curselection()
@@ -644,25 +1106,49 @@ class MainWindow:
             messagebox.showwarning("Advertencia", "Seleccione un usuario")
             return
         
-        user_text = self.users_listbox.get(selection[0])
-        # Extraer nombre de usuario quitando emoji y marcadores
-        username = user_text.replace("👤 ", "").split(" ")[0]
-        if "(tú)" in user_text:
-            username = user_text.replace("👤 ", "").replace(" (tú)", "")
-        elif "✓" in user_text:
-            username = user_text.replace("👤 ", "").replace(" ✓", "")
-        elif "⏳" in user_text:
-            username = user_text.replace("👤 ", "").replace(" ⏳", "")
-        elif "📬" in user_text:
-            username = user_text.replace("👤 ", "").replace(" 📬", "")
-        else:
-            username = user_text.replace("👤 ", "").strip()
+        # La fila seleccionada corresponde al mismo índice de la lista filtrada
+        if selection[0] >= len(self.users_listbox_items):
+            return
+        username = self.users_listbox_items[selection[0]]
         
         self.show_user_profile_window(username)
     
+    def load_profile_bundle(self, username):
+        """Perfil y relación con el usuario actual (se ejecuta en segundo plano)"""
+        response = self.client.get_user_profile(username)
+        bundle = {"response": response, "counts": {}, "are_friends": False, "sent": [], "pending": []}
+        if response.get("status") != "success":
+            return bundle
+        
+        # Amigos en común con cada uno, en una sola petición
+        friends = response.get("profile", {}).get("friends", [])
+        if friends:
+            counts_response = self.client.get_mutual_counts(friends)
+            if counts_response.get("status") == "success":
+                bundle["counts"] = counts_response.get("mutual_counts", {})
+        
+        if username != self.username:
+            are_friends_response = self.client.are_friends(username)
+            bundle["are_friends"] = (are_friends_response.get("status") == "success"
+                                     and are_friends_response.get("are_friends"))
+            if not bundle["are_friends"]:
+                # Verificar si ya se envió o se recibió solicitud
+                sent_response = self.client.get_sent_requests()
+                if sent_response.get("status") == "success":
+                    bundle["sent"] = sent_response.get("sent_requests", [])
+                pending_response = self.client.get_pending_requests()
+                if pending_response.get("status") == "success":
+                    bundle["pending"] = pending_response.get("pending_requests", [])
+        return bundle
+    
     def show_user_profile_window(self, username):
+        """Pide el perfil en segundo plano y luego abre su ventana"""
+        self.run_async(f"Perfil de {username}", self.load_profile_bundle, username,
+                       on_success=lambda bundle: self.build_profile_window(username, bundle))
+    
+    def build_profile_window(self, username, bundle):
         """Muestra una ventana con el perfil del usuario"""
-        response = self.client.get_user_profile(username)
+        response = bundle["response"]
         if response.get("status") != "success":
             messagebox.showerror("Error", response.get("message"))
             return
@@ -684,7 +1170,8 @@ class MainWindow:
         photo_frame.pack(pady=10)
         
         photo_url = profile.get("photo_url", "")
-        self.display_profile_photo(photo_frame, photo_url, size=150)
+        self.display_profile_photo(photo_frame, photo_url, size=150,
+                                   owner=username, avatar=profile.get("avatar", ""))
         
         # Nombre de usuario
         ttk.Label(main_frame, text=f"👤 {username}", font=('Arial', 18, 'bold')).pack(pady=10)
@@ -695,6 +1182,12 @@ class MainWindow:
         
         friends_count = profile.get("friends_count", 0)
         ttk.Label(stats_frame, text=f"👥 {friends_count} amigo(s)", font=('Arial', 12)).pack()
+        if "community" in profile:
+            ttk.Label(stats_frame, text=f"🏘️ Comunidad #{profile['community']}",
+                      font=('Arial', 10), foreground='gray').pack()
+        if "triangles" in profile:
+            ttk.Label(stats_frame, text=f"🔺 {profile['triangles']} triángulo(s) | Clustering: {profile['clustering']}",
+                      font=('Arial', 10), foreground='gray').pack()
         
         # Descripción
         desc_frame = ttk.LabelFrame(main_frame, text="📝 Descripción", padding=10)
@@ -718,8 +1211,13 @@ class MainWindow:
             scrollbar = ttk.Scrollbar(friends_frame, orient='vertical', command=friends_listbox.yview)
             scrollbar.pack(side='right', fill='y')
             friends_listbox.config(yscrollcommand=scrollbar.set)
+            counts = bundle["counts"]
             for friend in friends:
-                friends_listbox.insert(tk.END, f"  👤 {friend}")
+                mutual = counts.get(friend, 0)
+                if friend != self.username and mutual:
+                    friends_listbox.insert(tk.END, f"  👤 {friend}  · {mutual} en común")
+                else:
+                    friends_listbox.insert(tk.END, f"  👤 {friend}")
         else:
             ttk.Label(friends_frame, text="(Sin amigos aún)", font=('Arial', 10, 'italic'), foreground='gray').pack()
         
@@ -728,67 +1226,58 @@ class MainWindow:
             btn_frame = ttk.Frame(main_frame)
             btn_frame.pack(pady=10)
             
-            are_friends_response = self.client.are_friends(username)
-            if are_friends_response.get("status") == "success" and are_friends_response.get("are_friends"):
+            if bundle["are_friends"]:
                 # Ya son amigos - mostrar botón para eliminar amistad
                 ttk.Label(btn_frame, text="✓ Son amigos", foreground='green', font=('Arial', 11, 'bold')).pack(pady=5)
                 remove_btn = tk.Button(btn_frame, text="❌ Eliminar amistad", 
                                        command=lambda: self.remove_friend_from_profile(username, profile_window),
                                        bg='#f44336', fg='white', font=('Arial', 10, 'bold'))
                 remove_btn.pack()
+            elif username in bundle["sent"]:
+                ttk.Label(btn_frame, text="⏳ Solicitud enviada", foreground='orange', font=('Arial', 11)).pack()
+            elif username in bundle["pending"]:
+                accept_btn = tk.Button(btn_frame, text="✅ Aceptar solicitud", 
+                                       command=lambda: self.accept_from_profile(username, profile_window),
+                                       bg='#4CAF50', fg='white', font=('Arial', 10, 'bold'))
+                accept_btn.pack()
             else:
-                # Verificar si ya se envió solicitud
-                sent_response = self.client.get_sent_requests()
-                sent = sent_response.get("sent_requests", []) if sent_response.get("status") == "success" else []
-                
-                pending_response = self.client.get_pending_requests()
-                pending = pending_response.get("pending_requests", []) if pending_response.get("status") == "success" else []
-                
-                if username in sent:
-                    ttk.Label(btn_frame, text="⏳ Solicitud enviada", foreground='orange', font=('Arial', 11)).pack()
-                elif username in pending:
-                    accept_btn = tk.Button(btn_frame, text="✅ Aceptar solicitud", 
-                                           command=lambda: self.accept_from_profile(username, profile_window),
-                                           bg='#4CAF50', fg='white', font=('Arial', 10, 'bold'))
-                    accept_btn.pack()
-                else:
-                    add_btn = tk.Button(btn_frame, text="➕ Enviar solicitud de amistad", 
-                                        command=lambda: self.send_request_from_profile(username, profile_window),
-                                        bg='#2196F3', fg='white', font=('Arial', 10, 'bold'))
-                    add_btn.pack()
+                add_btn = tk.Button(btn_frame, text="➕ Enviar solicitud de amistad", 
+                                    command=lambda: self.send_request_from_profile(username, profile_window),
+                                    bg='#2196F3', fg='white', font=('Arial', 10, 'bold'))
+                add_btn.pack()
         
         # Botón cerrar
         tk.Button(main_frame, text="Cerrar", command=profile_window.destroy,
                   font=('Arial', 10), padx=20, pady=5).pack(pady=10)
     
-    def display_profile_photo(self, frame, url_or_path, size=100):
-        """Muestra la foto de perfil desde una URL o archivo local"""
+    def display_profile_photo(self, frame, url_or_path, size=100, owner=None, avatar=""):
+        """
+        Muestra la foto de perfil (carga en segundo plano): el avatar subido al
+        servidor si `avatar` trae su hash, o si no la URL o archivo local.
+        """
         photo_label = ttk.Label(frame)
         photo_label.pack()
         
+        fetch = None
+        if avatar and not (url_or_path and url_or_path.strip()):
+            # El hash identifica el contenido: sirve de clave para las cachés locales
+            url_or_path = f"avatar:{avatar}"
+            fetch = lambda: self.fetch_avatar(owner, size)
+        
         if url_or_path and url_or_path.strip() and PIL_AVAILABLE:
-            try:
-                # Verificar si es un archivo local o URL
-                if os.path.isfile(url_or_path):
-                    # Es un archivo local
-                    image = Image.open(url_or_path)
-                elif url_or_path.startswith(('http://', 'https://')):
-                    # Es una URL
-                    with urllib.request.urlopen(url_or_path, timeout=5) as response:
-                        image_data = response.read()
-                    image = Image.open(io.BytesIO(image_data))
+            # Placeholder mientras el cargador descarga y redimensiona en otro hilo
+            photo_label.config(text="⏳", font=('Arial', 40))
+            
+            def show(photo):
+                if not photo_label.winfo_exists():
+                    return  # la ventana se cerró antes de terminar la carga
+                if photo is None:
+                    photo_label.config(text="📷", font=('Arial', 40))
                 else:
-                    # Podría ser una ruta relativa o inválida
-                    raise Exception("Ruta no válida")
-                
-                image = image.resize((size, size), Image.Resampling.LANCZOS)
-                
-                photo = ImageTk.PhotoImage(image)
-                photo_label.config(image=photo)
-                photo_label.image = photo  # Mantener referencia
-            except Exception as e:
-                # Si falla, mostrar placeholder
-                photo_label.config(text="📷", font=('Arial', 40))
+                    photo_label.config(image=photo, text="")
+                    photo_label.image = photo  # Mantener referencia
+            
+            self.photo_loader.load(url_or_path.strip(), size, show, fetch)
         elif url_or_path and url_or_path.strip() and not PIL_AVAILABLE:
             # PIL no disponible, mostrar indicador con URL
             photo_label.config(text="🖼️", font=('Arial', 40))
@@ -798,36 +1287,28 @@ class MainWindow:
             # Sin foto, mostrar placeholder
             photo_label.config(text="📷", font=('Arial', 40))
     
+    def fetch_avatar(self, username, size):
+        """Descarga la miniatura del avatar (se ejecuta en un hilo del cargador de fotos)"""
+        response = self.client.get_avatar(username, size)
+        if response.get("status") != "success":
+            raise ValueError(response.get("message"))
+        return base64.b64decode(response["data"])
+    
     def send_request_from_profile(self, username, window):
         """Envía solicitud de amistad desde la ventana de perfil"""
-        response = self.client.send_friend_request(username)
-        if response.get("status") == "success":
-            messagebox.showinfo("Éxito", response.get("message"))
-            window.destroy()
-            self.refresh_data()
-        else:
-            messagebox.showerror("Error", response.get("message"))
+        self.run_async("Enviando solicitud", self.client.send_friend_request, username,
+                       on_success=lambda response: self.show_action_result(response, window))
     
     def accept_from_profile(self, username, window):
         """Acepta solicitud desde la ventana de perfil"""
-        response = self.client.accept_friend_request(username)
-        if response.get("status") == "success":
-            messagebox.showinfo("Éxito", response.get("message"))
-            window.destroy()
-            self.refresh_data()
-        else:
-            messagebox.showerror("Error", response.get("message"))
+        self.run_async("Aceptando solicitud", self.client.accept_friend_request, username,
+                       on_success=lambda response: self.show_action_result(response, window))
     
     def remove_friend_from_profile(self, username, window):
         """Elimina amistad desde la ventana de perfil"""
         if messagebox.askyesno("Confirmar", f"¿Eliminar a '{username}' de tus amigos?"):
-            response = self.client.remove_friend(username)
-            if response.get("status") == "success":
-                messagebox.showinfo("Éxito", response.get("message"))
-                window.destroy()
-                self.refresh_data()
-            else:
-                messagebox.showerror("Error", response.get("message"))
+            self.run_async("Eliminando amigo", self.client.remove_friend, username,
+                           on_success=lambda response: self.show_action_result(response, window))
     
     # ==================== PESTAÑA DE MI PERFIL ====================
     def create_profile_tab(self):
@@ -882,13 +1363,18 @@ class MainWindow:
     
     def load_my_profile(self):
         """Carga los datos del perfil del usuario actual"""
-        response = self.client.get_user_profile(self.username)
+        self.run_async("Mi perfil", self.client.get_user_profile, self.username,
+                       on_success=self.show_my_profile, key="mi_perfil")
+    
+    def show_my_profile(self, response):
+        """Llena la pestaña de perfil con la respuesta del servidor"""
         if response.get("status") == "success":
             profile = response.get("profile", {})
             
             # Actualizar campos
             self.photo_url_entry.delete(0, tk.END)
             self.photo_url_entry.insert(0, profile.get("photo_url", ""))
+            self.my_avatar = profile.get("avatar", "")
             
             self.description_text.delete(1.0, tk.END)
             self.description_text.insert(tk.END, profile.get("description", ""))
@@ -928,19 +1414,42 @@ class MainWindow:
             widget.destroy()
         
         url = self.photo_url_entry.get().strip()
-        self.display_profile_photo(self.photo_display_frame, url, size=120)
+        self.display_profile_photo(self.photo_display_frame, url, size=120,
+                                   owner=self.username, avatar=self.my_avatar)
     
     def save_profile(self):
-        """Guarda los cambios del perfil"""
+        """Guarda los cambios del perfil (la subida de la foto corre en segundo plano)"""
         description = self.description_text.get(1.0, tk.END).strip()
         photo_url = self.photo_url_entry.get().strip()
         
-        response = self.client.update_profile(description=description, photo_url=photo_url)
-        if response.get("status") == "success":
+        def save():
+            avatar = None
+            url = photo_url
+            if url and os.path.isfile(url):
+                # Las imágenes locales se suben al servidor para que todos puedan verlas
+                response = self.client.upload_avatar(url)
+                if response.get("status") != "success":
+                    return response, None
+                avatar = response["avatar"]
+                url = None
+            response = self.client.update_profile(description=description, photo_url=url)
+            if response.get("status") == "success" and url:
+                avatar = ""  # la foto externa reemplaza al avatar
+            return response, avatar
+        
+        def done(result):
+            response, avatar = result
+            if response.get("status") != "success":
+                messagebox.showerror("Error", response.get("message"))
+                return
+            if avatar is not None:
+                self.my_avatar = avatar
+                if avatar:
+                    self.photo_url_entry.delete(0, tk.END)
             messagebox.showinfo("Éxito", "Perfil actualizado correctamente")
             self.preview_photo()
-        else:
-            messagebox.showerror("Error", response.get("message"))
+        
+        self.run_async("Guardando perfil", save, on_success=done, key="guardar_perfil")
     
     # ==================== PESTAÑA DE CONSULTAS ====================
     def create_queries_tab(self):
@@ -961,24 +1470,45 @@ class MainWindow:
         path_frame.pack(fill='x', padx=10, pady=5)
         
         ttk.Label(path_frame, text="Desde:").grid(row=0, column=0, padx=5)
-        self.path_from_combo = ttk.Combobox(path_frame, width=20, state="readonly")
+        self.path_from_combo = ttk.Combobox(path_frame, width=20)
         self.path_from_combo.grid(row=0, column=1, padx=5)
+        self.setup_autocomplete(self.path_from_combo)
         
         ttk.Label(path_frame, text="Hasta:").grid(row=0, column=2, padx=5)
-        self.path_to_combo = ttk.Combobox(path_frame, width=20, state="readonly")
+        self.path_to_combo = ttk.Combobox(path_frame, width=20)
         self.path_to_combo.grid(row=0, column=3, padx=5)
+        self.setup_autocomplete(self.path_to_combo)
         
         path_btn = tk.Button(path_frame, text="🔍 Buscar Camino", command=self.find_friend_path,
                              bg='#673AB7', fg='white', font=('Arial', 10, 'bold'))
         path_btn.grid(row=0, column=4, padx=10)
         
+        # Buscar en descripciones de perfil
+        profiles_frame = ttk.LabelFrame(queries_frame, text="📝 Buscar en Perfiles", padding=10)
+        profiles_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Label(profiles_frame, text="Texto:").grid(row=0, column=0, padx=5)
+        self.profile_search_entry = ttk.Entry(profiles_frame, width=30)
+        self.profile_search_entry.grid(row=0, column=1, padx=5)
+        self.profile_search_entry.bind('<Return>', lambda e: self.show_profile_search(1))
+        ttk.Button(profiles_frame, text="Buscar", command=lambda: self.show_profile_search(1)).grid(row=0, column=2, padx=5)
+        ttk.Button(profiles_frame, text="◀", width=3,
+                   command=lambda: self.show_profile_search(self.profile_search_page - 1)).grid(row=0, column=3, padx=2)
+        ttk.Button(profiles_frame, text="▶", width=3,
+                   command=lambda: self.show_profile_search(self.profile_search_page + 1)).grid(row=0, column=4, padx=2)
+        self.profile_search_page = 1
+        
         # Estadísticas de la red
         stats_frame = ttk.LabelFrame(queries_frame, text="📊 Estadísticas de la Red", padding=10)
         stats_frame.pack(fill='x', padx=10, pady=5)
         
         stats_btn = tk.Button(stats_frame, text="📊 Obtener Estadísticas", command=self.show_statistics,
                               bg='#FF5722', fg='white', font=('Arial', 10, 'bold'))
-        stats_btn.pack(pady=5)
+        stats_btn.pack(side='left', padx=5, pady=5)
+        
+        rankings_btn = tk.Button(stats_frame, text="🏅 Ranking de Influencia", command=self.show_rankings,
+                                 bg='#009688', fg='white', font=('Arial', 10, 'bold'))
+        rankings_btn.pack(side='left', padx=5, pady=5)
         
         # Resultados
         result_frame = ttk.LabelFrame(queries_frame, text="Resultados", padding=10)
@@ -993,24 +1523,29 @@ class MainWindow:
             messagebox.showwarning("Advertencia", "Seleccione un usuario")
             return
         
-        response = self.client.get_mutual_friends(other)
-        self.query_result.delete(1.0, tk.END)
-        
-        if response.get("status") == "success":
-            mutual = response.get("mutual_friends", [])
-            if mutual:
-                self.query_result.insert(tk.END, f"Amigos en común con {other}:\n\n")
-                for friend in mutual:
-                    self.query_result.insert(tk.END, f"  • {friend}\n")
+        def show(response):
+            self.query_result.delete(1.0, tk.END)
+            if response.get("status") == "success":
+                mutual = response.get("mutual_friends", [])
+                if mutual:
+                    self.query_result.insert(tk.END, f"Amigos en común con {other}:\n\n")
+                    for friend in mutual:
+                        self.query_result.insert(tk.END, f"  • {friend}\n")
+                else:
+                    self.query_result.insert(tk.END, f"No tienes amigos en común con {other}")
             else:
-                self.query_result.insert(tk.END, f"No tienes amigos en común con {other}")
-        else:
-            self.query_result.insert(tk.END, response.get("message"))
+                self.query_result.insert(tk.END, response.get("message"))
+        
+        def query():
+            # La réplica local responde sin ir al servidor si está al día
+            return self.replica.mutual_friends(self.username, other) or self.client.get_mutual_friends(other)
+        
+        self.run_async("Amigos en común", query, on_success=show, key="consulta")
     
     def find_friend_path(self):
         """Busca un camino de amigos entre dos usuarios"""
-        from_user = self.path_from_combo.get()
-        to_user = self.path_to_combo.get()
+        from_user = self.path_from_combo.get().strip()
+        to_user = self.path_to_combo.get().strip()
         
         if not from_user or not to_user:
             messagebox.showwarning("Advertencia", "Seleccione ambos usuarios")
@@ -1020,7 +1555,15 @@ class MainWindow:
             messagebox.showwarning("Advertencia", "Seleccione dos usuarios diferentes")
             return
         
-        response = self.client.find_path(from_user, to_user)
+        def query():
+            return self.replica.find_path(from_user, to_user) or self.client.find_path(from_user, to_user)
+        
+        self.run_async("Buscando camino", query,
+                       on_success=lambda response: self.show_path_result(response, from_user, to_user),
+                       key="consulta")
+    
+    def show_path_result(self, response, from_user, to_user):
+        """Muestra el camino encontrado (o que no existe)"""
         self.query_result.delete(1.0, tk.END)
         
         if response.get("status") == "success":
@@ -1045,8 +1588,14 @@ class MainWindow:
             self.query_result.insert(tk.END, response.get("message"))
     
     def show_statistics(self):
+        """Calcula las estadísticas en la réplica local (o las pide al servidor) en segundo plano"""
+        def fetch():
+            return self.replica.statistics() or self.client.get_statistics()
+        
+        self.run_async("Estadísticas", fetch, on_success=self.render_statistics, key="consulta")
+    
+    def render_statistics(self, response):
         """Muestra las estadísticas de la red social"""
-        response = self.client.get_statistics()
         self.query_result.delete(1.0, tk.END)
         
         if response.get("status") == "success":
@@ -1082,9 +1631,97 @@ class MainWindow:
             self.query_result.insert(tk.END, "═══════════════════════════════════════════════════\n")
             self.query_result.insert(tk.END, f"👥 Total de usuarios: {total_users}\n")
             self.query_result.insert(tk.END, f"🤝 Total de amistades: {total_friendships}\n")
+            
+            # Métricas de triángulos (pueden no estar listas todavía)
+            if "transitivity" in stats:
+                self.query_result.insert(tk.END, "\n🔺 Triángulos y clustering:\n")
+                self.query_result.insert(tk.END, f"   Total de triángulos: {stats.get('total_triangles', 0)}\n")
+                self.query_result.insert(tk.END, f"   Transitividad global: {stats.get('transitivity', 0)}\n")
+                self.query_result.insert(tk.END, f"   Clustering promedio: {stats.get('average_clustering', 0)}\n")
+                for user, count in stats.get("top_triangles", []):
+                    self.query_result.insert(tk.END, f"   👤 {user} → {count} triángulo(s)\n")
+            
+            # Los contadores de la caché del servidor llegan aparte, sin demorar lo anterior
+            self.run_async(None, self.client.get_cache_stats,
+                           on_success=self.render_cache_stats, key="consulta_cache")
         else:
             self.query_result.insert(tk.END, response.get("message"))
     
+    def render_cache_stats(self, cache_response):
+        """Agrega los contadores de la caché del servidor al final de las estadísticas"""
+        if cache_response.get("status") == "success":
+            cache = cache_response["cache"]
+            self.query_result.insert(tk.END, f"\n🗄️ Caché del servidor: {cache['hits']} aciertos, "
+                                             f"{cache['misses']} fallos ({cache['hit_rate']:.0%})\n")
+    
+    def show_rankings(self):
+        """Pide el ranking de influencia en segundo plano"""
+        self.run_async("Ranking de influencia", self.client.get_rankings,
+                       on_success=self.render_rankings, key="consulta")
+    
+    def render_rankings(self, response):
+        """Muestra los usuarios más influyentes según la analítica del servidor"""
+        self.query_result.delete(1.0, tk.END)
+        
+        if response.get("status") == "success":
+            rankings = response.get("rankings", {})
+            
+            self.query_result.insert(tk.END, "╔═══════════════════════════════════════════════════╗\n")
+            self.query_result.insert(tk.END, "║          🏅 RANKING DE INFLUENCIA                 ║\n")
+            self.query_result.insert(tk.END, "╚═══════════════════════════════════════════════════╝\n\n")
+            
+            self.query_result.insert(tk.END, "⭐ PageRank:\n")
+            for i, (user, score) in enumerate(rankings.get("pagerank", []), start=1):
+                self.query_result.insert(tk.END, f"   {i:>2}. 👤 {user} → {score:.4f}\n")
+            self.query_result.insert(tk.END, "\n")
+            
+            self.query_result.insert(tk.END, "🌉 Intermediación (aproximada):\n")
+            for i, (user, score) in enumerate(rankings.get("betweenness", []), start=1):
+                self.query_result.insert(tk.END, f"   {i:>2}. 👤 {user} → {score:.4f}\n")
+            self.query_result.insert(tk.END, "\n")
+            
+            version = response.get("version")
+            stale = " (recalculando...)" if version != response.get("current_version") else ""
+            self.query_result.insert(tk.END, "═══════════════════════════════════════════════════\n")
+            self.query_result.insert(tk.END, f"🗂️ Versión del grafo: {version}{stale}\n")
+            self.query_result.insert(tk.END, f"⏱️ Tiempo de cálculo: {response.get('compute_time_ms')} ms\n")
+        else:
+            self.query_result.insert(tk.END, response.get("message"))
+    
+    def show_profile_search(self, page):
+        """Muestra una página de resultados de la búsqueda en descripciones de perfil"""
+        query = self.profile_search_entry.get().strip()
+        if not query:
+            messagebox.showwarning("Advertencia", "Ingrese un texto a buscar")
+            return
+        if page < 1:
+            return
+        
+        self.run_async("Buscando en perfiles", self.client.search_profiles, query, page,
+                       on_success=lambda response: self.render_profile_search(response, query, page),
+                       key="consulta")
+    
+    def render_profile_search(self, response, query, page):
+        """Muestra una página de resultados de la búsqueda en perfiles"""
+        if response.get("status") != "success":
+            messagebox.showerror("Error", response.get("message"))
+            return
+        pages = response.get("pages", 0)
+        if pages and page > pages:
+            return
+        self.profile_search_page = page
+        
+        self.query_result.delete(1.0, tk.END)
+        self.query_result.insert(tk.END, f"📝 Perfiles que mencionan '{query}': {response.get('total', 0)}\n\n")
+        for result in response.get("results", []):
+            description = result["description"].replace("\n", " ")
+            if len(description) > 80:
+                description = description[:77] + "..."
+            self.query_result.insert(tk.END, f"👤 {result['username']}  ({result['score']:.2f})\n")
+            self.query_result.insert(tk.END, f"   {description}\n\n")
+        if pages:
+            self.query_result.insert(tk.END, f"Página {page} de {pages}\n")
+    
     # ==================== PESTAÑA DE VISUALIZACIÓN ====================
     def create_visualization_tab(self):
         viz_frame = ttk.Frame(self.notebook)
@@ -1106,26 +1743,102 @@ class MainWindow:
         self.layout_combo.set("neato")
         self.layout_combo.grid(row=0, column=3, padx=5)
         
+        ttk.Label(controls_frame, text="Comunidades:").grid(row=1, column=0, padx=5, pady=(5, 0))
+        self.community_mode_combo = ttk.Combobox(controls_frame, width=10, state="readonly",
+                                                 values=["ninguno", "colorear", "agrupar"])
+        self.community_mode_combo.set("ninguno")
+        self.community_mode_combo.grid(row=1, column=1, padx=5, pady=(5, 0))
+        self.community_mode_combo.bind('<<ComboboxSelected>>', lambda e: self.update_dot())
+        
+        # Vista del ego (por defecto): vecindario de k saltos con máximo de nodos
+        ttk.Label(controls_frame, text="Vista:").grid(row=1, column=2, padx=5, pady=(5, 0))
+        self.view_mode_combo = ttk.Combobox(controls_frame, width=10, state="readonly",
+                                            values=["ego", "completa"])
+        self.view_mode_combo.set("ego")
+        self.view_mode_combo.grid(row=1, column=3, padx=5, pady=(5, 0))
+        self.view_mode_combo.bind('<<ComboboxSelected>>', lambda e: self.update_dot())
+        
+        ttk.Label(controls_frame, text="Centro:").grid(row=2, column=0, padx=5, pady=(5, 0))
+        self.ego_center_combo = ttk.Combobox(controls_frame, width=18, state="readonly")
+        self.ego_center_combo.set(self.username)
+        self.ego_center_combo.grid(row=2, column=1, padx=5, pady=(5, 0))
+        self.ego_center_combo.bind('<<ComboboxSelected>>', lambda e: self.update_dot())
+        
+        ttk.Label(controls_frame, text="Saltos:").grid(row=2, column=2, padx=5, pady=(5, 0))
+        self.ego_hops_spin = ttk.Spinbox(controls_frame, from_=1, to=4, width=5)
+        self.ego_hops_spin.set(2)
+        self.ego_hops_spin.grid(row=2, column=3, padx=5, pady=(5, 0))
+        
+        ttk.Label(controls_frame, text="Máx. nodos:").grid(row=2, column=4, padx=5, pady=(5, 0))
+        self.ego_max_spin = ttk.Spinbox(controls_frame, from_=10, to=2000, increment=10, width=6)
+        self.ego_max_spin.set(150)
+        self.ego_max_spin.grid(row=2, column=5, padx=5, pady=(5, 0))
+        
         ttk.Button(controls_frame, text="🖼️ Generar Imagen", 
                    command=self.generate_graph).grid(row=0, column=4, padx=10)
         ttk.Button(controls_frame, text="🔄 Actualizar DOT", 
                    command=self.update_dot).grid(row=0, column=5, padx=5)
         
-        # Código DOT
-        dot_frame = ttk.LabelFrame(viz_frame, text="Código DOT", padding=10)
-        dot_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        # Dibujo dentro de la aplicación (sin Graphviz) y código DOT para exportar
+        viz_notebook = ttk.Notebook(viz_frame)
+        viz_notebook.pack(fill='both', expand=True, padx=10, pady=10)
         
+        self.graph_canvas = GraphCanvas(viz_notebook, on_activate=self.show_user_profile_window)
+        viz_notebook.add(self.graph_canvas, text="🕸️ Dibujo")
+        
+        dot_frame = ttk.Frame(viz_notebook, padding=5)
+        viz_notebook.add(dot_frame, text="📝 Código DOT")
         self.dot_text = scrolledtext.ScrolledText(dot_frame, font=('Consolas', 10), height=20)
         self.dot_text.pack(fill='both', expand=True)
     
-    def update_dot(self):
-        response = self.client.get_network()
+    def update_dot(self, on_ready=None):
+        """
+        Pide la red y genera el código DOT en segundo plano; `on_ready` se llama
+        al mostrarlo. También actualiza el dibujo de la pestaña.
+        """
+        ego = None
+        if self.view_mode_combo.get() == "ego":
+            try:
+                k = int(self.ego_hops_spin.get())
+                max_nodes = int(self.ego_max_spin.get())
+            except ValueError:
+                k, max_nodes = 2, 150
+            ego = (self.ego_center_combo.get() or self.username, k, max_nodes)
+        
+        def show(result):
+            response, dot, network, communities = result
+            if dot is None:
+                messagebox.showerror("Error", response.get("message"))
+                return
+            self.dot_text.delete(1.0, tk.END)
+            self.dot_text.insert(tk.END, dot)
+            self.draw_graph(network, communities, ego)
+            if on_ready is not None:
+                on_ready()
+        
+        self.run_async("Código DOT", self.build_dot, ego, self.community_mode_combo.get(),
+                       on_success=show, key="dot")
+    
+    def build_dot(self, ego, mode):
+        """Código DOT de la red completa o de la vista del ego (se ejecuta en segundo plano)"""
+        if ego is not None:
+            center, k, max_nodes = ego
+            response = self.client.get_ego_network(center, k=k, max_nodes=max_nodes)
+        else:
+            # La red completa se toma de la réplica (pedido condicional: sin cambios no se retransmite)
+            response = self.replica.sync(force=True) or {"status": "success", "network": self.replica.network}
         if response.get("status") != "success":
-            messagebox.showerror("Error", response.get("message"))
-            return
+            return response, None, None, None
         
         network = response.get("network", {})
         
+        # Comunidades (opcional): colorear nodos o agruparlos en clusters
+        communities = {}
+        if mode != "ninguno":
+            communities_response = self.client.get_communities()
+            if communities_response.get("status") == "success":
+                communities = communities_response.get("communities", {})
+        
         dot = ['graph RedSocial {']
         dot.append('    graph [overlap=false, splines=true];')
         dot.append('    node [shape=circle, style=filled, fillcolor=lightblue, fontname="Arial"];')
@@ -1133,9 +1846,26 @@ class MainWindow:
         dot.append('')
         
         # Nodos
-        for user in network:
-            color = "lightgreen" if user == self.username else "lightblue"
-            dot.append(f'    "{user}" [fillcolor={color}];')
+        if communities and mode == "agrupar":
+            groups = {}
+            for user in network:
+                groups.setdefault(communities.get(user, -1), []).append(user)
+            for community_id, members in sorted(groups.items()):
+                dot.append(f'    subgraph cluster_{community_id + 1} {{')
+                dot.append(f'        label="Comunidad #{community_id}"; style=dashed;')
+                for user in members:
+                    color = "lightgreen" if user == self.username else self.community_color(community_id)
+                    dot.append(f'        "{user}" [fillcolor="{color}"];')
+                dot.append('    }')
+        else:
+            for user in network:
+                if user == self.username:
+                    color = "lightgreen"
+                elif communities:
+                    color = self.community_color(communities.get(user, -1))
+                else:
+                    color = "lightblue"
+                dot.append(f'    "{user}" [fillcolor="{color}"];')
         
         dot.append('')
         
@@ -1150,41 +1880,52 @@ class MainWindow:
         
         dot.append('}')
         
-        self.dot_text.delete(1.0, tk.END)
-        self.dot_text.insert(tk.END, '\n'.join(dot))
+        if response.get("truncated"):
+            dot.insert(1, f'    // Vista del ego recortada a {len(network)} nodos (mayor grado primero)')
+        
+        return response, '\n'.join(dot), network, communities
+    
+    def draw_graph(self, network, communities, ego):
+        """Calcula (o toma de la caché) la disposición en segundo plano y dibuja la red"""
+        if ego is not None:
+            key = ("ego",) + tuple(ego) + (self.graph_version,)
+        else:
+            key = ("completa", self.replica.version)
+        colors = {}
+        if communities:
+            colors = {user: self.community_color(communities.get(user, -1)) for user in network}
+        if self.username in network:
+            colors[self.username] = "lightgreen"
+        selected = ego[0] if ego is not None else None
+        
+        self.run_async("Calculando disposición", self.layouts.get, key, network,
+                       on_success=lambda positions: self.graph_canvas.set_graph(network, positions, colors, selected),
+                       key="disposicion")
+    
+    def community_color(self, community_id):
+        """Color de relleno para una comunidad (paleta cíclica)"""
+        palette = ["#8dd3c7", "#ffffb3", "#bebada", "#fb8072", "#80b1d3", "#fdb462",
+                   "#b3de69", "#fccde5", "#d9d9d9", "#bc80bd", "#ccebc5", "#ffed6f"]
+        if community_id < 0:
+            return "lightblue"
+        return palette[community_id % len(palette)]
     
     def generate_graph(self):
         dot_code = self.dot_text.get(1.0, tk.END)
         if not dot_code.strip():
-            self.update_dot()
-            dot_code = self.dot_text.get(1.0, tk.END)
-        
-        output_format = self.format_combo.get()
-        layout = self.layout_combo.get()
+            # Generar primero el código DOT y volver a intentar cuando esté listo
+            self.update_dot(on_ready=self.generate_graph)
+            return
         
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.dot', delete=False, encoding='utf-8') as f:
-                f.write(dot_code)
-                dot_path = f.name
-            
-            output_path = dot_path.replace('.dot', f'.{output_format}')
-            graphviz_exe = os.path.join(GRAPHVIZ_PATH, f"{layout}.exe")
-            
-            result = subprocess.run(
-                [graphviz_exe, f'-T{output_format}', dot_path, '-o', output_path],
-                capture_output=True, text=True, timeout=30
-            )
-            
-            if result.returncode != 0:
-                messagebox.showerror("Error", f"Error de Graphviz:\n{result.stderr}")
+        def show(response):
+            if response.get("status") != "success":
+                messagebox.showerror("Error", response.get("message"))
                 return
-            
-            os.startfile(output_path)
-            
-        except FileNotFoundError:
-            messagebox.showerror("Error", "Graphviz no encontrado. Verifique la instalación.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+            open_file(response["path"])
+        
+        # Graphviz corre en segundo plano; la misma imagen se reutiliza sin volver a generarla
+        self.run_async("Generando imagen", self.graphviz.render, dot_code,
+                       self.layout_combo.get(), self.format_combo.get(), on_success=show, key="graphviz")
     
     # ==================== PESTAÑA DE RED ====================
     def create_network_tab(self):
@@ -1199,37 +1940,42 @@ class MainWindow:
         view_frame = ttk.LabelFrame(network_frame, text="Red Social", padding=10)
         view_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        self.network_text = scrolledtext.ScrolledText(view_frame, font=('Consolas', 11), height=20)
-        self.network_text.pack(fill='both', expand=True)
+        # Solo la página visible se arma y se inserta en el texto
+        self.network_view = NetworkView(view_frame, font=('Consolas', 11))
+        self.network_view.pack(fill='both', expand=True)
         
         ttk.Button(network_frame, text="🔄 Actualizar", command=self.update_network_view).pack(pady=5)
     
     def update_network_view(self):
-        response = self.client.get_network()
-        if response.get("status") != "success":
-            return
-        
-        network = response.get("network", {})
+        """Pide la red completa y la prepara en segundo plano"""
+        self.run_async("Red completa", self.build_network_text,
+                       on_success=self.show_network_text, key="red")
+    
+    def build_network_text(self):
+        """Resumen y usuarios ordenados de la red completa (se ejecuta en segundo plano)"""
+        if self.replica.sync(force=True) is not None:
+            return None
+        network = self.replica.network
         
         num_users = len(network)
         num_friendships = sum(len(friends) for friends in network.values()) // 2
-        
-        self.stats_label.config(text=f"Usuarios: {num_users} | Amistades: {num_friendships}")
-        
-        self.network_text.delete(1.0, tk.END)
-        self.network_text.insert(tk.END, "╔═══════════════════════════════════════╗\n")
-        self.network_text.insert(tk.END, "║            RED SOCIAL                 ║\n")
-        self.network_text.insert(tk.END, "╚═══════════════════════════════════════╝\n\n")
-        
-        for user in sorted(network.keys()):
-            friends = network[user]
-            marker = " (tú)" if user == self.username else ""
-            friends_str = ", ".join(friends) if friends else "Sin amigos"
-            self.network_text.insert(tk.END, f"👤 {user}{marker}\n")
-            self.network_text.insert(tk.END, f"   └── Amigos: {friends_str}\n\n")
+        return f"Usuarios: {num_users} | Amistades: {num_friendships}", network, sorted(network)
+    
+    def show_network_text(self, result):
+        """Muestra la red completa (la vista arma solo la página visible)"""
+        if result is None:
+            return
+        summary, network, users = result
+        self.stats_label.config(text=summary)
+        self.network_view.set_network(network, users, me=self.username)
     
     # ==================== ACCIONES GENERALES ====================
     def refresh_data(self):
+        """Pide los datos del usuario en segundo plano (solo cuenta el refresco más reciente)"""
+        self.run_async("Actualizando", self.fetch_data, on_success=self.apply_data, key="refresco")
+    
+    def fetch_data(self):
+        """Amigos, usuarios, solicitudes y amigos en común (se ejecuta en segundo plano)"""
         # Obtener amigos
         friends_response = self.client.get_friends()
         friends = friends_response.get("friends", []) if friends_response.get("status") == "success" else []
@@ -1245,82 +1991,123 @@ class MainWindow:
         sent_response = self.client.get_sent_requests()
         sent = sent_response.get("sent_requests", []) if sent_response.get("status") == "success" else []
         
+        # Amigos en común con todos los usuarios (una sola petición; sin enviar
+        # la lista, que con redes grandes superaría el tamaño máximo del pedido)
+        counts_response = self.client.get_mutual_counts()
+        counts = counts_response.get("mutual_counts", {}) if counts_response.get("status") == "success" else None
+        self.replica.note_version(counts_response.get("version"))  # versión actual del grafo
+        
+        # El índice de búsqueda local solo se rehace si cambió la lista
+        index = TrigramIndex(all_users) if all_users != self.all_users_cache else None
+        return friends, all_users, pending, sent, counts, index, counts_response.get("version")
+    
+    def apply_data(self, data):
+        """Actualiza las cachés y marca como desactualizadas solo las vistas cuyo contenido cambió"""
+        friends, all_users, pending, sent, counts, index, graph_version = data
+        changed = set()
+        if pending != self.pending_cache or sent != self.sent_cache:
+            changed.update(("solicitudes", "usuarios"))
+        if friends != self.friends_cache:
+            changed.update(("amigos", "usuarios", "perfil"))
+        if all_users != self.all_users_cache:
+            changed.update(("usuarios", "consultas", "grafo"))
+        if counts is not None and counts != self.mutual_counts_cache:
+            changed.add("usuarios")
+        if graph_version is None or graph_version != self.graph_version:
+            changed.update(("grafo", "red"))
+        
+        if counts is not None:
+            self.mutual_counts_cache = counts
+        
         # Guardar en caché para búsqueda local
+        if index is not None:
+            self.users_index = index
+            self.users_filter = IncrementalFilter(index)
+            self.users_fuzzy_index = None
         self.all_users_cache = all_users
         self.friends_cache = friends
         self.sent_cache = sent
         self.pending_cache = pending
+        self.graph_version = graph_version
         
-        # Actualizar listbox de solicitudes pendientes
-        self.pending_listbox.delete(0, tk.END)
-        for user in pending:
-            self.pending_listbox.insert(tk.END, f"👤 {user}")
-        
-        # Actualizar listbox de solicitudes enviadas
-        self.sent_listbox.delete(0, tk.END)
-        for user in sent:
-            self.sent_listbox.insert(tk.END, f"⏳ {user}")
-        
-        # Actualizar listbox de amigos
-        self.friends_listbox.delete(0, tk.END)
-        for friend in friends:
-            self.friends_listbox.insert(tk.END, f"👤 {friend}")
-        
-        # Usuarios disponibles para enviar solicitud (no amigos, no solicitud pendiente)
-        available_for_request = [u for u in all_users 
-                                 if u != self.username 
-                                 and u not in friends 
-                                 and u not in sent
-                                 and u not in pending]
-        
-        # Actualizar listbox de usuarios (respetando el filtro de búsqueda actual)
-        self.filter_users_list()
-        
-        # Actualizar combos
-        self.send_request_combo['values'] = available_for_request
-        self.remove_friend_combo['values'] = friends
-        self.mutual_combo['values'] = [u for u in all_users if u != self.username]
-        self.path_from_combo['values'] = all_users
-        self.path_to_combo['values'] = all_users
-        
-        # Actualizar título de pestaña de solicitudes
+        # Actualizar título de pestaña de solicitudes (siempre visible)
         if pending:
             self.notebook.tab(0, text=f"📬 Solicitudes ({len(pending)})")
         else:
             self.notebook.tab(0, text="📬 Solicitudes")
         
-        # Actualizar estadísticas de mi perfil
-        self.my_friends_count_label.config(text=f"👥 Amigos: {len(friends)}")
+        self.renderer.invalidate(*changed)
+    
+    # ==================== VISTAS (las dibuja el RenderScheduler) ====================
+    def render_requests(self):
+        """Listas de solicitudes recibidas y enviadas"""
+        self.pending_listbox.delete(0, tk.END)
+        if self.pending_cache:
+            self.pending_listbox.insert(tk.END, *(f"👤 {user}" for user in self.pending_cache))
         
-        # Actualizar vista de red
-        self.update_network_view()
+        self.sent_listbox.delete(0, tk.END)
+        if self.sent_cache:
+            self.sent_listbox.insert(tk.END, *(f"⏳ {user}" for user in self.sent_cache))
+    
+    def render_friends(self):
+        """Lista de amigos y combo para eliminar"""
+        self.friends_listbox.delete(0, tk.END)
+        if self.friends_cache:
+            self.friends_listbox.insert(tk.END, *(f"👤 {friend}" for friend in self.friends_cache))
+        self.remove_friend_combo['values'] = self.friends_cache
+    
+    def render_profile_stats(self):
+        """Cantidad de amigos en la pestaña de perfil"""
+        self.my_friends_count_label.config(text=f"👥 Amigos: {len(self.friends_cache)}")
+    
+    def render_query_combos(self):
+        """Usuarios para la consulta de amigos en común"""
+        self.mutual_combo['values'] = [u for u in self.all_users_cache if u != self.username]
+    
+    def render_graph_tab(self):
+        """Combo del centro de la vista ego y código DOT"""
+        self.ego_center_combo['values'] = self.all_users_cache
         self.update_dot()
     
     def do_logout(self):
         if messagebox.askyesno("Confirmar", "¿Cerrar sesión?"):
-            self.client.logout()
-            self.on_logout()
+            self.executor.cancel_all()
+            self.executor.submit(self.client.logout, label="Cerrando sesión",
+                                 on_success=lambda _: self.on_logout(), on_error=lambda _: self.on_logout())
     
     def do_delete_account(self):
         if messagebox.askyesno("⚠️ Advertencia", 
             "¿Está seguro de eliminar su cuenta?\nEsta acción no se puede deshacer."):
-            response = self.client.delete_account()
-            if response.get("status") == "success":
-                messagebox.showinfo("Cuenta Eliminada", response.get("message"))
-                self.on_logout()
-            else:
-                messagebox.showerror("Error", response.get("message"))
+            self.executor.cancel_all()
+            self.run_async("Eliminando cuenta", self.client.delete_account,
+                           on_success=self.show_account_deleted)
+    
+    def show_account_deleted(self, response):
+        if response.get("status") == "success":
+            messagebox.showinfo("Cuenta Eliminada", response.get("message"))
+            self.on_logout()
+        else:
+            messagebox.showerror("Error", response.get("message"))
 
 
 class Application:
     def __init__(self):
         self.root = tk.Tk()
         self.client = SocialNetworkClient()
+        self.photo_loader = PhotoLoader(self.root)
+        self.executor = RequestExecutor(self.root)
+        self.graphviz = GraphvizRenderer()
         self.current_window = None
         
         self.show_login()
     
     def show_login(self):
+        # Descartar lo que quede en curso de la sesión anterior
+        self.executor.cancel_all()
+        self.executor.on_busy = None
+        
+        if isinstance(self.current_window, MainWindow):
+            self.current_window.renderer.cancel()
         if self.current_window:
             for widget in self.root.winfo_children():
                 widget.destroy()
@@ -1334,10 +2121,13 @@ class Application:
         for widget in self.root.winfo_children():
             widget.destroy()
         
-        self.current_window = MainWindow(self.root, self.client, username, self.show_login)
+        self.current_window = MainWindow(self.root, self.client, username, self.show_login,
+                                         self.photo_loader, self.executor, self.graphviz)
     
     def run(self):
         self.root.mainloop()
+        self.executor.shutdown()
+        self.photo_loader.shutdown()
         self.client.disconnect()
 
 
@@ -0,0 +1,514 @@
+"""
+Dibujo de grafos dentro de la aplicación, sin Graphviz.
+force_layout calcula posiciones con el algoritmo de fuerzas de
+Fruchterman-Reingold vectorizado con NumPy: la repulsión es exacta entre todos
+los pares en grafos chicos y usa la aproximación de Barnes-Hut (quadtree
+armado con códigos de Morton y recorrido nivel por nivel para todos los nodos
+a la vez) a partir de BARNES_HUT_MIN_NODES. LayoutCache guarda las
+disposiciones por versión del grafo y arranca las nuevas desde la anterior.
+GraphCanvas las dibuja en un tk.Canvas con desplazamiento y zoom, creando solo
+los ítems visibles y con menos detalle cuando hay muchos nodos en pantalla.
+"""
+import math
+import random
+import threading
+from collections import OrderedDict
+import tkinter as tk
+from tkinter import ttk
+
+# Intentar importar NumPy para el cálculo vectorizado de fuerzas
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# A partir de esta cantidad de nodos la repulsión se aproxima con Barnes-Hut
+BARNES_HUT_MIN_NODES = 1000
+
+# Precisión de Barnes-Hut: una celda se aproxima por su centro de masa si
+# tamaño / distancia < theta (y el nodo no está dentro de ella)
+BARNES_HUT_THETA = 1.0
+
+# Profundidad máxima del quadtree
+QUADTREE_DEPTH = 12
+
+# Atracción hacia el centro (en unidades de la distancia ideal entre nodos)
+GRAVITY = 1.0
+
+# Iteraciones desde cero y partiendo de una disposición anterior
+LAYOUT_ITERATIONS = 80
+WARM_ITERATIONS = 25
+
+# Sin NumPy: máximo de nodos para las fuerzas en Python puro (si no, círculo)
+PURE_PYTHON_MAX_NODES = 300
+
+# Disposiciones que se mantienen en memoria
+LAYOUT_CACHE_SIZE = 8
+
+# Nivel de detalle: nodos, aristas y etiquetas dibujadas como máximo, radio
+# mínimo (en píxeles) para mostrar nombres y espera antes de redibujar al mover
+MAX_DRAWN_NODES = 5_000
+MAX_DRAWN_EDGES = 20_000
+MAX_LABELS = 300
+LABEL_MIN_RADIUS = 6
+REDRAW_DELAY_MS = 40
+
+# Con más nodos visibles que MAX_DRAWN_NODES se dibuja una grilla de densidad:
+# un cuadrado por celda (en píxeles) con el tono según la cantidad de nodos
+DENSITY_CELL_PX = 12
+DENSITY_COLORS = ('#dbe9f6', '#bad6eb', '#89bedc', '#539ecd', '#2b7bba', '#0b559f', '#08306b')
+
+# Colores por defecto
+NODE_COLOR = 'lightblue'
+SELECTED_COLOR = '#FF9800'
+
+
+def edge_arrays(names, network):
+    """Aristas (i, j) con i < j como dos listas de índices de `names`"""
+    index = {name: i for i, name in enumerate(names)}
+    src, dst = [], []
+    for user, friends in network.items():
+        i = index[user]
+        for friend in friends:
+            j = index.get(friend)
+            if j is not None and i < j:
+                src.append(i)
+                dst.append(j)
+    return src, dst
+
+
+def _morton(x, y, depth):
+    """Intercala los bits de x e y (código de Morton de cada celda)"""
+    code = np.zeros_like(x)
+    for bit in range(depth):
+        code |= ((x >> bit) & 1) << (2 * bit)
+        code |= ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+def exact_repulsion(pos, k2):
+    """Repulsión k²/d entre todos los pares (O(n²) en memoria y tiempo)"""
+    delta = pos[:, None, :] - pos[None, :, :]
+    d2 = (delta ** 2).sum(axis=2)
+    np.fill_diagonal(d2, np.inf)
+    return (delta * (k2 / np.maximum(d2, 1e-12))[:, :, None]).sum(axis=1)
+
+
+def barnes_hut_repulsion(pos, k2, theta=BARNES_HUT_THETA, depth=QUADTREE_DEPTH):
+    """
+    Repulsión aproximada con Barnes-Hut. El quadtree se arma ordenando los
+    nodos por código de Morton: en cada nivel, las celdas son los prefijos
+    distintos del código. El recorrido avanza un nivel a la vez con todos los
+    pares (nodo, celda) pendientes: una celda lejana (o una hoja) aporta su
+    masa desde su centro de masa; si no, se reemplaza por sus hijas.
+    """
+    n = len(pos)
+    low = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - low).max()), 1e-9)
+    cells = 1 << depth
+    grid = np.minimum(((pos - low) / span * cells).astype(np.int64), cells - 1)
+    point_codes = _morton(grid[:, 0], grid[:, 1], depth)
+    order = np.argsort(point_codes, kind='stable')
+    codes = point_codes[order]
+    ordered = pos[order]
+
+    levels = []  # por nivel: (claves de celda ordenadas, masa, centro de masa)
+    for level in range(depth + 1):
+        keys = codes >> (2 * (depth - level))
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        mass = np.diff(np.r_[starts, n])
+        center = np.add.reduceat(ordered, starts, axis=0) / mass[:, None]
+        levels.append((keys[starts], mass, center))
+
+    disp = np.zeros_like(pos)
+    points = np.arange(n)
+    cell = np.zeros(n, dtype=np.int64)
+    for level in range(depth + 1):
+        keys, mass, center = levels[level]
+        size = span / (1 << level)
+        delta = pos[points] - center[cell]
+        d2 = (delta ** 2).sum(axis=1)
+        inside = (point_codes[points] >> (2 * (depth - level))) == keys[cell]
+        far = (size * size < theta * theta * d2) & ~inside
+        accept = (mass[cell] == 1) | far | (level == depth)
+        use = accept & (d2 > 1e-12)  # d = 0: el propio nodo
+        force = delta[use] * (k2 * mass[cell[use]] / d2[use])[:, None]
+        disp[:, 0] += np.bincount(points[use], force[:, 0], minlength=n)
+        disp[:, 1] += np.bincount(points[use], force[:, 1], minlength=n)
+
+        points, cell = points[~accept], cell[~accept]
+        if not len(points):
+            break
+        # Hijas de cada celda: claves del nivel siguiente en [clave*4, clave*4 + 4)
+        child_keys = levels[level + 1][0]
+        parent = keys[cell] << 2
+        first = np.searchsorted(child_keys, parent)
+        counts = np.searchsorted(child_keys, parent + 4) - first
+        points = np.repeat(points, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell = np.repeat(first, counts) + offsets
+    return disp
+
+
+def _layout_numpy(n, src, dst, iterations, initial, seed):
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2))
+    for i, xy in initial.items():
+        pos[i] = xy
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    k = 1.0 / math.sqrt(n)  # distancia ideal en el cuadrado unitario
+    k2 = k * k
+    temperature = 0.1 if len(initial) < n / 2 else 0.02
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        if n >= BARNES_HUT_MIN_NODES:
+            disp = barnes_hut_repulsion(pos, k2)
+        else:
+            disp = exact_repulsion(pos, k2)
+        if len(src):
+            # Atracción d²/k a lo largo de cada arista
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt((delta ** 2).sum(axis=1))
+            force = delta * (dist / k)[:, None]
+            for axis in (0, 1):
+                disp[:, axis] += np.bincount(dst, force[:, axis], minlength=n)
+                disp[:, axis] -= np.bincount(src, force[:, axis], minlength=n)
+        # Gravedad suave hacia el centro: las componentes sueltas no se alejan
+        disp -= (pos - 0.5) * (GRAVITY * k)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-12)
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+    return pos.tolist()
+
+
+def _layout_python(n, src, dst, iterations, initial, seed):
+    rng = random.Random(seed)
+    if n > PURE_PYTHON_MAX_NODES:
+        # Sin NumPy un grafo grande se dispone en círculo
+        return [[0.5 + 0.5 * math.cos(2 * math.pi * i / n), 0.5 + 0.5 * math.sin(2 * math.pi * i / n)]
+                for i in range(n)]
+    pos = [list(initial.get(i, (rng.random(), rng.random()))) for i in range(n)]
+    k2 = 1.0 / n
+    k = math.sqrt(k2)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        disp = [[0.0, 0.0] for _ in range(n)]
+        for i in range(n):
+            xi, yi = pos[i]
+            for j in range(i + 1, n):
+                dx, dy = xi - pos[j][0], yi - pos[j][1]
+                d2 = max(dx * dx + dy * dy, 1e-12)
+                fx, fy = dx * k2 / d2, dy * k2 / d2
+                disp[i][0] += fx
+                disp[i][1] += fy
+                disp[j][0] -= fx
+                disp[j][1] -= fy
+        for i, j in zip(src, dst):
+            dx, dy = pos[i][0] - pos[j][0], pos[i][1] - pos[j][1]
+            dist = math.sqrt(dx * dx + dy * dy)
+            disp[i][0] -= dx * dist / k
+            disp[i][1] -= dy * dist / k
+            disp[j][0] += dx * dist / k
+            disp[j][1] += dy * dist / k
+        for i in range(n):
+            disp[i][0] -= (pos[i][0] - 0.5) * GRAVITY * k
+            disp[i][1] -= (pos[i][1] - 0.5) * GRAVITY * k
+            length = max(math.hypot(*disp[i]), 1e-12)
+            step = min(length, temperature) / length
+            pos[i][0] += disp[i][0] * step
+            pos[i][1] += disp[i][1] * step
+        temperature -= cooling
+    return pos
+
+
+def force_layout(network, iterations=LAYOUT_ITERATIONS, initial=None, seed=0):
+    """
+    Posiciones {usuario: (x, y)} en el cuadrado unitario para {usuario: amigos}.
+    `initial` ({usuario: (x, y)}) sirve de punto de partida para los nodos que
+    ya tenían posición (p. ej. la disposición de la versión anterior).
+    """
+    names = list(network)
+    n = len(names)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {names[0]: (0.5, 0.5)}
+    src, dst = edge_arrays(names, network)
+    start = {}
+    if initial:
+        start = {i: initial[name] for i, name in enumerate(names) if name in initial}
+    layout = _layout_numpy if NUMPY_AVAILABLE else _layout_python
+    pos = layout(n, src, dst, iterations, start, seed)
+
+    # Normalizar al cuadrado unitario conservando la proporción
+    xs = [p[0] for p in pos]
+    ys = [p[1] for p in pos]
+    min_x, min_y = min(xs), min(ys)
+    span = max(max(xs) - min_x, max(ys) - min_y, 1e-9)
+    return {name: ((x - min_x) / span, (y - min_y) / span) for name, x, y in zip(names, xs, ys)}
+
+
+class LayoutCache:
+    """
+    Disposiciones por clave (que incluye la versión del grafo). Una clave nueva
+    parte de la última disposición calculada, así un cambio chico en la red
+    requiere pocas iteraciones y el dibujo no salta de lugar.
+    """
+
+    def __init__(self, size=LAYOUT_CACHE_SIZE):
+        self.size = size
+        self.layouts = OrderedDict()  # clave -> {usuario: (x, y)}
+        self.last = None
+        self.lock = threading.Lock()
+
+    def get(self, key, network):
+        """Disposición de `network` para `key` (se calcula si no está; puede tardar)"""
+        with self.lock:
+            cached = self.layouts.get(key)
+            if cached is not None:
+                self.layouts.move_to_end(key)
+                return cached
+            previous = self.last
+
+        shared = sum(1 for name in network if name in previous) if previous else 0
+        iterations = WARM_ITERATIONS if shared >= len(network) / 2 else LAYOUT_ITERATIONS
+        positions = force_layout(network, iterations, initial=previous if shared else None)
+
+        with self.lock:
+            self.layouts[key] = positions
+            if len(self.layouts) > self.size:
+                self.layouts.popitem(last=False)
+            self.last = positions
+        return positions
+
+
+class GraphCanvas(ttk.Frame):
+    """
+    Grafo dibujado en un tk.Canvas. Arrastrar desplaza, la rueda hace zoom
+    sobre el cursor, un clic selecciona un nodo y el doble clic llama a
+    `on_activate(usuario)`.
+    """
+
+    def __init__(self, master, on_activate=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_activate = on_activate
+        self.names = []
+        self.xs = []
+        self.ys = []
+        self.src = []
+        self.dst = []
+        self.colors = []
+        self.selected = None
+        self.scale = 1.0
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+        self.drag = None
+        self.redraw_job = None
+        self.fitted = False  # si el encuadre se hizo con el tamaño real del canvas
+
+        self.canvas = tk.Canvas(self, background='white', highlightthickness=0)
+        self.canvas.pack(fill='both', expand=True)
+        self.info_label = ttk.Label(self, text="", font=('Arial', 9), foreground='gray')
+        self.info_label.pack(fill='x')
+
+        self.canvas.bind('<Configure>', self.on_resize)
+        self.canvas.bind('<ButtonPress-1>', self.on_press)
+        self.canvas.bind('<B1-Motion>', self.on_drag)
+        self.canvas.bind('<ButtonRelease-1>', self.on_release)
+        self.canvas.bind('<Double-Button-1>', self.on_double_click)
+        self.canvas.bind('<MouseWheel>', lambda e: self.zoom(e.x, e.y, 1.2 if e.delta > 0 else 1 / 1.2))
+        self.canvas.bind('<Button-4>', lambda e: self.zoom(e.x, e.y, 1.2))
+        self.canvas.bind('<Button-5>', lambda e: self.zoom(e.x, e.y, 1 / 1.2))
+
+    def set_graph(self, network, positions, colors=None, selected=None):
+        """Muestra `network` con las posiciones dadas; `colors` es {usuario: color}"""
+        colors = colors or {}
+        self.names = [name for name in network if name in positions]
+        self.xs = [positions[name][0] for name in self.names]
+        self.ys = [positions[name][1] for name in self.names]
+        self.src, self.dst = edge_arrays(self.names, {name: network[name] for name in self.names})
+        self.colors = [colors.get(name, NODE_COLOR) for name in self.names]
+        if NUMPY_AVAILABLE:
+            self.xs, self.ys = np.asarray(self.xs), np.asarray(self.ys)
+            self.src, self.dst = np.asarray(self.src, dtype=np.int64), np.asarray(self.dst, dtype=np.int64)
+        self.selected = self.names.index(selected) if selected in positions else None
+        self.fit()
+
+    def on_resize(self, event):
+        if self.fitted:
+            self.schedule_redraw()
+        else:
+            self.fit()
+
+    def fit(self):
+        """Encuadra todo el grafo en el canvas"""
+        self.fitted = self.canvas.winfo_width() > 1  # antes de mostrarse mide 1 píxel
+        width = max(self.canvas.winfo_width(), 100)
+        height = max(self.canvas.winfo_height(), 100)
+        self.scale = min(width, height) * 0.9
+        self.offset_x = (width - self.scale) / 2
+        self.offset_y = (height - self.scale) / 2
+        self.redraw()
+
+    def node_radius(self):
+        """Radio en píxeles: proporcional a la separación ideal entre nodos, acotado"""
+        spacing = self.scale / math.sqrt(max(len(self.names), 1))
+        return max(1.5, min(12.0, spacing * 0.25))
+
+    def visible_nodes(self, x0, y0, x1, y1):
+        """Índices de los nodos dentro del rectángulo (en coordenadas del grafo)"""
+        if NUMPY_AVAILABLE:
+            mask = (self.xs >= x0) & (self.xs <= x1) & (self.ys >= y0) & (self.ys <= y1)
+            return np.flatnonzero(mask), mask
+        visible = [i for i, (x, y) in enumerate(zip(self.xs, self.ys)) if x0 <= x <= x1 and y0 <= y <= y1]
+        return visible, set(visible)
+
+    def visible_edges(self, mask):
+        """Aristas con al menos un extremo visible"""
+        if NUMPY_AVAILABLE:
+            return np.flatnonzero(mask[self.src] | mask[self.dst])
+        return [e for e, (i, j) in enumerate(zip(self.src, self.dst)) if i in mask or j in mask]
+
+    def density_cells(self, nodes):
+        """
+        Celdas de la grilla de densidad con nodos visibles:
+        [(columna, fila, cantidad)] en celdas de DENSITY_CELL_PX píxeles
+        """
+        cell = DENSITY_CELL_PX
+        if NUMPY_AVAILABLE:
+            columns = np.floor((self.xs[nodes] * self.scale + self.offset_x) / cell).astype(np.int64)
+            rows = np.floor((self.ys[nodes] * self.scale + self.offset_y) / cell).astype(np.int64)
+            # Cada celda como un entero (columna y fila desplazadas a valores no negativos)
+            first_column, first_row = int(columns.min()), int(rows.min())
+            span = int(rows.max()) - first_row + 1
+            codes, counts = np.unique((columns - first_column) * span + (rows - first_row), return_counts=True)
+            return [(int(code) // span + first_column, int(code) % span + first_row, int(count))
+                    for code, count in zip(codes, counts)]
+        counts = {}
+        for i in nodes:
+            key = (math.floor((self.xs[i] * self.scale + self.offset_x) / cell),
+                   math.floor((self.ys[i] * self.scale + self.offset_y) / cell))
+            counts[key] = counts.get(key, 0) + 1
+        return [(column, row, count) for (column, row), count in counts.items()]
+
+    def draw_density(self, nodes):
+        """Grilla de densidad en lugar de un óvalo por nodo (cantidad de ítems acotada por el tamaño)"""
+        cells = self.density_cells(nodes)
+        top = math.log1p(max(count for _, _, count in cells))
+        cell = DENSITY_CELL_PX
+        for column, row, count in cells:
+            shade = DENSITY_COLORS[min(len(DENSITY_COLORS) - 1,
+                                       int(math.log1p(count) / top * (len(DENSITY_COLORS) - 1)))]
+            x, y = column * cell, row * cell
+            self.canvas.create_rectangle(x, y, x + cell, y + cell, fill=shade, outline='')
+        return len(cells)
+
+    def schedule_redraw(self):
+        """Redibujo diferido (junta los eventos de arrastre y zoom)"""
+        if self.redraw_job is not None:
+            self.after_cancel(self.redraw_job)
+        self.redraw_job = self.after(REDRAW_DELAY_MS, self.redraw)
+
+    def redraw(self):
+        """Crea los ítems de lo visible con el nivel de detalle que permite el zoom"""
+        self.redraw_job = None
+        self.canvas.delete('all')
+        if not self.names:
+            self.info_label.config(text="Sin datos para dibujar")
+            return
+
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        radius = self.node_radius()
+        margin = radius / self.scale
+        x0, y0 = -self.offset_x / self.scale - margin, -self.offset_y / self.scale - margin
+        x1, y1 = (width - self.offset_x) / self.scale + margin, (height - self.offset_y) / self.scale + margin
+        nodes, mask = self.visible_nodes(x0, y0, x1, y1)
+        dense = len(nodes) > MAX_DRAWN_NODES
+        edges = self.visible_edges(mask) if not dense else []
+
+        sx = lambda x: x * self.scale + self.offset_x
+        sy = lambda y: y * self.scale + self.offset_y
+        notes = []
+        drawn = nodes
+        if dense:
+            # Demasiados nodos: grilla de densidad, sin aristas; el seleccionado se dibuja encima
+            cells = self.draw_density(nodes)
+            notes.append(f"densidad en {cells} celdas (acerque el zoom para ver nodos y aristas)")
+            selected_visible = self.selected is not None and (
+                mask[self.selected] if NUMPY_AVAILABLE else self.selected in mask)
+            drawn = [self.selected] if selected_visible else []
+        elif len(edges) <= MAX_DRAWN_EDGES:
+            for e in edges:
+                i, j = self.src[e], self.dst[e]
+                self.canvas.create_line(sx(self.xs[i]), sy(self.ys[i]), sx(self.xs[j]), sy(self.ys[j]),
+                                        fill='gray60')
+        else:
+            notes.append("aristas ocultas (acerque el zoom)")
+
+        show_labels = radius >= LABEL_MIN_RADIUS and len(drawn) <= MAX_LABELS
+        for i in drawn:
+            x, y = sx(self.xs[i]), sy(self.ys[i])
+            color = SELECTED_COLOR if i == self.selected else self.colors[i]
+            self.canvas.create_oval(x - radius, y - radius, x + radius, y + radius,
+                                    fill=color, outline='gray30' if radius >= 3 else '')
+            if show_labels:
+                self.canvas.create_text(x, y + radius + 2, text=self.names[i], anchor='n',
+                                        font=('Arial', 8))
+        if not show_labels and len(drawn):
+            notes.append("nombres ocultos")
+
+        summary = f"{len(nodes)} de {len(self.names)} nodos visibles · {len(self.src)} amistades"
+        if self.selected is not None:
+            summary = f"👤 {self.names[self.selected]} · " + summary
+        self.info_label.config(text=" · ".join([summary] + notes))
+
+    def on_press(self, event):
+        self.drag = (event.x, event.y, False)
+
+    def on_drag(self, event):
+        if self.drag is None:
+            return
+        last_x, last_y, _ = self.drag
+        dx, dy = event.x - last_x, event.y - last_y
+        self.canvas.move('all', dx, dy)
+        self.offset_x += dx
+        self.offset_y += dy
+        self.drag = (event.x, event.y, True)
+        self.schedule_redraw()
+
+    def on_release(self, event):
+        if self.drag is not None and not self.drag[2]:
+            self.selected = self.node_at(event.x, event.y)
+            self.redraw()
+        self.drag = None
+
+    def on_double_click(self, event):
+        index = self.node_at(event.x, event.y)
+        if index is not None and self.on_activate is not None:
+            self.on_activate(self.names[index])
+
+    def node_at(self, x, y):
+        """Nodo más cercano al punto de la pantalla, si está bajo el cursor"""
+        if not self.names:
+            return None
+        wx, wy = (x - self.offset_x) / self.scale, (y - self.offset_y) / self.scale
+        if NUMPY_AVAILABLE:
+            d2 = (self.xs - wx) ** 2 + (self.ys - wy) ** 2
+            index = int(np.argmin(d2))
+            best = float(d2[index])
+        else:
+            best, index = min(((px - wx) ** 2 + (py - wy) ** 2, i) for i, (px, py) in enumerate(zip(self.xs, self.ys)))
+        reach = (self.node_radius() + 3) / self.scale
+        return index if best <= reach * reach else None
+
+    def zoom(self, x, y, factor):
+        """Zoom centrado en (x, y) de la pantalla"""
+        self.canvas.scale('all', x, y, factor, factor)
+        self.offset_x = x - (x - self.offset_x) * factor
+        self.offset_y = y - (y - self.offset_y) * factor
+        self.scale *= factor
+        self.schedule_redraw()
@@ -0,0 +1,258 @@
+"""
+Carga asíncrona de fotos de perfil para la interfaz Tk.
+Las descargas y el redimensionado corren en un pool de hilos; las miniaturas
+se cachean en memoria (LRU de PhotoImage) y en disco (PNG nombrado con el hash
+del contenido de la imagen y el tamaño), así que abrir un perfil nunca bloquea
+la interfaz. Las URL se revalidan con pedidos condicionales (ETag /
+Last-Modified): una foto que cambió en el servidor genera una miniatura nueva.
+El directorio en disco se acota borrando las miniaturas usadas hace más tiempo.
+Los resultados vuelven al hilo de Tk por una cola que se drena con root.after.
+"""
+import hashlib
+import io
+import os
+import queue
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Intentar importar PIL para manejo de imágenes
+try:
+    from PIL import Image, ImageTk
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    print("Advertencia: PIL/Pillow no está instalado. Las fotos de perfil se mostrarán como texto.")
+
+# Directorio de miniaturas en disco, tamaño máximo y cada cuántas escrituras se acota
+THUMBNAIL_DIR = os.path.join(tempfile.gettempdir(), "socialtec_miniaturas")
+THUMBNAIL_DIR_MAX_BYTES = 50 * 1024 * 1024
+PRUNE_EVERY_WRITES = 32
+
+# Miniaturas (PhotoImage) que se mantienen en memoria
+MEMORY_CACHE_SIZE = 256
+
+# Hilos de descarga y tiempo máximo por descarga
+LOADER_WORKERS = 4
+DOWNLOAD_TIMEOUT = 5
+
+# Intervalo con que el hilo de Tk revisa los resultados listos
+POLL_INTERVAL_MS = 30
+
+
+def source_key(source):
+    """
+    Identificador estable de un origen: la URL, o para archivos locales la ruta
+    con su fecha de modificación y tamaño (si el archivo cambia, cambia la clave).
+    """
+    if os.path.isfile(source):
+        stat = os.stat(source)
+        return f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return source
+
+
+def content_digest(data):
+    """Hash del contenido original de una imagen (nombre de sus miniaturas en disco)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class PhotoLoader:
+    """Cargador de miniaturas con pool de hilos, LRU en memoria y caché en disco"""
+
+    def __init__(self, root, workers=LOADER_WORKERS, memory_size=MEMORY_CACHE_SIZE, cache_dir=THUMBNAIL_DIR):
+        self.root = root
+        self.memory = OrderedDict()  # (origen, tamaño) -> PhotoImage
+        self.memory_size = memory_size
+        self.cache_dir = cache_dir
+        self.pending = {}  # (origen, tamaño) -> [callbacks] (cargas en curso)
+        self.results = queue.Queue()  # (clave, bytes PNG o None) desde los hilos
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fotos")
+        self.polling = False
+        self.validators = {}  # URL -> (ETag, Last-Modified, hash del contenido) de la última descarga
+        self.digests = {}  # clave de archivo local -> hash del contenido
+        self.lock = threading.Lock()  # protege validators, digests y writes
+        self.writes = 0  # miniaturas escritas desde el último recorte del directorio
+        os.makedirs(cache_dir, exist_ok=True)
+        self.executor.submit(self.prune)
+
+    def load(self, source, size, callback, fetch=None):
+        """
+        Pide la miniatura de `source` (URL o ruta) de size x size. `callback`
+        se llama en el hilo de Tk con un PhotoImage, o con None si falló.
+        Con `fetch` los bytes de la imagen se obtienen llamándolo (en un hilo
+        del pool) y `source` solo identifica el contenido en las cachés.
+        """
+        key = (source, size)
+        photo = self.memory.get(key)
+        if photo is not None:
+            self.memory.move_to_end(key)
+            callback(photo)
+            return
+        if key in self.pending:
+            self.pending[key].append(callback)
+            return
+        self.pending[key] = [callback]
+        self.executor.submit(self._fetch, key, fetch)
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_INTERVAL_MS, self._drain)
+
+    def _disk_path(self, digest, size):
+        return os.path.join(self.cache_dir, f"{digest}_{size}.png")
+
+    def _download(self, url):
+        """
+        Contenido de una URL como (hash, bytes). Si el servidor responde que no
+        cambió desde la última descarga (304), devuelve (hash, None).
+        """
+        request = urllib.request.Request(url)
+        with self.lock:
+            known = self.validators.get(url)
+        if known is not None:
+            etag, modified, _ = known
+            if etag:
+                request.add_header('If-None-Match', etag)
+            if modified:
+                request.add_header('If-Modified-Since', modified)
+        try:
+            with urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT) as response:
+                data = response.read()
+                etag, modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as error:
+            if error.code == 304 and known is not None:
+                return known[2], None
+            raise
+        digest = content_digest(data)
+        with self.lock:
+            self.validators[url] = (etag, modified, digest)
+        return digest, data
+
+    def _original(self, source, fetch=None):
+        """
+        (hash del contenido, bytes o None) de la imagen original. Los bytes son
+        None cuando el hash ya se conoce sin leerlos (avatares del servidor,
+        archivos sin cambios o URL que respondieron 304).
+        """
+        if fetch is not None:
+            # Los avatares ya están direccionados por contenido: el origen es el hash
+            return content_digest(source.encode('utf-8')), None
+        if os.path.isfile(source):
+            file_key = source_key(source)
+            with self.lock:
+                digest = self.digests.get(file_key)
+            if digest is not None:
+                return digest, None
+            with open(source, 'rb') as f:
+                data = f.read()
+            digest = content_digest(data)
+            with self.lock:
+                self.digests[file_key] = digest
+            return digest, data
+        if source.startswith(('http://', 'https://')):
+            return self._download(source)
+        raise ValueError("Ruta no válida")
+
+    def _fetch(self, key, fetch=None):
+        """Hilo de trabajo: miniatura PNG desde disco o decodificando y redimensionando"""
+        source, size = key
+        try:
+            digest, data = self._original(source, fetch)
+            path = self._disk_path(digest, size)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self.results.put((key, f.read()))
+                os.utime(path)  # usada recién: la última en borrarse al acotar
+                return
+
+            if data is None:
+                if fetch is not None:
+                    data = fetch()
+                elif os.path.isfile(source):
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                else:
+                    # 304 pero la miniatura de ese contenido ya no está en disco
+                    with self.lock:
+                        self.validators.pop(source, None)
+                    digest, data = self._download(source)
+                    path = self._disk_path(digest, size)
+
+            image = Image.open(io.BytesIO(data))
+            image = image.convert("RGBA").resize((size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            thumbnail = buffer.getvalue()
+
+            # Escritura atómica: otro hilo nunca lee un archivo a medias
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(thumbnail)
+            os.replace(temp_path, path)
+            self.results.put((key, thumbnail))
+            with self.lock:
+                self.writes += 1
+                prune = self.writes >= PRUNE_EVERY_WRITES
+                if prune:
+                    self.writes = 0
+            if prune:
+                self.prune()
+        except Exception:
+            self.results.put((key, None))
+
+    def prune(self, max_bytes=THUMBNAIL_DIR_MAX_BYTES):
+        """Borra las miniaturas usadas hace más tiempo hasta que el directorio quepa en max_bytes"""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for entry in scan:
+                    if entry.is_file() and entry.name.endswith('.png'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+        except OSError:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def _drain(self):
+        """Hilo de Tk: crea los PhotoImage listos y llama a sus callbacks"""
+        while True:
+            try:
+                key, data = self.results.get_nowait()
+            except queue.Empty:
+                break
+            photo = None
+            if data is not None:
+                try:
+                    photo = ImageTk.PhotoImage(Image.open(io.BytesIO(data)))
+                except Exception:
+                    photo = None
+            if photo is not None:
+                self.memory[key] = photo
+                if len(self.memory) > self.memory_size:
+                    self.memory.popitem(last=False)
+            for callback in self.pending.pop(key, []):
+                try:
+                    callback(photo)
+                except Exception:
+                    pass  # el widget destino ya no existe
+
+        if self.pending:
+            self.root.after(POLL_INTERVAL_MS, self._drain)
+        else:
+            self.polling = False
+
+    def shutdown(self):
+        """Detiene el pool sin esperar las descargas en curso"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
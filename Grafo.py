@@ -1,66 +1,178 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, MutableSet
+import heapq
+import random
+from AmigosComunes import MutualFriendsEngine, count_mutual_sets
+
+# Políticas para elegir vecinos cuando la red del ego supera el máximo de nodos
+EGO_POLICIES = ("degree", "random")
+
+
+def ego_network(center, k, max_nodes, neighbors, degree, policy="degree", seed=0):
+    """
+    Vecindario de hasta k saltos alrededor de `center`, con un máximo de nodos.
+    Se recorre por niveles (BFS); si un nivel no cabe completo se eligen sus
+    nodos según la política: "degree" (los de mayor grado) o "random" (muestra
+    sembrada). Devuelve {"network": {usuario: amigos dentro del ego},
+    "hops": {usuario: distancia}, "truncated": bool}.
+    """
+    if policy not in EGO_POLICIES:
+        raise ValueError(f"Política desconocida: {policy}")
+    hops = {center: 0}
+    frontier = [center]
+    truncated = False
+    for hop in range(1, k + 1):
+        if not frontier:
+            break
+        if len(hops) >= max_nodes:
+            # Se llegó al máximo y aún quedaban saltos: ¿hay vecinos fuera?
+            truncated = truncated or any(f not in hops for user in frontier for f in neighbors(user))
+            break
+        candidates = set()
+        for user in frontier:
+            candidates.update(f for f in neighbors(user) if f not in hops)
+        room = max_nodes - len(hops)
+        if len(candidates) > room:
+            truncated = True
+            if policy == "degree":
+                chosen = heapq.nlargest(room, candidates, key=lambda u: (degree(u), u))
+            else:
+                chosen = random.Random(seed).sample(sorted(candidates), room)
+        else:
+            chosen = sorted(candidates)
+        for user in chosen:
+            hops[user] = hop
+        frontier = chosen
+    
+    network = {user: sorted(f for f in neighbors(user) if f in hops) for user in hops}
+    return {"network": network, "hops": hops, "truncated": truncated}
+
+
+class SortedNameSet(MutableSet):
+    """
+    Conjunto de nombres que se mantiene ordenado sin distinguir mayúsculas
+    (clave casefold precalculada). Pertenencia en O(1) con un set, inserción y
+    borrado con búsqueda binaria; iterar devuelve los nombres ya ordenados.
+    """
+
+    def __init__(self, names=()):
+        self._members = set(names)
+        self._keys = sorted((name.casefold(), name) for name in self._members)
+        self._names = [name for _, name in self._keys]
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return f"SortedNameSet({self._names!r})"
+
+    def add(self, name):
+        """Inserta un nombre en su posición"""
+        if name in self._members:
+            return
+        key = (name.casefold(), name)
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._names.insert(index, name)
+        self._members.add(name)
+
+    def discard(self, name):
+        """Elimina un nombre si está presente"""
+        if name not in self._members:
+            return
+        index = bisect_left(self._keys, (name.casefold(), name))
+        del self._keys[index]
+        del self._names[index]
+        self._members.discard(name)
+
+    def to_list(self):
+        """Copia ordenada de los nombres (sin volver a ordenar)"""
+        return list(self._names)
+
+    def common(self, other):
+        """Nombres en común con otro SortedNameSet (set sin orden, intersección en C)"""
+        small, large = self._members, other._members
+        if len(small) > len(large):
+            small, large = large, small
+        return small.intersection(large)
+
+
 class SocialNetwork:
-    def __init__(self):
+    def __init__(self, verbose=True):
         self.users = {}  # Diccionario para almacenar usuarios y sus amistades (grafo)
+        self.verbose = verbose  # Mostrar mensajes de cada operación
+    
+    def _log(self, message):
+        """Muestra un mensaje si el modo detallado está activo"""
+        if self.verbose:
+            print(message)
     
     def add_user(self, username):
         """Agrega un nuevo usuario a la red social"""
         if username in self.users:
-            print(f"El usuario '{username}' ya existe.")
+            self._log(f"El usuario '{username}' ya existe.")
             return False
         self.users[username] = set()
-        print(f"Usuario '{username}' agregado exitosamente.")
+        self._log(f"Usuario '{username}' agregado exitosamente.")
         return True
     
     def remove_user(self, username):
         """Elimina un usuario y todas sus amistades"""
         if username not in self.users:
-            print(f"El usuario '{username}' no existe.")
+            self._log(f"El usuario '{username}' no existe.")
             return False
         # Eliminar al usuario de las listas de amigos de otros usuarios
         for friend in self.users[username]:
             self.users[friend].discard(username)
         del self.users[username]
-        print(f"Usuario '{username}' eliminado exitosamente.")
+        self._log(f"Usuario '{username}' eliminado exitosamente.")
         return True
     
     def add_friendship(self, user1, user2):
         """Agrega una amistad entre dos usuarios (arista bidireccional)"""
         if user1 not in self.users:
-            print(f"El usuario '{user1}' no existe.")
+            self._log(f"El usuario '{user1}' no existe.")
             return False
         if user2 not in self.users:
-            print(f"El usuario '{user2}' no existe.")
+            self._log(f"El usuario '{user2}' no existe.")
             return False
         if user1 == user2:
-            print("Un usuario no puede ser amigo de sí mismo.")
+            self._log("Un usuario no puede ser amigo de sí mismo.")
             return False
         if user2 in self.users[user1]:
-            print(f"'{user1}' y '{user2}' ya son amigos.")
+            self._log(f"'{user1}' y '{user2}' ya son amigos.")
             return False
         
         self.users[user1].add(user2)
         self.users[user2].add(user1)
-        print(f"Amistad entre '{user1}' y '{user2}' agregada exitosamente.")
+        self._log(f"Amistad entre '{user1}' y '{user2}' agregada exitosamente.")
         return True
     
     def remove_friendship(self, user1, user2):
         """Elimina una amistad entre dos usuarios"""
         if user1 not in self.users or user2 not in self.users:
-            print("Uno o ambos usuarios no existen.")
+            self._log("Uno o ambos usuarios no existen.")
             return False
         if user2 not in self.users[user1]:
-            print(f"'{user1}' y '{user2}' no son amigos.")
+            self._log(f"'{user1}' y '{user2}' no son amigos.")
             return False
         
         self.users[user1].discard(user2)
         self.users[user2].discard(user1)
-        print(f"Amistad entre '{user1}' y '{user2}' eliminada exitosamente.")
+        self._log(f"Amistad entre '{user1}' y '{user2}' eliminada exitosamente.")
         return True
     
     def get_friends(self, username):
         """Obtiene la lista de amigos de un usuario"""
         if username not in self.users:
-            print(f"El usuario '{username}' no existe.")
+            self._log(f"El usuario '{username}' no existe.")
             return None
         return list(self.users[username])
     
@@ -73,10 +185,25 @@ class SocialNetwork:
     def get_mutual_friends(self, user1, user2):
         """Obtiene los amigos en común entre dos usuarios"""
         if user1 not in self.users or user2 not in self.users:
-            print("Uno o ambos usuarios no existen.")
+            self._log("Uno o ambos usuarios no existen.")
             return None
         return list(self.users[user1].intersection(self.users[user2]))
     
+    def count_mutual_friends(self, user1, user2):
+        """Cuenta los amigos en común sin construir la lista"""
+        if user1 not in self.users or user2 not in self.users:
+            self._log("Uno o ambos usuarios no existen.")
+            return None
+        return count_mutual_sets(self.users[user1], self.users[user2])
+    
+    def get_ego_network(self, username, k=2, max_nodes=200, policy="degree"):
+        """Obtiene la red de hasta k saltos alrededor de un usuario (con máximo de nodos)"""
+        if username not in self.users:
+            self._log(f"El usuario '{username}' no existe.")
+            return None
+        return ego_network(username, k, max_nodes, lambda u: self.users[u],
+                           lambda u: len(self.users[u]), policy)
+    
     def display_network(self):
         """Muestra toda la red social"""
         print("\n=== Red Social ===")
@@ -89,3 +216,227 @@ class SocialNetwork:
         print("==================\n")
 
 
+class _FriendsView(Mapping):
+    """Vista de solo lectura {usuario: set de amigos} sobre la red compacta"""
+    
+    def __init__(self, network):
+        self.network = network
+    
+    def __getitem__(self, username):
+        uid = self.network.ids[username]
+        return {self.network.names[f] for f in self.network.neighbor_ids(uid)}
+    
+    def __iter__(self):
+        return iter(self.network.ids)
+    
+    def __len__(self):
+        return len(self.network.ids)
+
+
+class CompactSocialNetwork:
+    """
+    Red social con los nombres internados como IDs enteros densos.
+    Cada lista de amigos es un array('I') ordenado; freeze() la convierte en
+    CSR (indptr/indices) para consultas de solo lectura con menos memoria.
+    Mantiene los mismos métodos públicos que SocialNetwork.
+    """
+    
+    def __init__(self, verbose=True):
+        self.ids = {}          # nombre -> ID entero
+        self.names = []        # ID entero -> nombre (None si el ID está libre)
+        self.free_ids = []     # IDs liberados para reutilizar
+        self.adjacency = []    # ID -> array('I') ordenado de IDs de amigos
+        self.revision = []     # ID -> contador de cambios de su lista (para cachés)
+        self.indptr = None     # Modo CSR: vecinos de i en indices[indptr[i]:indptr[i+1]]
+        self.indices = None
+        self.frozen = False
+        self.verbose = verbose
+        self.mutual_engine = MutualFriendsEngine(self)
+    
+    def _log(self, message):
+        """Muestra un mensaje si el modo detallado está activo"""
+        if self.verbose:
+            print(message)
+    
+    @property
+    def users(self):
+        """Compatibilidad con SocialNetwork.users (vista {usuario: amigos})"""
+        return _FriendsView(self)
+    
+    # ==================== MODO CSR ====================
+    def freeze(self):
+        """Compacta la adyacencia en formato CSR (solo lectura)"""
+        if self.frozen:
+            return
+        self.indptr = array('Q', [0])
+        self.indices = array('I')
+        for friends in self.adjacency:
+            self.indices.extend(friends)
+            self.indptr.append(len(self.indices))
+        self.adjacency = []
+        self.frozen = True
+    
+    def thaw(self):
+        """Vuelve a listas por usuario para permitir modificaciones"""
+        if not self.frozen:
+            return
+        self.adjacency = [
+            self.indices[self.indptr[i]:self.indptr[i + 1]]
+            for i in range(len(self.indptr) - 1)
+        ]
+        self.indptr = None
+        self.indices = None
+        self.frozen = False
+    
+    def neighbor_ids(self, uid):
+        """IDs de los amigos de un usuario, ordenados"""
+        if self.frozen:
+            return self.indices[self.indptr[uid]:self.indptr[uid + 1]]
+        return self.adjacency[uid]
+    
+    def degree(self, uid):
+        """Cantidad de amigos de un usuario"""
+        if self.frozen:
+            return self.indptr[uid + 1] - self.indptr[uid]
+        return len(self.adjacency[uid])
+    
+    # ==================== OPERACIONES ====================
+    def add_user(self, username):
+        """Agrega un nuevo usuario a la red social"""
+        if username in self.ids:
+            self._log(f"El usuario '{username}' ya existe.")
+            return False
+        self.thaw()
+        if self.free_ids:
+            uid = self.free_ids.pop()
+            self.names[uid] = username
+            self.adjacency[uid] = array('I')
+            self.revision[uid] += 1
+        else:
+            uid = len(self.names)
+            self.names.append(username)
+            self.adjacency.append(array('I'))
+            self.revision.append(0)
+        self.ids[username] = uid
+        self._log(f"Usuario '{username}' agregado exitosamente.")
+        return True
+    
+    def remove_user(self, username):
+        """Elimina un usuario y todas sus amistades"""
+        if username not in self.ids:
+            self._log(f"El usuario '{username}' no existe.")
+            return False
+        self.thaw()
+        uid = self.ids.pop(username)
+        for fid in self.adjacency[uid]:
+            friends = self.adjacency[fid]
+            del friends[bisect_left(friends, uid)]
+            self.revision[fid] += 1
+        self.adjacency[uid] = array('I')
+        self.revision[uid] += 1
+        self.names[uid] = None
+        self.free_ids.append(uid)
+        self._log(f"Usuario '{username}' eliminado exitosamente.")
+        return True
+    
+    def add_friendship(self, user1, user2):
+        """Agrega una amistad entre dos usuarios (arista bidireccional)"""
+        if user1 not in self.ids:
+            self._log(f"El usuario '{user1}' no existe.")
+            return False
+        if user2 not in self.ids:
+            self._log(f"El usuario '{user2}' no existe.")
+            return False
+        if user1 == user2:
+            self._log("Un usuario no puede ser amigo de sí mismo.")
+            return False
+        if self.are_friends(user1, user2):
+            self._log(f"'{user1}' y '{user2}' ya son amigos.")
+            return False
+        
+        self.thaw()
+        id1, id2 = self.ids[user1], self.ids[user2]
+        friends1, friends2 = self.adjacency[id1], self.adjacency[id2]
+        friends1.insert(bisect_left(friends1, id2), id2)
+        friends2.insert(bisect_left(friends2, id1), id1)
+        self.revision[id1] += 1
+        self.revision[id2] += 1
+        self._log(f"Amistad entre '{user1}' y '{user2}' agregada exitosamente.")
+        return True
+    
+    def remove_friendship(self, user1, user2):
+        """Elimina una amistad entre dos usuarios"""
+        if user1 not in self.ids or user2 not in self.ids:
+            self._log("Uno o ambos usuarios no existen.")
+            return False
+        if not self.are_friends(user1, user2):
+            self._log(f"'{user1}' y '{user2}' no son amigos.")
+            return False
+        
+        self.thaw()
+        id1, id2 = self.ids[user1], self.ids[user2]
+        friends1, friends2 = self.adjacency[id1], self.adjacency[id2]
+        del friends1[bisect_left(friends1, id2)]
+        del friends2[bisect_left(friends2, id1)]
+        self.revision[id1] += 1
+        self.revision[id2] += 1
+        self._log(f"Amistad entre '{user1}' y '{user2}' eliminada exitosamente.")
+        return True
+    
+    def get_friends(self, username):
+        """Obtiene la lista de amigos de un usuario"""
+        if username not in self.ids:
+            self._log(f"El usuario '{username}' no existe.")
+            return None
+        return [self.names[f] for f in self.neighbor_ids(self.ids[username])]
+    
+    def are_friends(self, user1, user2):
+        """Verifica si dos usuarios son amigos (búsqueda binaria)"""
+        if user1 not in self.ids or user2 not in self.ids:
+            return False
+        friends = self.neighbor_ids(self.ids[user1])
+        id2 = self.ids[user2]
+        pos = bisect_left(friends, id2)
+        return pos < len(friends) and friends[pos] == id2
+    
+    def get_mutual_friends(self, user1, user2):
+        """Obtiene los amigos en común entre dos usuarios"""
+        if user1 not in self.ids or user2 not in self.ids:
+            self._log("Uno o ambos usuarios no existen.")
+            return None
+        mutual = self.mutual_engine.mutual_ids(self.ids[user1], self.ids[user2])
+        return [self.names[f] for f in mutual]
+    
+    def count_mutual_friends(self, user1, user2):
+        """Cuenta los amigos en común sin construir la lista"""
+        if user1 not in self.ids or user2 not in self.ids:
+            self._log("Uno o ambos usuarios no existen.")
+            return None
+        return self.mutual_engine.mutual_ids(self.ids[user1], self.ids[user2], count_only=True)
+    
+    def get_ego_network(self, username, k=2, max_nodes=200, policy="degree"):
+        """Obtiene la red de hasta k saltos alrededor de un usuario (con máximo de nodos)"""
+        if username not in self.ids:
+            self._log(f"El usuario '{username}' no existe.")
+            return None
+        return ego_network(username, k, max_nodes,
+                           lambda u: [self.names[f] for f in self.neighbor_ids(self.ids[u])],
+                           lambda u: self.degree(self.ids[u]), policy)
+    
+    def display_network(self):
+        """Muestra toda la red social"""
+        print("\n=== Red Social ===")
+        if not self.ids:
+            print("La red está vacía.")
+            return
+        for user, uid in self.ids.items():
+            friends = [self.names[f] for f in self.neighbor_ids(uid)]
+            friends_list = ", ".join(friends) if friends else "Sin amigos"
+            print(f"{user}: {friends_list}")
+        print("==================\n")
+    
+    def num_friendships(self):
+        """Cantidad de amistades (aristas no dirigidas)"""
+        if self.frozen:
+            return len(self.indices) // 2
+        return sum(len(friends) for friends in self.adjacency) // 2
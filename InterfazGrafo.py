@@ -1,12 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 from Grafo import SocialNetwork
-import subprocess
-import os
-import tempfile
-
-# Ruta de Graphviz (ajustar si es necesario)
-GRAPHVIZ_PATH = r"C:\Program Files\Graphviz\bin"
+from ListaVirtual import NetworkView
+from Dibujo import GraphCanvas, LayoutCache
+from Renderizado import GraphvizRenderer, open_file
+from Tareas import RequestExecutor
 
 class SocialNetworkGUI:
     def __init__(self, root):
@@ -17,6 +15,10 @@ class SocialNetworkGUI:
         
         # Crear la red social
         self.network = SocialNetwork()
+        self.graph_version = 0  # Aumenta con cada cambio (clave de las disposiciones)
+        self.layouts = LayoutCache()
+        self.executor = RequestExecutor(root)  # Graphviz corre en segundo plano
+        self.graphviz = GraphvizRenderer()  # Imágenes generadas, por hash del DOT, motor y formato
         
         # Crear el notebook (pestañas)
         self.notebook = ttk.Notebook(root)
@@ -293,9 +295,34 @@ class SocialNetworkGUI:
         ttk.Button(controls_frame, text="💾 Guardar Código DOT", 
                    command=self.save_dot_code).grid(row=0, column=5, padx=5, pady=5)
         
-        # Frame para el código DOT
-        dot_frame = ttk.LabelFrame(viz_frame, text="Código DOT (Graphviz)", padding=10)
-        dot_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        # Vista del ego (por defecto): vecindario de k saltos con máximo de nodos
+        ttk.Label(controls_frame, text="Vista:").grid(row=1, column=0, padx=5, pady=5)
+        self.view_mode_combo = ttk.Combobox(controls_frame, width=15, state="readonly",
+                                            values=["ego", "completa"])
+        self.view_mode_combo.set("ego")
+        self.view_mode_combo.grid(row=1, column=1, padx=5, pady=5)
+        
+        ttk.Label(controls_frame, text="Centro:").grid(row=1, column=2, padx=5, pady=5)
+        self.ego_center_combo = ttk.Combobox(controls_frame, width=15, state="readonly")
+        self.ego_center_combo.grid(row=1, column=3, padx=5, pady=5)
+        
+        ttk.Label(controls_frame, text="Saltos / Máx. nodos:").grid(row=2, column=0, padx=5, pady=5)
+        self.ego_hops_spin = ttk.Spinbox(controls_frame, from_=1, to=4, width=5)
+        self.ego_hops_spin.set(2)
+        self.ego_hops_spin.grid(row=2, column=1, padx=5, pady=5, sticky='w')
+        self.ego_max_spin = ttk.Spinbox(controls_frame, from_=10, to=2000, increment=10, width=6)
+        self.ego_max_spin.set(150)
+        self.ego_max_spin.grid(row=2, column=1, padx=5, pady=5, sticky='e')
+        
+        # Dibujo dentro de la aplicación y código DOT (Graphviz)
+        viz_notebook = ttk.Notebook(viz_frame)
+        viz_notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        self.graph_canvas = GraphCanvas(viz_notebook)
+        viz_notebook.add(self.graph_canvas, text="🕸️ Dibujo")
+        
+        dot_frame = ttk.Frame(viz_notebook, padding=10)
+        viz_notebook.add(dot_frame, text="📝 Código DOT (Graphviz)")
         
         self.dot_text = scrolledtext.ScrolledText(dot_frame, font=('Consolas', 11), height=20)
         self.dot_text.pack(fill='both', expand=True)
@@ -307,17 +334,40 @@ class SocialNetworkGUI:
         # Generar código DOT inicial
         self.update_dot_code()
     
+    def visible_network(self):
+        """Red a dibujar: la del ego seleccionado (por defecto) o la completa"""
+        users = self.network.users
+        if self.view_mode_combo.get() != "ego" or not users:
+            return users, None
+        
+        # Sin centro elegido se usa el usuario con más amigos
+        center = self.ego_center_combo.get()
+        if center not in users:
+            center = max(users, key=lambda u: (len(users[u]), u))
+        try:
+            k = int(self.ego_hops_spin.get())
+            max_nodes = int(self.ego_max_spin.get())
+        except ValueError:
+            k, max_nodes = 2, 150
+        ego = self.network.get_ego_network(center, k=k, max_nodes=max_nodes)
+        return ego["network"], ego
+    
     def generate_dot_code(self):
         """Genera el código DOT para Graphviz"""
+        network, ego = self.visible_network()
+        
         dot = ['graph RedSocial {']
         dot.append('    // Configuración del grafo')
+        if ego is not None:
+            note = " (recortada)" if ego["truncated"] else ""
+            dot.append(f'    // Vista del ego{note}: {len(network)} nodos')
         dot.append('    graph [overlap=false, splines=true];')
         dot.append('    node [shape=circle, style=filled, fillcolor=lightblue, fontname="Arial"];')
         dot.append('    edge [color=gray50, penwidth=2];')
         dot.append('')
         dot.append('    // Nodos (usuarios)')
         
-        for user in self.network.users:
+        for user in network:
             dot.append(f'    "{user}";')
         
         dot.append('')
@@ -325,7 +375,7 @@ class SocialNetworkGUI:
         
         # Para evitar duplicados (ya que es un grafo no dirigido)
         added_edges = set()
-        for user, friends in self.network.users.items():
+        for user, friends in network.items():
             for friend in friends:
                 edge = tuple(sorted([user, friend]))
                 if edge not in added_edges:
@@ -336,54 +386,33 @@ class SocialNetworkGUI:
         return '\n'.join(dot)
     
     def update_dot_code(self):
-        """Actualiza el código DOT en el área de texto"""
+        """Actualiza el código DOT en el área de texto y el dibujo"""
         self.dot_text.delete(1.0, tk.END)
         self.dot_text.insert(tk.END, self.generate_dot_code())
+        self.draw_graph()
+    
+    def draw_graph(self):
+        """Dibuja la red visible con una disposición cacheada por versión y vista"""
+        network, _ = self.visible_network()
+        key = (self.graph_version, self.view_mode_combo.get(), self.ego_center_combo.get(),
+               self.ego_hops_spin.get(), self.ego_max_spin.get())
+        positions = self.layouts.get(key, network)
+        self.graph_canvas.set_graph(network, positions)
     
     def generate_graph_image(self):
-        """Genera y abre la imagen del grafo usando Graphviz"""
-        try:
-            dot_code = self.dot_text.get(1.0, tk.END)
-            output_format = self.format_combo.get()
-            layout = self.layout_combo.get()
-            
-            # Crear archivo temporal para el código DOT
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.dot', delete=False, encoding='utf-8') as dot_file:
-                dot_file.write(dot_code)
-                dot_path = dot_file.name
-            
-            # Crear ruta para la imagen de salida
-            output_path = dot_path.replace('.dot', f'.{output_format}')
-            
-            # Ejecutar Graphviz
-            try:
-                # Usar la ruta completa de Graphviz
-                graphviz_exe = os.path.join(GRAPHVIZ_PATH, f"{layout}.exe")
-                result = subprocess.run(
-                    [graphviz_exe, f'-T{output_format}', dot_path, '-o', output_path],
-                    capture_output=True, text=True, timeout=30
-                )
-                
-                if result.returncode != 0:
-                    messagebox.showerror("Error de Graphviz", 
-                        f"Error al generar el grafo:\n{result.stderr}\n\n"
-                        "Asegúrese de que Graphviz esté instalado y en el PATH.")
-                    return
-                
-                # Abrir la imagen con el visor predeterminado
-                os.startfile(output_path)
-                messagebox.showinfo("Éxito", f"Imagen generada: {output_path}")
-                
-            except FileNotFoundError:
-                messagebox.showerror("Error", 
-                    "Graphviz no está instalado o no está en el PATH.\n\n"
-                    "Por favor instale Graphviz desde:\nhttps://graphviz.org/download/\n\n"
-                    "Y asegúrese de agregar la carpeta 'bin' al PATH del sistema.")
-            except subprocess.TimeoutExpired:
-                messagebox.showerror("Error", "Tiempo de espera agotado al generar el grafo.")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Error inesperado: {str(e)}")
+        """Genera la imagen del grafo con Graphviz en segundo plano y la abre"""
+        def show(response):
+            if response.get("status") != "success":
+                messagebox.showerror("Error de Graphviz", response.get("message"))
+                return
+            open_file(response["path"])
+            note = " (ya generada)" if response["cached"] else ""
+            messagebox.showinfo("Éxito", f"Imagen generada con {response['engine']}{note}: {response['path']}")
+        
+        self.executor.submit(self.graphviz.render, self.dot_text.get(1.0, tk.END),
+                             self.layout_combo.get(), self.format_combo.get(),
+                             on_success=show, label="Graphviz", key="graphviz",
+                             on_error=lambda e: messagebox.showerror("Error", f"Error inesperado: {str(e)}"))
     
     def save_dot_code(self):
         """Guarda el código DOT en un archivo"""
@@ -420,39 +449,27 @@ class SocialNetworkGUI:
         view_frame = ttk.LabelFrame(network_frame, text="Red Social Completa", padding=10)
         view_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        self.network_text = scrolledtext.ScrolledText(view_frame, font=('Consolas', 12), height=20)
-        self.network_text.pack(fill='both', expand=True)
+        # Vista paginada: solo se arma el texto de la página visible
+        self.network_view = NetworkView(view_frame, font=('Consolas', 12))
+        self.network_view.pack(fill='both', expand=True)
         
         ttk.Button(view_frame, text="🔄 Actualizar Vista", command=self.update_network_view).pack(pady=5)
     
     def update_network_view(self):
         """Actualiza la vista de la red completa"""
-        self.network_text.delete(1.0, tk.END)
-        
-        if not self.network.users:
-            self.network_text.insert(tk.END, "La red está vacía.\n")
-            self.stats_label.config(text="Usuarios: 0 | Amistades: 0")
-            return
-        
         # Calcular estadísticas
         num_users = len(self.network.users)
         num_friendships = sum(len(friends) for friends in self.network.users.values()) // 2
         
         self.stats_label.config(text=f"Usuarios: {num_users} | Amistades: {num_friendships}")
         
-        # Mostrar la red
-        self.network_text.insert(tk.END, "╔══════════════════════════════════════╗\n")
-        self.network_text.insert(tk.END, "║           RED SOCIAL                 ║\n")
-        self.network_text.insert(tk.END, "╚══════════════════════════════════════╝\n\n")
-        
-        for user, friends in sorted(self.network.users.items()):
-            friends_list = ", ".join(sorted(friends)) if friends else "Sin amigos"
-            self.network_text.insert(tk.END, f"👤 {user}\n")
-            self.network_text.insert(tk.END, f"   └── Amigos: {friends_list}\n\n")
+        # Mostrar la red (la vista arma solo la página visible)
+        self.network_view.set_network(self.network.users)
     
     # ==================== ACTUALIZACIÓN DE LISTAS ====================
     def update_user_lists(self):
         """Actualiza todas las listas de usuarios en la interfaz"""
+        self.graph_version += 1
         users = list(self.network.users.keys())
         users.sort()
         
@@ -468,7 +485,8 @@ class SocialNetworkGUI:
             self.unfriend1_combo, self.unfriend2_combo,
             self.query_user_combo,
             self.mutual1_combo, self.mutual2_combo,
-            self.check1_combo, self.check2_combo
+            self.check1_combo, self.check2_combo,
+            self.ego_center_combo
         ]
         
         for combo in combos:
@@ -0,0 +1,329 @@
+"""
+Lista virtualizada para Tk.
+Un Listbox crea un elemento por fila, así que llenarlo con decenas de miles de
+usuarios (y rehacerlo en cada tecla) congela la interfaz. VirtualList dibuja en
+un Canvas solo las filas visibles: conoce la cantidad de filas y pide el texto
+de cada una a una función al desplazarse, reutilizando los mismos ítems.
+NetworkView muestra la red (usuario y sus amigos) por páginas: el texto de
+cada página se arma desde la adyacencia al mostrarla, con salto a un usuario
+y búsqueda incremental por nombre.
+"""
+from bisect import bisect_left
+import tkinter as tk
+from tkinter import ttk, scrolledtext
+import tkinter.font as tkfont
+
+# Filas adicionales que se dibujan fuera de la vista (evita parpadeos al desplazar)
+OVERSCAN_ROWS = 2
+
+# Usuarios por página en la vista de la red
+NETWORK_PAGE_SIZE = 100
+
+# Espera tras la última tecla antes de buscar en la vista de la red
+SEARCH_DELAY_MS = 150
+
+# Colores de la fila seleccionada
+SELECT_BG = '#2196F3'
+SELECT_FG = 'white'
+
+
+class VirtualList(ttk.Frame):
+    """
+    Lista de `count` filas cuyo texto se obtiene con `render(i)` solo al
+    mostrarla. Soporta selección con clic y teclado, rueda del mouse y
+    `on_activate(i)` (doble clic o Enter).
+    """
+
+    def __init__(self, master, font=('Consolas', 11), empty_text="", on_activate=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.font = tkfont.Font(font=font)
+        self.row_height = self.font.metrics('linespace') + 4
+        self.empty_text = empty_text
+        self.on_activate = on_activate
+        self.count = 0
+        self.render = None
+        self.top = 0  # primera fila visible
+        self.selected = None
+        self.rows = []  # [(rectángulo, texto)] reutilizados para las filas visibles
+
+        self.canvas = tk.Canvas(self, background='white', highlightthickness=1,
+                                highlightbackground='#BDBDBD', takefocus=1)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.canvas.pack(fill='both', expand=True, side='left')
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.canvas.bind('<Configure>', lambda e: self.redraw())
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.canvas.bind('<Double-Button-1>', self.on_double_click)
+        self.canvas.bind('<MouseWheel>', self.on_wheel)
+        self.canvas.bind('<Button-4>', lambda e: self.yview('scroll', -3, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.yview('scroll', 3, 'units'))
+        self.canvas.bind('<Up>', lambda e: self.move_selection(-1))
+        self.canvas.bind('<Down>', lambda e: self.move_selection(1))
+        self.canvas.bind('<Prior>', lambda e: self.move_selection(-self.visible_rows()))
+        self.canvas.bind('<Next>', lambda e: self.move_selection(self.visible_rows()))
+        self.canvas.bind('<Return>', lambda e: self.activate())
+
+    def set_items(self, count, render, keep_position=False):
+        """Reemplaza el contenido: `count` filas con texto `render(i)`"""
+        self.count = count
+        self.render = render
+        self.selected = None
+        if not keep_position:
+            self.top = 0
+        self.redraw()
+
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def _clamp_top(self, top):
+        return max(0, min(top, self.count - self.visible_rows()))
+
+    def redraw(self):
+        """Dibuja solo las filas visibles y actualiza la barra de desplazamiento"""
+        self.top = self._clamp_top(self.top)
+        width = self.canvas.winfo_width()
+        visible = self.visible_rows()
+        needed = min(visible + OVERSCAN_ROWS, self.count - self.top) if self.count else 1
+
+        # Crear ítems solo si la vista creció; los sobrantes se ocultan
+        while len(self.rows) < needed:
+            rect = self.canvas.create_rectangle(0, 0, 0, 0, width=0, fill='')
+            text = self.canvas.create_text(0, 0, anchor='nw', font=self.font)
+            self.rows.append((rect, text))
+
+        for i, (rect, text) in enumerate(self.rows):
+            index = self.top + i
+            if i >= needed:
+                self.canvas.itemconfigure(rect, state='hidden')
+                self.canvas.itemconfigure(text, state='hidden')
+                continue
+            y = i * self.row_height
+            if not self.count:
+                label, selected = self.empty_text, False
+            else:
+                label, selected = self.render(index), index == self.selected
+            self.canvas.coords(rect, 0, y, width, y + self.row_height)
+            self.canvas.itemconfigure(rect, state='normal', fill=SELECT_BG if selected else '')
+            self.canvas.coords(text, 4, y + 2)
+            self.canvas.itemconfigure(text, state='normal', text=label,
+                                      fill=SELECT_FG if selected else 'black')
+
+        if self.count:
+            self.scrollbar.set(self.top / self.count, min(1.0, (self.top + visible) / self.count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Protocolo de desplazamiento de Tk ('moveto', fracción) / ('scroll', n, unidad)"""
+        if not args:
+            return
+        if args[0] == 'moveto':
+            top = int(float(args[1]) * self.count)
+        elif args[0] == 'scroll':
+            step = self.visible_rows() if args[2] == 'pages' else 1
+            top = self.top + int(args[1]) * step
+        else:
+            return
+        top = self._clamp_top(top)
+        if top != self.top:
+            self.top = top
+            self.redraw()
+
+    def see(self, index):
+        """Desplaza lo mínimo para que la fila `index` quede visible"""
+        visible = self.visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + visible:
+            self.top = index - visible + 1
+        self.redraw()
+
+    def on_wheel(self, event):
+        self.yview('scroll', -3 if event.delta > 0 else 3, 'units')
+
+    def index_at(self, y):
+        index = self.top + int(y) // self.row_height
+        return index if 0 <= index < self.count else None
+
+    def on_click(self, event):
+        self.canvas.focus_set()
+        self.selected = self.index_at(event.y)
+        self.redraw()
+
+    def on_double_click(self, event):
+        self.on_click(event)
+        self.activate()
+
+    def move_selection(self, delta):
+        if not self.count:
+            return
+        current = self.selected if self.selected is not None else self.top - 1
+        self.selected = max(0, min(self.count - 1, current + delta))
+        self.see(self.selected)
+
+    def activate(self):
+        if self.selected is not None and self.on_activate is not None:
+            self.on_activate(self.selected)
+
+    def curselection(self):
+        """Como Listbox.curselection(): tupla con la fila seleccionada (o vacía)"""
+        return () if self.selected is None else (self.selected,)
+
+
+class NetworkView(ttk.Frame):
+    """
+    Vista paginada de {usuario: amigos}. Solo la página visible existe en el
+    widget de texto (una inserción por página), así que el costo de mostrar
+    la red no depende de su tamaño.
+    """
+
+    def __init__(self, master, font=('Consolas', 11), page_size=NETWORK_PAGE_SIZE, **kwargs):
+        super().__init__(master, **kwargs)
+        self.page_size = page_size
+        self.adjacency = {}
+        self.users = []   # usuarios en orden alfabético
+        self.folded = []  # nombres en minúsculas, en el mismo orden (para buscar)
+        self.me = None
+        self.page = 0
+        self.query = ""
+        self.matches = []  # posiciones en self.users que coinciden con self.query
+        self.match_index = -1
+        self.search_job = None
+
+        controls = ttk.Frame(self)
+        controls.pack(fill='x', pady=(0, 5))
+        ttk.Label(controls, text="Ir a:").pack(side='left')
+        self.jump_entry = ttk.Entry(controls, width=18)
+        self.jump_entry.pack(side='left', padx=5)
+        self.jump_entry.bind('<Return>', lambda e: self.jump_to(self.jump_entry.get()))
+
+        ttk.Label(controls, text="Buscar:").pack(side='left', padx=(10, 0))
+        self.search_entry = ttk.Entry(controls, width=18)
+        self.search_entry.pack(side='left', padx=5)
+        self.search_entry.bind('<KeyRelease>', self.on_search_key)
+        self.search_entry.bind('<Return>', lambda e: self.next_match(1))
+        ttk.Button(controls, text="▲", width=3, command=lambda: self.next_match(-1)).pack(side='left')
+        ttk.Button(controls, text="▼", width=3, command=lambda: self.next_match(1)).pack(side='left')
+        self.match_label = ttk.Label(controls, text="", width=12)
+        self.match_label.pack(side='left', padx=5)
+
+        ttk.Button(controls, text="▶", width=3, command=lambda: self.show_page(self.page + 1)).pack(side='right')
+        self.page_label = ttk.Label(controls, text="")
+        self.page_label.pack(side='right', padx=5)
+        ttk.Button(controls, text="◀", width=3, command=lambda: self.show_page(self.page - 1)).pack(side='right')
+
+        self.text = scrolledtext.ScrolledText(self, font=font, height=20)
+        self.text.pack(fill='both', expand=True)
+        self.text.tag_configure('coincidencia', background='#FFF59D')
+        self.text.tag_configure('actual', background='#FFCC80')
+
+    @property
+    def pages(self):
+        return max(1, -(-len(self.users) // self.page_size))
+
+    def set_network(self, adjacency, users=None, me=None):
+        """
+        Reemplaza la red mostrada. `users` es la lista ordenada de usuarios si
+        ya se tiene (si no, se ordena aquí). Se conserva el primer usuario de
+        la página actual y la búsqueda en curso.
+        """
+        first = self.users[self.page * self.page_size] if self.users else None
+        self.adjacency = adjacency
+        self.users = users if users is not None else sorted(adjacency)
+        self.folded = [user.lower() for user in self.users]
+        self.me = me
+        self.page = bisect_left(self.users, first) // self.page_size if first is not None else 0
+        self.query, self.matches, self.match_index = "", [], -1
+        self.search(self.search_entry.get(), move=False)
+        self.show_page(self.page)
+
+    def show_page(self, page, current=None):
+        """Arma y muestra el texto de una página; `current` es la posición a resaltar"""
+        page = max(0, min(page, self.pages - 1))
+        self.page = page
+        start = page * self.page_size
+        stop = min(start + self.page_size, len(self.users))
+
+        lines = []
+        for user in self.users[start:stop]:
+            friends = self.adjacency.get(user) or ()
+            marker = " (tú)" if user == self.me else ""
+            friends_str = ", ".join(sorted(friends)) if friends else "Sin amigos"
+            lines.append(f"👤 {user}{marker}\n   └── Amigos: {friends_str}\n\n")
+
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, "".join(lines) if lines else "La red está vacía.\n")
+        self.page_label.config(text=f"{start + 1 if lines else 0}–{stop} de {len(self.users)}  "
+                                    f"(pág. {page + 1}/{self.pages})")
+
+        # Resaltar las coincidencias de esta página (cada usuario ocupa 3 líneas)
+        low = bisect_left(self.matches, start)
+        high = bisect_left(self.matches, stop)
+        for position in self.matches[low:high]:
+            line = (position - start) * 3 + 1
+            self.text.tag_add('coincidencia', f"{line}.0", f"{line}.end")
+        if current is not None and start <= current < stop:
+            line = (current - start) * 3 + 1
+            self.text.tag_add('actual', f"{line}.0", f"{line}.end")
+            self.text.see(f"{line}.0")
+
+    def jump_to(self, username):
+        """Muestra la página del usuario (o del primero que empieza con el texto dado)"""
+        username = username.strip()
+        if not username or not self.users:
+            return
+        position = bisect_left(self.users, username)
+        if position == len(self.users) or not self.users[position].startswith(username):
+            # Sin coincidencia exacta de mayúsculas: buscar sin distinguirlas
+            prefix = username.lower()
+            position = next((i for i, name in enumerate(self.folded) if name.startswith(prefix)), None)
+            if position is None:
+                self.match_label.config(text="No existe")
+                return
+        self.match_label.config(text="")
+        self.show_page(position // self.page_size, current=position)
+
+    def on_search_key(self, event):
+        if event.keysym == 'Return':
+            return
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, lambda: self.search(self.search_entry.get()))
+
+    def search(self, query, move=True):
+        """
+        Usuarios cuyo nombre contiene `query`. Si la consulta solo se alargó,
+        se filtran las coincidencias anteriores en vez de recorrer toda la red.
+        """
+        self.search_job = None
+        query = query.strip().lower()
+        if not query:
+            self.matches = []
+        elif self.query and self.query in query:
+            folded = self.folded
+            self.matches = [i for i in self.matches if query in folded[i]]
+        else:
+            self.matches = [i for i, name in enumerate(self.folded) if query in name]
+        self.query = query
+        self.match_index = -1
+        if not query:
+            self.match_label.config(text="")
+        elif not self.matches:
+            self.match_label.config(text="Sin resultados")
+        else:
+            self.match_label.config(text=f"{len(self.matches)} resultado(s)")
+        if move:
+            if self.matches:
+                self.next_match(1)
+            else:
+                self.show_page(self.page)
+
+    def next_match(self, step):
+        """Salta a la coincidencia siguiente (step=1) o anterior (step=-1)"""
+        if not self.matches:
+            return
+        self.match_index = (self.match_index + step) % len(self.matches)
+        position = self.matches[self.match_index]
+        self.match_label.config(text=f"{self.match_index + 1} de {len(self.matches)}")
+        self.show_page(position // self.page_size, current=position)
@@ -0,0 +1,177 @@
+"""
+Renderizado de código DOT con Graphviz en segundo plano.
+GraphvizRenderer corre el ejecutable de Graphviz fuera del hilo de Tk (con el
+ejecutor de pedidos) y guarda cada imagen generada en un directorio temporal
+propio, indexada por (hash del DOT, motor, formato): volver a generar la misma
+imagen devuelve el archivo ya hecho sin lanzar Graphviz, y dos pedidos iguales
+simultáneos comparten una sola ejecución. El DOT se pasa por stdin, así no quedan archivos .dot sueltos; las imágenes desalojadas del caché
+se borran y el directorio completo se elimina al cerrar el programa.
+"""
+import atexit
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Ruta de Graphviz en Windows (si no existe se busca el ejecutable en el PATH)
+GRAPHVIZ_PATH = r"C:\Program Files\Graphviz\bin"
+
+# Segundos máximos que puede tardar Graphviz
+GRAPHVIZ_TIMEOUT = 30
+
+# Desde esta cantidad de nodos los motores lentos se reemplazan por sfdp
+SFDP_MIN_NODES = 500
+
+# Motores que no escalan a grafos grandes (cuadráticos o peores)
+SLOW_ENGINES = ("dot", "neato", "circo", "fdp", "twopi")
+
+# Imágenes generadas que se conservan (las más viejas se borran del disco)
+RENDER_CACHE_SIZE = 16
+
+# Cadenas entre comillas del DOT y asignaciones de atributos (atributo="valor")
+QUOTED_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+ATTRIBUTE_RE = re.compile(r'\w+\s*=\s*"(?:[^"\\]|\\.)*"')
+
+
+def count_nodes(dot_code):
+    """Cantidad aproximada de nodos distintos en un código DOT (nombres entre comillas)"""
+    return len(set(QUOTED_RE.findall(ATTRIBUTE_RE.sub("", dot_code))))
+
+
+def choose_engine(engine, nodes):
+    """Motor a usar: sfdp en lugar de uno lento cuando el grafo es grande"""
+    if nodes >= SFDP_MIN_NODES and engine in SLOW_ENGINES:
+        return "sfdp"
+    return engine
+
+
+def graphviz_executable(engine):
+    """Ruta del ejecutable de un motor de Graphviz"""
+    path = os.path.join(GRAPHVIZ_PATH, f"{engine}.exe")
+    if os.path.exists(path):
+        return path
+    return shutil.which(engine) or path
+
+
+def open_file(path):
+    """Abre un archivo con el visor predeterminado del sistema"""
+    if hasattr(os, "startfile"):
+        os.startfile(path)
+    else:
+        subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", path])
+
+
+class GraphvizRenderer:
+    """
+    Caché LRU de imágenes de Graphviz. `render` es bloqueante y se llama desde
+    el ejecutor; devuelve una respuesta con el formato del resto del cliente.
+    """
+
+    def __init__(self, max_entries=RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (hash, motor, formato) -> ruta de la imagen
+        self.in_flight = {}  # clave -> Future con la respuesta de la generación en curso
+        self.lock = threading.Lock()  # protege el caché, nunca se toma mientras corre Graphviz
+        self.directory = None  # se crea con el primer renderizado
+        atexit.register(self.cleanup)
+
+    def _output_path(self, key):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="grafo_render_")
+        digest, engine, output_format = key
+        return os.path.join(self.directory, f"{digest[:16]}_{engine}.{output_format}")
+
+    def _lookup(self, key):
+        path = self.entries.get(key)
+        if path is None:
+            return None
+        if not os.path.exists(path):
+            del self.entries[key]  # alguien borró la imagen: se genera de nuevo
+            return None
+        self.entries.move_to_end(key)
+        return path
+
+    def _store(self, key, path):
+        self.entries[key] = path
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            _, old_path = self.entries.popitem(last=False)
+            self._remove(old_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _run_graphviz(dot_code, engine, output_format, path):
+        """Ejecuta Graphviz (sin el candado) y devuelve la respuesta"""
+        try:
+            result = subprocess.run(
+                [graphviz_executable(engine), f"-T{output_format}", "-o", path],
+                input=dot_code, capture_output=True, text=True, encoding="utf-8",
+                timeout=GRAPHVIZ_TIMEOUT
+            )
+        except FileNotFoundError:
+            return {"status": "error",
+                    "message": "Graphviz no está instalado o no está en el PATH.\n\n"
+                               "Instálelo desde https://graphviz.org/download/"}
+        except subprocess.TimeoutExpired:
+            GraphvizRenderer._remove(path)
+            return {"status": "error", "message": "Tiempo de espera agotado al generar el grafo."}
+
+        if result.returncode != 0 or not os.path.exists(path):
+            GraphvizRenderer._remove(path)
+            return {"status": "error", "message": f"Error de Graphviz:\n{result.stderr}"}
+        return {"status": "success", "path": path, "engine": engine, "cached": False}
+
+    def render(self, dot_code, engine, output_format):
+        """
+        Genera (o reutiliza) la imagen del código DOT. Devuelve
+        {"status": "success", "path", "engine", "cached"} o una respuesta de error.
+        """
+        engine = choose_engine(engine, count_nodes(dot_code))
+        digest = hashlib.sha256(dot_code.encode("utf-8")).hexdigest()
+        key = (digest, engine, output_format)
+        with self.lock:
+            path = self._lookup(key)
+            if path is not None:
+                return {"status": "success", "path": path, "engine": engine, "cached": True}
+            pending = self.in_flight.get(key)
+            if pending is None:
+                future = self.in_flight[key] = Future()
+                path = self._output_path(key)
+
+        if pending is not None:
+            # La misma imagen ya se está generando: esperar su resultado
+            response = pending.result()
+            if response["status"] == "success":
+                response = dict(response, cached=True)
+            return response
+
+        response = {"status": "error", "message": "Error inesperado al generar el grafo."}
+        try:
+            response = self._run_graphviz(dot_code, engine, output_format, path)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                if response["status"] == "success":
+                    self._store(key, path)
+            future.set_result(response)
+        return response
+
+    def cleanup(self):
+        """Borra todas las imágenes generadas"""
+        with self.lock:
+            self.entries.clear()
+            if self.directory is not None:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self.directory = None
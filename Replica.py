@@ -0,0 +1,140 @@
+"""
+Réplica local de la red social en el cliente.
+El cliente ya descarga la red completa para mostrarla; NetworkReplica la guarda
+en un Grafo.SocialNetwork y responde ahí amigos en común, caminos y
+estadísticas sin ir al servidor. Se sincroniza con get_network (condicional por
+versión del grafo) solo cuando está vencida: pasó REPLICA_MAX_AGE desde la
+última sincronización, o alguna respuesta del servidor trajo una versión del
+grafo distinta a la de la réplica.
+"""
+import threading
+import time
+from collections import deque
+
+from Grafo import SocialNetwork
+from Analitica import GraphSnapshot, compute_clustering, top_k
+
+# Segundos durante los que la réplica se considera vigente sin consultar al servidor
+REPLICA_MAX_AGE = 30.0
+
+
+class NetworkReplica:
+    """
+    Copia de solo lectura del grafo de amistades. Cada sincronización arma un
+    grafo nuevo y lo reemplaza de una vez, así las consultas en curso (desde
+    los hilos del ejecutor) nunca ven un grafo a medio armar.
+    """
+
+    def __init__(self, client, max_age=REPLICA_MAX_AGE):
+        self.client = client
+        self.max_age = max_age
+        self.graph = None       # SocialNetwork con la última red descargada
+        self.network = None     # {usuario: [amigos]} tal como llegó del servidor
+        self.version = None     # versión del grafo de la réplica
+        self.synced_at = None   # time.monotonic() de la última sincronización
+        self.clustering = None  # (versión, resultado de compute_clustering)
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        return (self.graph is None or self.synced_at is None or
+                time.monotonic() - self.synced_at > self.max_age)
+
+    def invalidate(self):
+        """Fuerza una sincronización en la próxima consulta (p. ej. tras modificar amistades)"""
+        self.synced_at = None
+
+    def note_version(self, version):
+        """Versión del grafo vista en otra respuesta: si difiere, la réplica quedó vieja"""
+        if version is not None and version != self.version:
+            self.invalidate()
+
+    def sync(self, force=False):
+        """
+        Actualiza la réplica si está vencida. Devuelve la respuesta de error del
+        servidor si no se pudo sincronizar, o None si la réplica está al día.
+        """
+        with self.lock:
+            if not force and not self.is_stale():
+                return None
+            response = self.client.get_network()
+            if response.get("status") != "success":
+                return response
+            if response.get("version") != self.version or self.graph is None:
+                network = response.get("network", {})
+                graph = SocialNetwork(verbose=False)
+                # Carga directa: la red ya llega consistente (amistades en ambos sentidos)
+                graph.users = {user: set(friends) for user, friends in network.items()}
+                self.graph, self.network, self.version = graph, network, response.get("version")
+            self.synced_at = time.monotonic()
+            return None
+
+    def mutual_friends(self, user1, user2):
+        """Amigos en común como respuesta del servidor, o None si la réplica no conoce a alguno"""
+        if self.sync() is not None:
+            return None
+        graph = self.graph
+        mutual = graph.get_mutual_friends(user1, user2)
+        if mutual is None:
+            return None  # usuario nuevo: que responda el servidor
+        return {"status": "success", "mutual_friends": sorted(mutual)}
+
+    def find_path(self, from_user, to_user):
+        """Camino más corto de amistades (BFS con padres), o None si hay que preguntar al servidor"""
+        if self.sync() is not None:
+            return None
+        users = self.graph.users
+        if from_user not in users or to_user not in users:
+            return None
+        if from_user == to_user:
+            return {"status": "success", "path": [from_user]}
+
+        parents = {from_user: None}
+        queue = deque([from_user])
+        while queue:
+            current = queue.popleft()
+            for friend in users[current]:
+                if friend in parents:
+                    continue
+                parents[friend] = current
+                if friend == to_user:
+                    path = [to_user]
+                    while parents[path[-1]] is not None:
+                        path.append(parents[path[-1]])
+                    return {"status": "success", "path": path[::-1]}
+                queue.append(friend)
+        return {"status": "success", "path": []}
+
+    def statistics(self):
+        """Estadísticas con el mismo formato que get_statistics, o None si no hay réplica"""
+        if self.sync() is not None:
+            return None
+        graph, version = self.graph, self.version
+        if not graph.users:
+            return {"status": "error", "message": "No hay usuarios en la red"}
+
+        counts = {user: len(friends) for user, friends in graph.users.items()}
+        max_count = max(counts.values())
+        min_count = min(counts.values())
+        total_friends = sum(counts.values())
+        statistics = {
+            "max_friends_users": [u for u, c in counts.items() if c == max_count],
+            "max_friends_count": max_count,
+            "min_friends_users": [u for u, c in counts.items() if c == min_count],
+            "min_friends_count": min_count,
+            "average_friends": round(total_friends / len(counts), 2),
+            "total_users": len(counts),
+            "total_friendships": total_friends // 2
+        }
+
+        # Triángulos y clustering: se calculan una vez por versión de la réplica
+        cached = self.clustering
+        if cached is None or cached[0] != version:
+            cached = (version, compute_clustering(GraphSnapshot.from_adjacency(graph.users, version)))
+            self.clustering = cached
+        data = cached[1]
+        statistics["total_triangles"] = data["total_triangles"]
+        statistics["transitivity"] = round(data["transitivity"], 4)
+        statistics["average_clustering"] = round(data["average_clustering"], 4)
+        statistics["top_triangles"] = top_k(data["triangles"], 5)
+        statistics["clustering_version"] = version
+        return {"status": "success", "statistics": statistics}
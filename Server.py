@@ -3,7 +3,20 @@ import threading
 import json
 import os
 import ssl
+import time
+import heapq
+import base64
+import binascii
+import secrets
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from passlib.hash import pbkdf2_sha256
+from Analitica import AnalyticsWorker, top_k
+from AmigosComunes import HUB_DEGREE
+from Avatares import AvatarStore, AVATAR_CHUNK_BYTES
+from Grafo import CompactSocialNetwork, SortedNameSet, EGO_POLICIES
+from Busqueda import (TrigramIndex, AutocompleteTrie, FuzzyIndex, ProfileIndex,
+                      AUTOCOMPLETE_TOP_K, FUZZY_MAX_DISTANCE, normalize, match_rank)
 
 # Ruta para guardar los datos de usuarios
 DATA_FILE = "users_data.json"
@@ -12,44 +25,93 @@ DATA_FILE = "users_data.json"
 CERT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.crt")
 KEY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.key")
 
+# Cantidad máxima de filas de conteos de amigos en común cacheadas
+MUTUAL_COUNTS_CACHE_SIZE = 1024
 
-def merge_sort(arr):
-    """Implementación del algoritmo Merge Sort para ordenar listas"""
-    if len(arr) <= 1:
-        return arr
-    
-    # Dividir el array en dos mitades
-    mid = len(arr) // 2
-    left_half = arr[:mid]
-    right_half = arr[mid:]
-    
-    # Recursivamente ordenar ambas mitades
-    left_sorted = merge_sort(left_half)
-    right_sorted = merge_sort(right_half)
-    
-    # Combinar las mitades ordenadas
-    return merge(left_sorted, right_sorted)
+# Aristas máximas recorridas en la expansión a 2 saltos del ranking social
+SOCIAL_EXPANSION_MAX_EDGES = 200_000
 
+# Resultados por página en la búsqueda de perfiles
+PROFILE_PAGE_SIZE = 20
 
-def merge(left, right):
-    """Combina dos listas ordenadas en una sola lista ordenada"""
-    result = []
-    i = j = 0
-    
-    # Comparar elementos y agregar el menor
-    while i < len(left) and j < len(right):
-        if left[i].lower() <= right[j].lower():  # Comparación case-insensitive
-            result.append(left[i])
-            i += 1
-        else:
-            result.append(right[j])
-            j += 1
-    
-    # Agregar elementos restantes
-    result.extend(left[i:])
-    result.extend(right[j:])
-    
-    return result
+# Protocolo: cada mensaje es un JSON en una línea terminada en "\n"
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Pedidos con "id": hilos que los atienden y máximo en vuelo por conexión
+REQUEST_WORKERS = 32
+MAX_PIPELINED_REQUESTS = 16
+
+# Segundos que una sesión sobrevive a su conexión (para reanudarla al reconectar)
+SESSION_TTL = 15 * 60
+
+# Acciones de lectura cuya respuesta codificada se cachea por versión del grafo
+CACHED_ACTIONS = ("get_network", "get_all_users", "get_statistics")
+
+# Memoria máxima de la caché de respuestas codificadas
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def encode_message(message):
+    """Codifica un mensaje del protocolo (JSON + salto de línea)"""
+    return json.dumps(message).encode('utf-8') + b"\n"
+
+
+def tag_message(payload, request_id):
+    """
+    Agrega el id del pedido a una respuesta ya codificada (un objeto JSON),
+    sin volver a serializarla: así también sirve para las respuestas cacheadas.
+    """
+    return b'{"id": ' + json.dumps(request_id).encode('utf-8') + b', ' + payload[1:]
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas ya codificadas (bytes listos para enviar),
+    acotada por memoria. Las claves incluyen la versión del grafo, así que
+    las entradas viejas nunca se vuelven a pedir y salen por LRU.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # clave -> bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        if len(payload) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = payload
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.size
+            }
 
 
 class SocialNetworkServer:
@@ -57,16 +119,61 @@ class SocialNetworkServer:
         self.host = host
         self.port = port
         self.server_socket = None
-        self.users = {}  # {username: {"password_hash": hash, "friends": set(), "pending_requests": set(), "sent_requests": set()}}
+        self.users = {}  # {username: {"password_hash": hash, "friends": SortedNameSet, "pending_requests": ..., "sent_requests": ...}}
+        self.usernames = SortedNameSet()  # Todos los nombres, ya ordenados para get_all_users
         self.logged_in_users = {}  # {client_address: username}
+        self.sessions = {}  # {token: {"username", "address", "expires"}} (expires=None mientras está conectada)
+        self.session_by_address = {}  # {client_address: token}
+        self.closed_connections = set()  # direcciones ya cerradas con pedidos aún en curso en el pool
+        self.request_pool = ThreadPoolExecutor(max_workers=REQUEST_WORKERS, thread_name_prefix="pedidos")
         self.lock = threading.Lock()
         self.running = False
+        self.graph_version = 0  # Se incrementa con cada cambio en usuarios o amistades
+        self.list_versions = {}  # {usuario: versión de sus listas personales (amigos y solicitudes)}
+        self.list_version_seq = 0  # Secuencia global: una versión nunca se repite
+        self.friend_graph = CompactSocialNetwork(verbose=False)  # Índice de IDs enteros de las amistades
+        self.mutual_counts_cache = OrderedDict()  # {usuario: (versión, {otro: cantidad})} con LRU
+        self.search_index = TrigramIndex()  # Índice de trigramas para búsqueda por subcadena
+        self.fuzzy_index = FuzzyIndex()  # Índice de borrados para búsqueda tolerante a errores
+        self.profile_index = ProfileIndex()  # Índice invertido de las descripciones (BM25)
+        self.response_cache = ResponseCache()  # Respuestas codificadas de lecturas frecuentes
+        self.autocomplete_index = AutocompleteTrie()  # Trie de prefijos con los más populares por nodo
+        self.avatars = AvatarStore()  # Avatares subidos, direccionados por contenido
+        
+        # Cargar datos existentes; los avatares solo se limpian si la carga fue
+        # completa (con un archivo ilegible todos quedarían sin referencias)
+        if self.load_data():
+            removed = self.avatars.collect_garbage({data["avatar"] for data in self.users.values() if data["avatar"]})
+            if removed:
+                print(f"[SERVER] Avatares sin referencias eliminados: {removed} archivos")
         
-        # Cargar datos existentes
-        self.load_data()
+        # Analítica en segundo plano (PageRank, intermediación)
+        self.analytics = AnalyticsWorker(self.snapshot_adjacency)
+    
+    def graph_changed(self):
+        """Marca un cambio en el grafo de amistades (llamar con el lock tomado)"""
+        self.graph_version += 1
+        self.analytics.notify_change()
+    
+    def touch_lists(self, *usernames):
+        """Marca un cambio en las listas personales de los usuarios (llamar con el lock tomado)"""
+        for username in usernames:
+            self.list_version_seq += 1
+            self.list_versions[username] = self.list_version_seq
+    
+    def snapshot_adjacency(self, last_version=None):
+        """
+        Copia rápida de la adyacencia para la analítica; es lo único que toma el
+        lock. Devuelve None sin copiar si la versión del grafo sigue en `last_version`.
+        """
+        with self.lock:
+            if self.graph_version == last_version:
+                return None
+            adjacency = {username: list(data["friends"]) for username, data in self.users.items()}
+            return self.graph_version, adjacency
     
     def load_data(self):
-        """Carga los datos de usuarios desde archivo"""
+        """Carga los datos de usuarios desde archivo; devuelve True si se leyó completo"""
         if os.path.exists(DATA_FILE):
             try:
                 with open(DATA_FILE, 'r', encoding='utf-8') as f:
@@ -74,15 +181,48 @@ class SocialNetworkServer:
                     for username, user_data in data.items():
                         self.users[username] = {
                             "password_hash": user_data["password_hash"],
-                            "friends": set(user_data.get("friends", [])),
-                            "pending_requests": set(user_data.get("pending_requests", [])),
-                            "sent_requests": set(user_data.get("sent_requests", [])),
+                            "friends": SortedNameSet(user_data.get("friends", [])),
+                            "pending_requests": SortedNameSet(user_data.get("pending_requests", [])),
+                            "sent_requests": SortedNameSet(user_data.get("sent_requests", [])),
                             "description": user_data.get("description", ""),
-                            "photo_url": user_data.get("photo_url", "")
+                            "photo_url": user_data.get("photo_url", ""),
+                            "avatar": user_data.get("avatar", "")
                         }
+                self.usernames = SortedNameSet(self.users)
+                self.build_friend_graph()
+                self.search_index = TrigramIndex(self.users)
+                self.fuzzy_index = FuzzyIndex(self.users)
+                self.profile_index = ProfileIndex(
+                    {username: user_data["description"] for username, user_data in self.users.items()}
+                )
+                self.build_autocomplete_index()
                 print(f"[SERVER] Datos cargados: {len(self.users)} usuarios")
+                return True
             except Exception as e:
                 print(f"[SERVER] Error cargando datos: {e}")
+        return False
+    
+    def build_friend_graph(self):
+        """Reconstruye el índice entero de amistades desde self.users"""
+        self.friend_graph = CompactSocialNetwork(verbose=False)
+        for username in self.users:
+            self.friend_graph.add_user(username)
+        for username, user_data in self.users.items():
+            for friend in user_data["friends"]:
+                if friend in self.users:
+                    self.friend_graph.add_friendship(username, friend)
+    
+    def build_autocomplete_index(self):
+        """Reconstruye el trie de autocompletado con el grado de cada usuario como puntaje"""
+        self.autocomplete_index = AutocompleteTrie(
+            {username: len(user_data["friends"]) for username, user_data in self.users.items()}
+        )
+    
+    def update_popularity(self, *usernames):
+        """Actualiza el puntaje de autocompletado tras un cambio de amistades (con el lock tomado)"""
+        for username in usernames:
+            if username in self.users:
+                self.autocomplete_index.update_score(username, len(self.users[username]["friends"]))
     
     def save_data(self):
         """Guarda los datos de usuarios en archivo"""
@@ -95,7 +235,8 @@ class SocialNetworkServer:
                     "pending_requests": list(user_data.get("pending_requests", [])),
                     "sent_requests": list(user_data.get("sent_requests", [])),
                     "description": user_data.get("description", ""),
-                    "photo_url": user_data.get("photo_url", "")
+                    "photo_url": user_data.get("photo_url", ""),
+                    "avatar": user_data.get("avatar", "")
                 }
             with open(DATA_FILE, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
@@ -121,6 +262,7 @@ class SocialNetworkServer:
         self.server_socket.bind((self.host, self.port))
         self.server_socket.listen(5)
         self.running = True
+        self.analytics.start()
         
         print(f"[SERVER] 🔐 Servidor SSL iniciado en {self.host}:{self.port}")
         print("[SERVER] ✅ Comunicación encriptada con TLS")
@@ -147,30 +289,100 @@ class SocialNetworkServer:
                     print(f"[SERVER] Error: {e}")
     
     def handle_client(self, client_socket, client_address):
-        """Maneja las solicitudes de un cliente"""
+        """
+        Maneja las solicitudes de un cliente (un mensaje JSON por línea).
+        Los pedidos con "id" se atienden en paralelo en el pool y su respuesta
+        lleva el mismo id (pueden volver en otro orden); sin "id", en orden.
+        """
+        reader = client_socket.makefile('rb')
+        write_lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(MAX_PIPELINED_REQUESTS)
+        
+        def send(payload):
+            with write_lock:
+                client_socket.sendall(payload)
+        
+        def run(request, request_id):
+            try:
+                send(tag_message(self.respond(request, client_address), request_id))
+            except Exception as e:
+                print(f"[SERVER] Error respondiendo a {client_address}: {e}")
+            finally:
+                in_flight.release()
+        
         try:
             while self.running:
-                data = client_socket.recv(4096).decode('utf-8')
-                if not data:
+                line = reader.readline(MAX_REQUEST_BYTES + 1)
+                if not line:
+                    break
+                if not line.endswith(b"\n") and len(line) > MAX_REQUEST_BYTES:
+                    send(encode_message({"status": "error", "message": "Mensaje demasiado grande"}))
                     break
                 
                 try:
-                    request = json.loads(data)
-                    response = self.process_request(request, client_address)
-                    client_socket.send(json.dumps(response).encode('utf-8'))
-                except json.JSONDecodeError:
-                    error_response = {"status": "error", "message": "Formato de mensaje inválido"}
-                    client_socket.send(json.dumps(error_response).encode('utf-8'))
+                    request = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    send(encode_message({"status": "error", "message": "Formato de mensaje inválido"}))
+                    continue
+                
+                request_id = request.get("id") if isinstance(request, dict) else None
+                if request_id is None:
+                    send(self.respond(request, client_address))
+                else:
+                    in_flight.acquire()  # contrapresión: no leer más pedidos hasta liberar uno
+                    self.request_pool.submit(run, request, request_id)
         except Exception as e:
             print(f"[SERVER] Error con cliente {client_address}: {e}")
         finally:
-            # Desloguear al usuario si estaba conectado
+            # Desloguear al usuario si estaba conectado (la sesión queda reanudable un tiempo).
+            # La marca de cerrada impide que un login o reanudación que todavía corre
+            # en el pool vuelva a registrar la conexión
             with self.lock:
+                self.closed_connections.add(client_address)
                 if client_address in self.logged_in_users:
                     username = self.logged_in_users.pop(client_address)
                     print(f"[SERVER] Usuario '{username}' desconectado")
+                token = self.session_by_address.pop(client_address, None)
+                if token in self.sessions:
+                    self.sessions[token]["expires"] = time.monotonic() + SESSION_TTL
+            reader.close()
             client_socket.close()
             print(f"[SERVER] Conexión cerrada: {client_address}")
+            # Esperar a que terminen los pedidos en curso antes de quitar la marca
+            for _ in range(MAX_PIPELINED_REQUESTS):
+                in_flight.acquire()
+            with self.lock:
+                self.closed_connections.discard(client_address)
+    
+    def respond(self, request, client_address):
+        """
+        Procesa una solicitud y devuelve la respuesta codificada. Las lecturas de
+        CACHED_ACTIONS se sirven desde la caché de bytes mientras no cambie el grafo.
+        """
+        action = request.get("action") if isinstance(request, dict) else None
+        if action not in CACHED_ACTIONS:
+            if not isinstance(request, dict):
+                return encode_message({"status": "error", "message": "Formato de mensaje inválido"})
+            return encode_message(self.process_request(request, client_address))
+        
+        with self.lock:
+            if client_address not in self.logged_in_users:
+                return encode_message({"status": "error", "message": "Debe iniciar sesión primero"})
+            if action == "get_network" and request.get("if_version") == self.graph_version:
+                return encode_message({"status": "not_modified", "version": self.graph_version})
+            key = (action, self.graph_version)
+        if action == "get_statistics":
+            # Las estadísticas incluyen la analítica calculada en segundo plano
+            clustering = self.analytics.get_result("clustering")
+            key += (clustering["version"] if clustering is not None else None,)
+        
+        payload = self.response_cache.get(key)
+        if payload is None:
+            response = self.process_request(request, client_address)
+            payload = encode_message(response)
+            if response.get("status") == "success":
+                self.response_cache.put(key, payload)
+        return payload
     
     def process_request(self, request, client_address):
         """Procesa una solicitud del cliente"""
@@ -181,6 +393,8 @@ class SocialNetworkServer:
             return self.register_user(request)
         elif action == "login":
             return self.login_user(request, client_address)
+        elif action == "resume_session":
+            return self.resume_session(request.get("token"), client_address)
         
         # Verificar si el usuario está autenticado para otras acciones
         with self.lock:
@@ -195,9 +409,9 @@ class SocialNetworkServer:
         elif action == "send_friend_request":
             return self.send_friend_request(current_user, request.get("to_user"))
         elif action == "get_pending_requests":
-            return self.get_pending_requests(current_user)
+            return self.get_pending_requests(current_user, request.get("if_version"))
         elif action == "get_sent_requests":
-            return self.get_sent_requests(current_user)
+            return self.get_sent_requests(current_user, request.get("if_version"))
         elif action == "accept_friend_request":
             return self.accept_friend_request(current_user, request.get("from_user"))
         elif action == "reject_friend_request":
@@ -208,27 +422,57 @@ class SocialNetworkServer:
         elif action == "remove_friend":
             return self.remove_friend(current_user, request.get("friend"))
         elif action == "get_friends":
-            return self.get_friends(current_user)
+            return self.get_friends(current_user, request.get("if_version"))
         elif action == "get_all_users":
             return self.get_all_users()
         elif action == "get_mutual_friends":
-            return self.get_mutual_friends(current_user, request.get("other_user"))
+            return self.get_mutual_friends(current_user, request.get("other_user"),
+                                           request.get("count_only", False))
+        elif action == "get_mutual_counts":
+            return self.get_mutual_counts(current_user, request.get("users"))
         elif action == "are_friends":
             return self.are_friends(current_user, request.get("other_user"))
         elif action == "get_network":
-            return self.get_network()
+            return self.get_network(request.get("if_version"))
+        elif action == "get_ego_network":
+            return self.get_ego_network(request.get("username") or current_user, request.get("k", 2),
+                                        request.get("max_nodes", 150), request.get("policy", "degree"))
         elif action == "delete_account":
             return self.delete_account(current_user, client_address)
+        elif action == "autocomplete":
+            return self.autocomplete(current_user, request.get("prefix", ""), request.get("limit", AUTOCOMPLETE_TOP_K),
+                                     request.get("exclude_related", False))
         elif action == "search_users":
-            return self.search_users(request.get("query", ""))
+            return self.search_users(current_user, request.get("query", ""), request.get("limit", 50),
+                                     request.get("fuzzy", False), request.get("max_distance", FUZZY_MAX_DISTANCE),
+                                     request.get("rank", "relevance"))
+        elif action == "search_profiles":
+            return self.search_profiles(request.get("query", ""), request.get("page", 1),
+                                        request.get("page_size", PROFILE_PAGE_SIZE))
         elif action == "get_user_profile":
             return self.get_user_profile(request.get("username"))
         elif action == "update_profile":
             return self.update_profile(current_user, request.get("description"), request.get("photo_url"))
+        elif action == "begin_avatar_upload":
+            return self.begin_avatar_upload(current_user, request.get("size"), request.get("sha256"))
+        elif action == "upload_avatar_chunk":
+            return self.upload_avatar_chunk(current_user, request.get("upload_id"),
+                                            request.get("offset"), request.get("data"))
+        elif action == "finish_avatar_upload":
+            return self.finish_avatar_upload(current_user, request.get("upload_id"))
+        elif action == "get_avatar":
+            return self.get_avatar(request.get("username") or current_user, request.get("size", 150),
+                                   request.get("if_version"))
         elif action == "find_path":
             return self.find_path(request.get("from_user"), request.get("to_user"))
         elif action == "get_statistics":
             return self.get_statistics()
+        elif action == "get_rankings":
+            return self.get_rankings(request.get("limit", 10))
+        elif action == "get_communities":
+            return self.get_communities()
+        elif action == "get_cache_stats":
+            return {"status": "success", "cache": self.response_cache.stats()}
         else:
             return {"status": "error", "message": f"Acción desconocida: {action}"}
     
@@ -256,12 +500,19 @@ class SocialNetworkServer:
             
             self.users[username] = {
                 "password_hash": password_hash,
-                "friends": set(),
-                "pending_requests": set(),
-                "sent_requests": set(),
+                "friends": SortedNameSet(),
+                "pending_requests": SortedNameSet(),
+                "sent_requests": SortedNameSet(),
                 "description": "",
-                "photo_url": ""
+                "photo_url": "",
+                "avatar": ""
             }
+            self.usernames.add(username)
+            self.friend_graph.add_user(username)
+            self.search_index.add(username)
+            self.fuzzy_index.add(username)
+            self.autocomplete_index.add(username)
+            self.graph_changed()
             self.save_data()
         
         print(f"[SERVER] Usuario registrado: {username}")
@@ -276,6 +527,8 @@ class SocialNetworkServer:
             return {"status": "error", "message": "Usuario y contraseña son requeridos"}
         
         with self.lock:
+            if client_address in self.closed_connections:
+                return {"status": "error", "message": "Conexión cerrada"}
             if username not in self.users:
                 return {"status": "error", "message": "Usuario o contraseña incorrectos"}
             
@@ -289,6 +542,7 @@ class SocialNetworkServer:
                     return {"status": "error", "message": "Este usuario ya tiene una sesión activa"}
             
             self.logged_in_users[client_address] = username
+            token = self.open_session(username, client_address)
             
             # Contar solicitudes pendientes
             pending_count = len(self.users[username].get("pending_requests", set()))
@@ -298,12 +552,61 @@ class SocialNetworkServer:
             "status": "success", 
             "message": f"Bienvenido, {username}!", 
             "username": username,
-            "pending_requests": pending_count
+            "pending_requests": pending_count,
+            "session_token": token
         }
     
+    def open_session(self, username, client_address):
+        """Crea el token de sesión para reanudarla tras una reconexión (con el lock tomado)"""
+        now = time.monotonic()
+        for token, session in list(self.sessions.items()):
+            if session["expires"] is not None and session["expires"] < now:
+                del self.sessions[token]
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = {"username": username, "address": client_address, "expires": None}
+        self.session_by_address[client_address] = token
+        return token
+    
+    def close_sessions(self, username=None, client_address=None):
+        """Invalida la sesión de una conexión o todas las de un usuario (con el lock tomado)"""
+        for token, session in list(self.sessions.items()):
+            if ((username is not None and session["username"] == username) or
+                    (client_address is not None and session["address"] == client_address)):
+                del self.sessions[token]
+                self.session_by_address.pop(session["address"], None)
+    
+    def resume_session(self, token, client_address):
+        """
+        Reanuda una sesión en una conexión nueva con el token recibido al iniciar
+        sesión. Si la conexión anterior sigue registrada, la nueva la reemplaza.
+        """
+        with self.lock:
+            if client_address in self.closed_connections:
+                return {"status": "error", "message": "Conexión cerrada"}
+            session = self.sessions.get(token) if isinstance(token, str) else None
+            if session is not None and session["expires"] is not None and session["expires"] < time.monotonic():
+                del self.sessions[token]
+                session = None
+            if session is None:
+                return {"status": "error", "message": "Sesión expirada o inválida"}
+            
+            username = session["username"]
+            old_address = session["address"]
+            if self.logged_in_users.get(old_address) == username:
+                del self.logged_in_users[old_address]
+            self.session_by_address.pop(old_address, None)
+            self.logged_in_users[client_address] = username
+            self.session_by_address[client_address] = token
+            session["address"] = client_address
+            session["expires"] = None
+        
+        print(f"[SERVER] Sesión reanudada: {username}")
+        return {"status": "success", "message": "Sesión reanudada", "username": username}
+    
     def logout_user(self, client_address):
         """Cierra sesión del usuario"""
         with self.lock:
+            self.close_sessions(client_address=client_address)
             if client_address in self.logged_in_users:
                 username = self.logged_in_users.pop(client_address)
                 print(f"[SERVER] Usuario desconectado: {username}")
@@ -335,28 +638,35 @@ class SocialNetworkServer:
             
             # Agregar solicitud
             if "sent_requests" not in self.users[from_user]:
-                self.users[from_user]["sent_requests"] = set()
+                self.users[from_user]["sent_requests"] = SortedNameSet()
             if "pending_requests" not in self.users[to_user]:
-                self.users[to_user]["pending_requests"] = set()
+                self.users[to_user]["pending_requests"] = SortedNameSet()
             
             self.users[from_user]["sent_requests"].add(to_user)
             self.users[to_user]["pending_requests"].add(from_user)
+            self.touch_lists(from_user, to_user)
             self.save_data()
         
         print(f"[SERVER] Solicitud de amistad: {from_user} -> {to_user}")
         return {"status": "success", "message": f"Solicitud enviada a '{to_user}'"}
     
-    def get_pending_requests(self, username):
+    def get_pending_requests(self, username, if_version=None):
         """Obtiene las solicitudes de amistad pendientes (recibidas)"""
         with self.lock:
-            pending = list(self.users[username].get("pending_requests", set()))
-        return {"status": "success", "pending_requests": sorted(pending)}
+            version = self.list_versions.get(username, 0)
+            if if_version == version:
+                return {"status": "not_modified", "version": version}
+            pending = self.users[username]["pending_requests"].to_list()
+        return {"status": "success", "pending_requests": pending, "version": version}
     
-    def get_sent_requests(self, username):
+    def get_sent_requests(self, username, if_version=None):
         """Obtiene las solicitudes de amistad enviadas"""
         with self.lock:
-            sent = list(self.users[username].get("sent_requests", set()))
-        return {"status": "success", "sent_requests": sorted(sent)}
+            version = self.list_versions.get(username, 0)
+            if if_version == version:
+                return {"status": "not_modified", "version": version}
+            sent = self.users[username]["sent_requests"].to_list()
+        return {"status": "success", "sent_requests": sent, "version": version}
     
     def accept_friend_request(self, current_user, from_user):
         """Acepta una solicitud de amistad"""
@@ -375,6 +685,10 @@ class SocialNetworkServer:
             self.users[current_user]["pending_requests"].discard(from_user)
             self.users[from_user]["sent_requests"].discard(current_user)
             
+            self.friend_graph.add_friendship(current_user, from_user)
+            self.touch_lists(current_user, from_user)
+            self.update_popularity(current_user, from_user)
+            self.graph_changed()
             self.save_data()
         
         print(f"[SERVER] Amistad creada: {current_user} <-> {from_user}")
@@ -392,6 +706,7 @@ class SocialNetworkServer:
             # Eliminar la solicitud
             self.users[current_user]["pending_requests"].discard(from_user)
             self.users[from_user]["sent_requests"].discard(current_user)
+            self.touch_lists(current_user, from_user)
             
             self.save_data()
         
@@ -410,6 +725,7 @@ class SocialNetworkServer:
             # Eliminar la solicitud
             self.users[current_user]["sent_requests"].discard(to_user)
             self.users[to_user]["pending_requests"].discard(current_user)
+            self.touch_lists(current_user, to_user)
             
             self.save_data()
         
@@ -430,26 +746,34 @@ class SocialNetworkServer:
             self.users[current_user]["friends"].discard(friend_username)
             if friend_username in self.users:
                 self.users[friend_username]["friends"].discard(current_user)
+            self.friend_graph.remove_friendship(current_user, friend_username)
+            self.touch_lists(current_user, friend_username)
+            self.update_popularity(current_user, friend_username)
+            self.graph_changed()
             self.save_data()
         
         return {"status": "success", "message": f"Ya no eres amigo de '{friend_username}'"}
     
-    def get_friends(self, current_user):
-        """Obtiene la lista de amigos del usuario actual, ordenada con Merge Sort"""
+    def get_friends(self, current_user, if_version=None):
+        """
+        Obtiene la lista de amigos del usuario actual (se mantiene ordenada al modificarla).
+        Si el cliente ya tiene la versión actual (if_version) responde "not_modified".
+        """
         with self.lock:
-            friends = list(self.users[current_user]["friends"])
-        # Ordenar usando Merge Sort
-        friends_sorted = merge_sort(friends)
-        return {"status": "success", "friends": friends_sorted}
+            version = self.list_versions.get(current_user, 0)
+            if if_version == version:
+                return {"status": "not_modified", "version": version}
+            friends = self.users[current_user]["friends"].to_list()
+        return {"status": "success", "friends": friends, "version": version}
     
     def get_all_users(self):
-        """Obtiene todos los usuarios registrados"""
+        """Obtiene todos los usuarios registrados (ya ordenados)"""
         with self.lock:
-            users = list(self.users.keys())
-        return {"status": "success", "users": sorted(users)}
+            users = self.usernames.to_list()
+        return {"status": "success", "users": users}
     
-    def get_mutual_friends(self, current_user, other_user):
-        """Obtiene amigos en común"""
+    def get_mutual_friends(self, current_user, other_user, count_only=False):
+        """Obtiene amigos en común (o solo su cantidad si count_only)"""
         if not other_user:
             return {"status": "error", "message": "Debe especificar un usuario"}
         
@@ -457,11 +781,61 @@ class SocialNetworkServer:
             if other_user not in self.users:
                 return {"status": "error", "message": f"El usuario '{other_user}' no existe"}
             
-            mutual = self.users[current_user]["friends"].intersection(
-                self.users[other_user]["friends"]
-            )
+            friends = self.users[current_user]["friends"]
+            other_friends = self.users[other_user]["friends"]
+            # Entre dos hubs el conteo con bitmaps cacheados gana; en el resto de
+            # los casos la intersección de los sets de nombres es lo más rápido
+            if count_only and min(len(friends), len(other_friends)) >= HUB_DEGREE:
+                count = self.friend_graph.count_mutual_friends(current_user, other_user)
+                return {"status": "success", "mutual_count": count}
+            
+            mutual = friends.common(other_friends)
+            if count_only:
+                return {"status": "success", "mutual_count": len(mutual)}
+        
+        return {"status": "success", "mutual_friends": sorted(mutual)}
+    
+    def mutual_count_row(self, current_user, max_edges=None):
+        """
+        Fila {otro: amigos en común} de un usuario (llamar con el lock tomado),
+        cacheada por (usuario, versión del grafo). Con `max_edges` se usa la
+        caché si existe; si no, la expansión se acota y el resultado parcial no
+        se cachea.
+        """
+        cached = self.mutual_counts_cache.get(current_user)
+        if cached is not None and cached[0] == self.graph_version:
+            self.mutual_counts_cache.move_to_end(current_user)
+            return cached[1]
         
-        return {"status": "success", "mutual_friends": sorted(list(mutual))}
+        graph = self.friend_graph
+        uid = graph.ids[current_user]
+        complete = max_edges is None or sum(graph.degree(f) for f in graph.neighbor_ids(uid)) <= max_edges
+        id_row = graph.mutual_engine.mutual_count_row(uid, None if complete else max_edges)
+        row = {graph.names[other]: count for other, count in id_row.items()}
+        if complete:
+            self.mutual_counts_cache[current_user] = (self.graph_version, row)
+            if len(self.mutual_counts_cache) > MUTUAL_COUNTS_CACHE_SIZE:
+                self.mutual_counts_cache.popitem(last=False)
+        return row
+    
+    def get_mutual_counts(self, current_user, users=None):
+        """
+        Cantidad de amigos en común con cada usuario de la lista, en una pasada.
+        Sin lista se devuelven todos los usuarios con al menos uno en común (la
+        fila completa no depende del tamaño de la red en el pedido).
+        """
+        if users is not None and not isinstance(users, list):
+            return {"status": "error", "message": "Debe especificar una lista de usuarios"}
+        
+        with self.lock:
+            row = self.mutual_count_row(current_user)
+            if users is None:
+                counts = {user: count for user, count in row.items() if count and user != current_user}
+            else:
+                counts = {user: row.get(user, 0) for user in users if user in self.users}
+            version = self.graph_version
+        
+        return {"status": "success", "mutual_counts": counts, "version": version}
     
     def are_friends(self, current_user, other_user):
         """Verifica si son amigos"""
@@ -476,17 +850,47 @@ class SocialNetworkServer:
         
         return {"status": "success", "are_friends": are_friends}
     
-    def get_network(self):
-        """Obtiene toda la red social para visualización"""
+    def get_network(self, if_version=None):
+        """Obtiene toda la red social para visualización (condicional por versión del grafo)"""
         with self.lock:
+            if if_version == self.graph_version:
+                return {"status": "not_modified", "version": self.graph_version}
             network = {}
             for username, data in self.users.items():
-                network[username] = sorted(list(data["friends"]))
-        return {"status": "success", "network": network}
+                network[username] = data["friends"].to_list()
+            version = self.graph_version
+        return {"status": "success", "network": network, "version": version}
+    
+    def get_ego_network(self, username, k=2, max_nodes=150, policy="degree"):
+        """Obtiene la red de hasta k saltos alrededor de un usuario, con máximo de nodos"""
+        try:
+            k = max(1, min(int(k), 4))
+            max_nodes = max(2, min(int(max_nodes), 2000))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "Parámetros inválidos"}
+        if policy not in EGO_POLICIES:
+            return {"status": "error", "message": f"Política desconocida: {policy}"}
+        
+        with self.lock:
+            if username not in self.users:
+                return {"status": "error", "message": f"El usuario '{username}' no existe"}
+            ego = self.friend_graph.get_ego_network(username, k, max_nodes, policy)
+        
+        return {
+            "status": "success",
+            "center": username,
+            "network": ego["network"],
+            "hops": ego["hops"],
+            "truncated": ego["truncated"]
+        }
     
     def delete_account(self, current_user, client_address):
         """Elimina la cuenta del usuario"""
         with self.lock:
+            user_data = self.users[current_user]
+            former_friends = list(user_data["friends"])
+            affected = set(former_friends).union(user_data["pending_requests"], user_data["sent_requests"])
+            
             # Eliminar de las listas de amigos de otros usuarios
             for username, data in self.users.items():
                 data["friends"].discard(current_user)
@@ -495,30 +899,151 @@ class SocialNetworkServer:
             
             # Eliminar el usuario
             del self.users[current_user]
+            self.usernames.discard(current_user)
+            self.friend_graph.remove_user(current_user)
+            self.search_index.remove(current_user)
+            self.fuzzy_index.remove(current_user)
+            self.profile_index.remove(current_user)
+            self.autocomplete_index.remove(current_user)
+            self.update_popularity(*former_friends)
+            self.list_versions.pop(current_user, None)
+            self.touch_lists(*affected)
+            
+            self.avatars.cancel(current_user)
+            self.close_sessions(username=current_user)
             
             # Cerrar sesión
             if client_address in self.logged_in_users:
                 del self.logged_in_users[client_address]
             
+            self.graph_changed()
             self.save_data()
         
         print(f"[SERVER] Cuenta eliminada: {current_user}")
         return {"status": "success", "message": "Cuenta eliminada exitosamente", "logout": True}
     
     
-    def search_users(self, query):
-        """Busca usuarios por nombre (nombre y apellido)"""
+    def search_users(self, current_user, query, limit=50, fuzzy=False, max_distance=FUZZY_MAX_DISTANCE,
+                     rank="relevance"):
+        """
+        Busca usuarios por nombre (nombre y apellido) usando el índice de trigramas.
+        Con fuzzy=True tolera errores de escritura (hasta max_distance ediciones)
+        y devuelve también la distancia de cada resultado.
+        Con rank="social" ordena por cercanía al usuario actual: amigos, luego
+        amigos de amigos por cantidad de amigos en común y luego el resto.
+        """
         if not query or not query.strip():
             return {"status": "error", "message": "Ingrese un término de búsqueda"}
+        if rank not in ("relevance", "social"):
+            return {"status": "error", "message": f"Orden desconocido: {rank}"}
+        try:
+            limit = max(1, min(int(limit), 500))
+            max_distance = max(0, min(int(max_distance), FUZZY_MAX_DISTANCE))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "Límite o distancia inválidos"}
         
-        query = query.strip().lower()
         with self.lock:
-            results = []
-            for username in self.users.keys():
-                if query in username.lower():
+            if fuzzy:
+                matches = self.fuzzy_index.search(query, max_distance, limit)
+            elif rank == "social":
+                start = time.perf_counter()
+                results, mutual_counts = self.social_search(current_user, query, limit)
+                ranking_ms = round((time.perf_counter() - start) * 1000, 3)
+            else:
+                results = self.search_index.search(query, limit)
+        
+        if fuzzy:
+            return {"status": "success", "results": [username for username, _ in matches],
+                    "distances": dict(matches)}
+        if rank == "social":
+            return {"status": "success", "results": results, "mutual_counts": mutual_counts,
+                    "ranking_ms": ranking_ms}
+        return {"status": "success", "results": results}
+    
+    def social_search(self, current_user, query, limit):
+        """
+        Coincidencias ordenadas por distancia social (llamar con el lock tomado).
+        Solo se recorre el vecindario a 2 saltos (fila de amigos en común, acotada
+        y cacheada); el resto se completa con el índice de trigramas.
+        """
+        folded_query = normalize(query.strip())
+        friends = self.users[current_user]["friends"]
+        row = self.mutual_count_row(current_user, SOCIAL_EXPANSION_MAX_EDGES)
+        
+        nearby = []
+        for username in set(row).union(friends):
+            if username == current_user or username not in self.users:
+                continue
+            folded = normalize(username)
+            if folded_query in folded:
+                tier = 0 if username in friends else 1
+                nearby.append((tier, -row.get(username, 0), match_rank(folded, folded_query), username))
+        nearby = [entry[-1] for entry in heapq.nsmallest(limit, nearby)]
+        
+        # Completar con el resto de coincidencias por relevancia
+        results = list(nearby)
+        if len(results) < limit:
+            seen = set(nearby)
+            seen.add(current_user)
+            for username in self.search_index.search(query, limit + len(seen)):
+                if username not in seen:
                     results.append(username)
+                    if len(results) == limit:
+                        break
+        
+        mutual_counts = {username: row[username] for username in results if row.get(username)}
+        return results, mutual_counts
+    
+    def search_profiles(self, query, page=1, page_size=PROFILE_PAGE_SIZE):
+        """Busca en las descripciones de perfil con el índice invertido (ranking BM25, paginado)"""
+        if not query or not query.strip():
+            return {"status": "error", "message": "Ingrese un término de búsqueda"}
+        try:
+            page = max(1, int(page))
+            page_size = max(1, min(int(page_size), 100))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "Página inválida"}
+        
+        with self.lock:
+            total, ranked = self.profile_index.search(query, (page - 1) * page_size, page_size)
+            results = [{
+                "username": username,
+                "score": round(score, 4),
+                "description": self.users[username]["description"]
+            } for username, score in ranked]
+        
+        return {
+            "status": "success",
+            "results": results,
+            "total": total,
+            "page": page,
+            "pages": (total + page_size - 1) // page_size
+        }
+    
+    def autocomplete(self, current_user, prefix, limit=AUTOCOMPLETE_TOP_K, exclude_related=False):
+        """
+        Sugerencias de usuarios cuyo nombre empieza con el prefijo, los más
+        populares primero. Con exclude_related se omiten el propio usuario, sus
+        amigos y sus solicitudes (enviadas y recibidas), y se completa el límite
+        con los siguientes del trie.
+        """
+        try:
+            # Acotado a los k cacheados por nodo: más obligaría a recorrer el subárbol con el lock tomado
+            limit = max(1, min(int(limit), AUTOCOMPLETE_TOP_K))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "Límite inválido"}
+        if not prefix or not prefix.strip():
+            return {"status": "success", "suggestions": []}
+        
+        with self.lock:
+            accept = None
+            if exclude_related:
+                user_data = self.users[current_user]
+                related = (user_data["friends"], user_data["sent_requests"], user_data["pending_requests"])
+                accept = lambda name: name != current_user and not any(name in names for names in related)
+            suggestions = self.autocomplete_index.suggest(prefix, limit, accept)
         
-        return {"status": "success", "results": sorted(results)}
+        return {"status": "success", "suggestions": suggestions}
     
     def get_user_profile(self, username):
         """Obtiene el perfil de un usuario"""
@@ -533,11 +1058,23 @@ class SocialNetworkServer:
             profile = {
                 "username": username,
                 "friends_count": len(user_data["friends"]),
-                "friends": sorted(list(user_data["friends"])),
+                "friends": user_data["friends"].to_list(),
                 "description": user_data.get("description", ""),
-                "photo_url": user_data.get("photo_url", "")
+                "photo_url": user_data.get("photo_url", ""),
+                "avatar": user_data.get("avatar", "")
             }
         
+        # Triángulos y clustering local (calculados en segundo plano)
+        clustering = self.analytics.get_result("clustering")
+        if clustering is not None and username in clustering["data"]["triangles"]:
+            profile["triangles"] = clustering["data"]["triangles"][username]
+            profile["clustering"] = round(clustering["data"]["clustering"][username], 4)
+        
+        # Comunidad detectada por propagación de etiquetas
+        communities = self.analytics.get_result("communities")
+        if communities is not None and username in communities["data"]["communities"]:
+            profile["community"] = communities["data"]["communities"][username]
+        
         return {"status": "success", "profile": profile}
     
     def update_profile(self, current_user, description, photo_url):
@@ -545,13 +1082,94 @@ class SocialNetworkServer:
         with self.lock:
             if description is not None:
                 self.users[current_user]["description"] = description
-            if photo_url is not None:
+                self.profile_index.update(current_user, description)
+            if photo_url is not None and photo_url != self.users[current_user]["photo_url"]:
+                # Una foto externa nueva reemplaza al avatar subido
                 self.users[current_user]["photo_url"] = photo_url
+                self.users[current_user]["avatar"] = ""
             self.save_data()
         
         print(f"[SERVER] Perfil actualizado: {current_user}")
         return {"status": "success", "message": "Perfil actualizado exitosamente"}
     
+    def set_avatar(self, current_user, digest):
+        """Asigna un avatar ya almacenado al usuario (reemplaza la foto externa)"""
+        with self.lock:
+            if current_user not in self.users:
+                return {"status": "error", "message": "El usuario ya no existe"}
+            self.users[current_user]["avatar"] = digest
+            self.users[current_user]["photo_url"] = ""
+            self.save_data()
+        
+        print(f"[SERVER] Avatar actualizado: {current_user}")
+        return {"status": "success", "message": "Foto de perfil actualizada", "avatar": digest}
+    
+    def begin_avatar_upload(self, current_user, size, digest):
+        """
+        Inicia la subida de un avatar. Si el contenido (por su SHA-256) ya está
+        almacenado se asigna directamente y no hace falta enviar los bytes.
+        """
+        try:
+            upload_id = self.avatars.begin(current_user, size, digest)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        if upload_id is None:
+            response = self.set_avatar(current_user, digest)
+            response["deduplicated"] = True
+            return response
+        return {"status": "success", "upload_id": upload_id, "chunk_size": AVATAR_CHUNK_BYTES}
+    
+    def upload_avatar_chunk(self, current_user, upload_id, offset, data):
+        """Recibe una parte (base64) de la subida en curso"""
+        if not isinstance(data, str) or not isinstance(offset, int):
+            return {"status": "error", "message": "Parte inválida"}
+        try:
+            received = self.avatars.write_chunk(current_user, upload_id, offset,
+                                                base64.b64decode(data, validate=True))
+        except binascii.Error:
+            return {"status": "error", "message": "Parte inválida"}
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        return {"status": "success", "received": received}
+    
+    def finish_avatar_upload(self, current_user, upload_id):
+        """Cierra la subida: verifica el hash y genera las miniaturas (fuera del lock)"""
+        try:
+            digest = self.avatars.finish(current_user, upload_id)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        return self.set_avatar(current_user, digest)
+    
+    def get_avatar(self, username, size=150, if_version=None):
+        """
+        Miniatura PNG (base64) del avatar de un usuario. La versión es el hash
+        del contenido: con if_version igual se responde not_modified sin datos.
+        """
+        if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+            return {"status": "error", "message": "Tamaño inválido"}
+        with self.lock:
+            if username not in self.users:
+                return {"status": "error", "message": f"El usuario '{username}' no existe"}
+            digest = self.users[username]["avatar"]
+        if not digest:
+            return {"status": "error", "message": f"El usuario '{username}' no tiene avatar"}
+        
+        size = self.avatars.best_size(size)
+        if if_version == digest:
+            return {"status": "not_modified", "version": digest, "size": size}
+        try:
+            size, data = self.avatars.read_thumbnail(digest, size)
+        except OSError:
+            return {"status": "error", "message": "Avatar no disponible"}
+        return {
+            "status": "success",
+            "username": username,
+            "version": digest,
+            "size": size,
+            "format": "png",
+            "data": base64.b64encode(data).decode('ascii')
+        }
+    
     def find_path(self, from_user, to_user):
         """Busca un camino de amigos entre dos usuarios usando BFS"""
         if not from_user or not to_user:
@@ -620,22 +1238,76 @@ class SocialNetworkServer:
             users_with_max = [u for u, c in user_friends_count.items() if c == max_friends_count]
             users_with_min = [u for u, c in user_friends_count.items() if c == min_friends_count]
         
+        statistics = {
+            "max_friends_users": users_with_max,
+            "max_friends_count": max_friends_count,
+            "min_friends_users": users_with_min,
+            "min_friends_count": min_friends_count,
+            "average_friends": round(average_friends, 2),
+            "total_users": total_users,
+            "total_friendships": total_friends // 2  # Dividir entre 2 porque son bidireccionales
+        }
+        
+        # Triángulos y transitividad (cacheados por versión del grafo)
+        clustering = self.analytics.get_result("clustering")
+        if clustering is not None:
+            data = clustering["data"]
+            statistics["total_triangles"] = data["total_triangles"]
+            statistics["transitivity"] = round(data["transitivity"], 4)
+            statistics["average_clustering"] = round(data["average_clustering"], 4)
+            statistics["top_triangles"] = top_k(data["triangles"], 5)
+            statistics["clustering_version"] = clustering["version"]
+        
+        return {"status": "success", "statistics": statistics}
+    
+    def get_rankings(self, limit=10):
+        """Obtiene los rankings de influencia calculados en segundo plano"""
+        try:
+            limit = max(1, min(int(limit), 100))
+        except (TypeError, ValueError):
+            return {"status": "error", "message": "Límite inválido"}
+        
+        # El resultado ya está calculado; no se toma el lock de peticiones
+        result = self.analytics.get_result("rankings")
+        if result is None:
+            self.analytics.notify_change()
+            return {"status": "error", "message": "Los rankings aún se están calculando, intente de nuevo"}
+        
+        data = result["data"]
         return {
             "status": "success",
-            "statistics": {
-                "max_friends_users": users_with_max,
-                "max_friends_count": max_friends_count,
-                "min_friends_users": users_with_min,
-                "min_friends_count": min_friends_count,
-                "average_friends": round(average_friends, 2),
-                "total_users": total_users,
-                "total_friendships": total_friends // 2  # Dividir entre 2 porque son bidireccionales
-            }
+            "rankings": {
+                "pagerank": top_k(data["pagerank"], limit),
+                "betweenness": top_k(data["betweenness"], limit),
+                "betweenness_samples": data["betweenness_samples"]
+            },
+            "version": result["version"],
+            "current_version": self.graph_version,
+            "compute_time_ms": result["compute_time_ms"]
+        }
+    
+    def get_communities(self):
+        """Obtiene la comunidad de cada usuario (propagación de etiquetas)"""
+        result = self.analytics.get_result("communities")
+        if result is None:
+            self.analytics.notify_change()
+            return {"status": "error", "message": "Las comunidades aún se están calculando, intente de nuevo"}
+        
+        data = result["data"]
+        return {
+            "status": "success",
+            "communities": data["communities"],
+            "count": data["count"],
+            "version": result["version"],
+            "compute_time_ms": result["compute_time_ms"]
         }
     
     def stop(self):
         """Detiene el servidor"""
         self.running = False
+        self.analytics.stop()
+        self.avatars.shutdown()
+        self.request_pool.shutdown(wait=False, cancel_futures=True)
         if self.server_socket:
             self.server_socket.close()
         print("[SERVER] Servidor detenido")
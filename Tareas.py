@@ -0,0 +1,194 @@
+"""
+Ejecutor de pedidos en segundo plano para la interfaz Tk.
+Las llamadas al servidor (y el trabajo pesado que las acompaña) corren en un
+pool de hilos y devuelven futuros; los resultados vuelven al hilo de Tk por
+una cola que se drena con root.after cada ~16 ms, así la ventana sigue
+respondiendo mientras se resuelve una consulta grande.
+RenderScheduler marca vistas como desactualizadas y solo las redibuja cuando
+su pestaña está visible, juntando varias marcas seguidas en un solo cuadro.
+"""
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Hilos que atienden pedidos
+REQUEST_WORKERS = 4
+
+# Intervalo con que el hilo de Tk entrega los resultados (~60 cuadros por segundo)
+POLL_INTERVAL_MS = 16
+
+
+class Task:
+    """Pedido en curso: futuro del pool, callbacks y marca de cancelación"""
+    __slots__ = ("future", "label", "key", "on_success", "on_error", "cancelled")
+
+    def __init__(self, label, key, on_success, on_error):
+        self.future = None
+        self.label = label
+        self.key = key
+        self.on_success = on_success
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Cancela el pedido: si no empezó, no se ejecuta; si ya está en curso,
+        su resultado se descarta al llegar (el servidor igual lo responde).
+        """
+        self.cancelled = True
+        self.future.cancel()
+
+
+class RequestExecutor:
+    """
+    Pool de hilos con entrega de resultados en el hilo de Tk.
+    `on_busy(etiquetas)` se llama (en el hilo de Tk) cada vez que cambia el
+    conjunto de pedidos activos, para mostrar indicadores de carga.
+    """
+
+    def __init__(self, root, workers=REQUEST_WORKERS, on_busy=None):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pedidos")
+        self.results = queue.Queue()  # tareas terminadas, desde los hilos
+        self.active = []  # tareas enviadas y aún no entregadas, en orden
+        self.keyed = {}  # clave -> tarea más reciente con esa clave
+        self.on_busy = on_busy
+        self.polling = False
+
+    def submit(self, fn, *args, on_success=None, on_error=None, label=None, key=None):
+        """
+        Ejecuta fn(*args) en segundo plano y devuelve la tarea (con su futuro).
+        `on_success(resultado)` u `on_error(excepción)` se llaman en el hilo de Tk.
+        Con `key`, un pedido nuevo cancela al anterior con la misma clave
+        (útil para refrescos y búsquedas: solo importa el último).
+        """
+        if key is not None:
+            previous = self.keyed.get(key)
+            if previous is not None:
+                previous.cancel()
+        task = Task(label, key, on_success, on_error)
+        if key is not None:
+            self.keyed[key] = task
+        self.active.append(task)
+        task.future = self.executor.submit(fn, *args)
+        task.future.add_done_callback(lambda _: self.results.put(task))
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_INTERVAL_MS, self._drain)
+        self._notify()
+        return task
+
+    def busy_labels(self):
+        """Etiquetas de los pedidos activos no cancelados"""
+        return [task.label for task in self.active if not task.cancelled and task.label]
+
+    def _notify(self):
+        if self.on_busy is not None:
+            try:
+                self.on_busy(self.busy_labels())
+            except Exception:
+                pass  # el indicador ya no existe
+
+    def _deliver(self, task):
+        """Llama al callback de una tarea terminada (en el hilo de Tk)"""
+        if task.cancelled or task.future.cancelled():
+            return
+        error = task.future.exception()
+        try:
+            if error is None:
+                if task.on_success is not None:
+                    task.on_success(task.future.result())
+            elif task.on_error is not None:
+                task.on_error(error)
+            else:
+                print(f"[CLIENTE] Error en '{task.label}': {error}")
+        except Exception:
+            # Un callback con errores no debe detener la entrega de los demás
+            traceback.print_exc()
+
+    def _drain(self):
+        delivered = False
+        while True:
+            try:
+                task = self.results.get_nowait()
+            except queue.Empty:
+                break
+            delivered = True
+            self.active.remove(task)
+            if task.key is not None and self.keyed.get(task.key) is task:
+                del self.keyed[task.key]
+            self._deliver(task)
+
+        if delivered:
+            self._notify()
+        if self.active:
+            self.root.after(POLL_INTERVAL_MS, self._drain)
+        else:
+            self.polling = False
+
+    def cancel_all(self):
+        """Cancela todos los pedidos activos (p. ej. al cerrar sesión)"""
+        for task in self.active:
+            task.cancel()
+        self.keyed.clear()
+        self._notify()
+
+    def shutdown(self):
+        """Cancela lo pendiente y detiene el pool sin esperar"""
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderScheduler:
+    """
+    Vistas con marca de "sucia" asociadas a una pestaña de un ttk.Notebook.
+    `invalidate` solo marca; el redibujo ocurre en el siguiente cuadro y
+    únicamente para las vistas de la pestaña visible (o sin pestaña). Las
+    demás se redibujan al seleccionar su pestaña.
+    """
+
+    def __init__(self, root, notebook):
+        self.root = root
+        self.notebook = notebook
+        self.views = {}  # nombre -> (función de dibujo, pestaña o None)
+        self.dirty = set()
+        self.job = None  # cuadro programado con root.after
+        notebook.bind('<<NotebookTabChanged>>', lambda e: self.schedule(), add='+')
+
+    def register(self, name, render, tab=None):
+        """Agrega una vista; empieza sucia para dibujarse la primera vez que se vea"""
+        self.views[name] = (render, tab)
+        self.dirty.add(name)
+        self.schedule()
+
+    def invalidate(self, *names):
+        """Marca vistas como desactualizadas y programa un cuadro"""
+        self.dirty.update(names)
+        self.schedule()
+
+    def schedule(self):
+        if self.job is None and self.dirty:
+            self.job = self.root.after(POLL_INTERVAL_MS, self.flush)
+
+    def flush(self):
+        """Dibuja las vistas sucias visibles; el resto espera a su pestaña"""
+        self.job = None
+        try:
+            current = self.notebook.select()
+        except Exception:
+            return  # la ventana ya se cerró
+        for name in [name for name in self.views if name in self.dirty]:
+            render, tab = self.views[name]
+            if tab is not None and str(tab) != current:
+                continue
+            self.dirty.discard(name)
+            try:
+                render()
+            except Exception:
+                traceback.print_exc()
+
+    def cancel(self):
+        """Descarta el cuadro programado (al cerrar la ventana)"""
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
@@ -0,0 +1,533 @@
+"""
+Benchmarks de las estructuras de datos de la red social.
+Uso: python benchmarks.py [nombre ...]   (sin argumentos ejecuta todos)
+"""
+import sys
+import time
+import random
+import tracemalloc
+
+from Grafo import SocialNetwork, CompactSocialNetwork, SortedNameSet
+from Busqueda import TrigramIndex, IncrementalFilter, AutocompleteTrie, FuzzyIndex, ProfileIndex, edit_distance
+
+FIRST_NAMES = ["Ana", "Carlos", "Christian", "Diana", "Elena", "Fernando", "Gabriel", "Lucía",
+               "Luis", "María", "Pedro", "Roberto", "Sofía", "José", "Valeria", "Andrés"]
+DESCRIPTION_WORDS = ["me", "gusta", "la", "música", "fútbol", "programación", "cocina", "viajar", "leer",
+                     "libros", "película", "cine", "montaña", "playa", "café", "estudiante", "ingeniería",
+                     "computación", "fotografía", "guitarra", "piano", "correr", "ciclismo", "natación",
+                     "perros", "gatos", "arte", "diseño", "python", "datos", "matemáticas", "química",
+                     "historia", "idiomas", "inglés", "español", "teatro", "baile", "videojuegos", "anime",
+                     "y", "de", "en", "los", "con", "para", "mi", "el", "una", "muy", "también", "todos"]
+LAST_NAMES = ["Vargas", "López", "García", "Sánchez", "Martínez", "Ruiz", "Torres", "Gómez",
+              "Cruz", "Ramírez", "Díaz", "Mora", "Jiménez", "Rojas", "Castro", "Solís"]
+
+
+def merge_sort(arr):
+    """Merge Sort que usaba el servidor para ordenar amigos (referencia de comparación)"""
+    if len(arr) <= 1:
+        return arr
+    
+    # Dividir el array en dos mitades
+    mid = len(arr) // 2
+    left_half = arr[:mid]
+    right_half = arr[mid:]
+    
+    # Recursivamente ordenar ambas mitades
+    left_sorted = merge_sort(left_half)
+    right_sorted = merge_sort(right_half)
+    
+    # Combinar las mitades ordenadas
+    return merge(left_sorted, right_sorted)
+
+
+def merge(left, right):
+    """Combina dos listas ordenadas en una sola lista ordenada"""
+    result = []
+    i = j = 0
+    
+    # Comparar elementos y agregar el menor
+    while i < len(left) and j < len(right):
+        if left[i].lower() <= right[j].lower():  # Comparación case-insensitive
+            result.append(left[i])
+            i += 1
+        else:
+            result.append(right[j])
+            j += 1
+    
+    # Agregar elementos restantes
+    result.extend(left[i:])
+    result.extend(right[j:])
+    
+    return result
+
+
+def random_graph(num_users, avg_degree, seed=42):
+    """Genera nombres y aristas aleatorias (sin duplicados) para las pruebas"""
+    rng = random.Random(seed)
+    names = [f"usuario_{i:07d}" for i in range(num_users)]
+    target = num_users * avg_degree // 2
+    edges = set()
+    while len(edges) < target:
+        a = rng.randrange(num_users)
+        b = rng.randrange(num_users)
+        if a != b:
+            edges.add((min(a, b), max(a, b)))
+    return names, list(edges)
+
+
+def measure_memory(build):
+    """Ejecuta build() y devuelve (resultado, bytes asignados que siguen vivos)"""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def random_usernames(count, seed=11):
+    """Nombres de usuario realistas y únicos: 'Nombre Apellido Apellido123'"""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} "
+                  f"{rng.choice(LAST_NAMES)}{rng.randrange(100_000)}")
+    return list(names)
+
+
+def build_network(network_class, names, edges):
+    """Construye una red con los nombres y aristas dados"""
+    network = network_class(verbose=False)
+    for name in names:
+        network.add_user(name)
+    for a, b in edges:
+        network.add_friendship(names[a], names[b])
+    return network
+
+
+# ==================== BENCHMARKS ====================
+def bench_sorted_friends(num_friends=10_000, repeat=20):
+    """Lista de amigos ordenada: merge_sort en cada lectura vs contenedor ya ordenado"""
+    print(f"\n=== Lista de amigos ordenada ({num_friends} amigos) ===")
+    names = random_usernames(num_friends)
+    friends_set = set(names)
+    friends_sorted = SortedNameSet(names)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        baseline = merge_sort(list(friends_set))
+    merge_ms = (time.perf_counter() - start) / repeat * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        presorted = friends_sorted.to_list()
+    read_ms = (time.perf_counter() - start) / repeat * 1000
+    assert [n.lower() for n in presorted] == [n.lower() for n in baseline]
+    print(f"Lectura   merge_sort: {merge_ms:8.3f} ms   SortedNameSet: {read_ms:8.3f} ms")
+
+    extra = random_usernames(num_friends + 1_000, seed=99)[-1_000:]
+    start = time.perf_counter()
+    for name in extra:
+        friends_sorted.add(name)
+    for name in extra:
+        friends_sorted.discard(name)
+    update_us = (time.perf_counter() - start) / (2 * len(extra)) * 1e6
+    print(f"Alta/baja de un amigo en SortedNameSet: {update_us:.2f} µs")
+
+
+def bench_memory_per_edge(num_users=100_000, avg_degree=20):
+    """Memoria por arista: dict de sets vs IDs enteros con array('I') y CSR"""
+    print(f"\n=== Memoria por arista ({num_users} usuarios, grado medio {avg_degree}) ===")
+    names, edges = random_graph(num_users, avg_degree)
+    # Los nombres ya existen en ambos casos; solo se mide la estructura
+    num_edges = len(edges)
+
+    for label, network_class, freeze in (
+        ("SocialNetwork (dict de sets)", SocialNetwork, False),
+        ("CompactSocialNetwork (array('I'))", CompactSocialNetwork, False),
+        ("CompactSocialNetwork (CSR congelado)", CompactSocialNetwork, True),
+    ):
+        def build():
+            network = build_network(network_class, names, edges)
+            if freeze:
+                network.freeze()
+            return network
+
+        start = time.perf_counter()
+        network, used = measure_memory(build)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<40} {used / num_edges:8.1f} bytes/arista   "
+              f"({used / 1e6:8.1f} MB, construcción {elapsed:.2f} s)")
+        del network
+
+
+def bench_mutual_friends(num_users=300_000, repeat=5):
+    """Amigos en común con distintos sesgos de grado: motor vs set.intersection"""
+    print(f"\n=== Amigos en común ({num_users} usuarios) ===")
+    rng = random.Random(7)
+    names = [f"usuario_{i:07d}" for i in range(num_users)]
+    pairs = {
+        "pequeño-pequeño (50 / 80)": (50, 80),
+        "mediano-mediano (2k / 3k)": (2_000, 3_000),
+        "pequeño-hub (40 / 100k)": (40, 100_000),
+        "hub-hub (100k / 120k)": (100_000, 120_000),
+    }
+
+    compact = CompactSocialNetwork(verbose=False)
+    for name in names:
+        compact.add_user(name)
+    string_sets = {}
+    for label, (degree_a, degree_b) in pairs.items():
+        a, b = f"a:{label}", f"b:{label}"
+        for user, degree in ((a, degree_a), (b, degree_b)):
+            compact.add_user(user)
+            friends = sorted(rng.sample(range(num_users), degree))
+            # Construcción directa de la lista ordenada (evita inserciones una a una)
+            compact.adjacency[compact.ids[user]].extend(friends)
+            string_sets[user] = {names[f] for f in friends}
+
+    engine = compact.mutual_engine
+    for label in pairs:
+        a, b = f"a:{label}", f"b:{label}"
+        uid_a, uid_b = compact.ids[a], compact.ids[b]
+        degrees = sorted((compact.degree(uid_a), compact.degree(uid_b)))
+        strategy = engine.strategy(*degrees)
+        count_strategy = engine.strategy(*degrees, count_only=True)
+
+        expected = string_sets[a].intersection(string_sets[b])
+        assert sorted(names[f] for f in engine.mutual_ids(uid_a, uid_b)) == sorted(expected)
+        assert engine.mutual_ids(uid_a, uid_b, count_only=True) == len(expected)
+
+        row_a, row_b = compact.neighbor_ids(uid_a), compact.neighbor_ids(uid_b)
+        timings = {}
+        for name, run in (
+            # Sets de nombres ya construidos: lo que usa el servidor
+            ("set (nombres)", lambda: list(string_sets[a].intersection(string_sets[b]))),
+            # Set armado desde las listas de IDs: la alternativa sin estrategias
+            ("set (IDs)", lambda: list(set(row_a).intersection(row_b))),
+            ("motor (lista)", lambda: engine.mutual_ids(uid_a, uid_b)),
+            ("motor (conteo)", lambda: engine.mutual_ids(uid_a, uid_b, count_only=True)),
+        ):
+            run()  # calentar (caché de bitmaps)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                run()
+            timings[name] = (time.perf_counter() - start) / repeat * 1000
+
+        summary = "   ".join(f"{name}: {ms:8.3f} ms" for name, ms in timings.items())
+        print(f"{label:<28} [{strategy}/{count_strategy}] {summary}")
+
+        # Cada estrategia distinta del set tiene que ganarle a la intersección de sets
+        if strategy != "hash":
+            assert timings["motor (lista)"] < timings["set (IDs)"], strategy
+        if strategy == "intersect1d":
+            assert timings["motor (lista)"] < timings["set (nombres)"], strategy
+        if count_strategy == "bitmap":
+            assert timings["motor (conteo)"] < timings["set (nombres)"], count_strategy
+
+
+def bench_trigram_search(num_users=1_000_000, limit=50):
+    """Búsqueda por subcadena: índice de trigramas vs recorrido lineal"""
+    print(f"\n=== Búsqueda por subcadena ({num_users} usuarios) ===")
+    names = random_usernames(num_users)
+
+    start = time.perf_counter()
+    index, used = measure_memory(lambda: TrigramIndex(names))
+    print(f"Construcción del índice: {time.perf_counter() - start:.2f} s, "
+          f"{used / 1e6:.1f} MB ({len(index.postings)} trigramas)")
+
+    for query in ("maría", "sánchez gó", "rojas4213", "ruiz mora12", "xyz"):
+        start = time.perf_counter()
+        linear = sorted(u for u in names if query in u.lower())[:limit]
+        linear_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        results = index.search(query, limit)
+        index_ms = (time.perf_counter() - start) * 1000
+        print(f"'{query:<12}' lineal: {linear_ms:8.2f} ms   índice: {index_ms:8.2f} ms   "
+              f"({len(results)} resultados)")
+        assert len(results) == len(linear)
+
+
+def bench_typing_filter(num_users=100_000, word="maría sánchez"):
+    """Filtro de la lista de usuarios al escribir: consulta completa vs incremental"""
+    print(f"\n=== Filtro al escribir ({num_users} usuarios) ===")
+    names = random_usernames(num_users)
+    index = TrigramIndex(names)
+    incremental = IncrementalFilter(index)
+
+    for length in range(1, len(word) + 1):
+        query = word[:length]
+        start = time.perf_counter()
+        full = index.search(query, limit=None)
+        full_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        results = incremental.search(query)
+        incremental_ms = (time.perf_counter() - start) * 1000
+        print(f"'{query:<14}' completa: {full_ms:8.2f} ms   incremental: {incremental_ms:8.2f} ms   "
+              f"({len(results)} resultados)")
+        assert results == full
+
+
+def bench_autocomplete(num_users=1_000_000, repeat=1_000):
+    """Autocompletado por prefijo: trie con los k mejores por nodo vs recorrido lineal"""
+    print(f"\n=== Autocompletado ({num_users} usuarios) ===")
+    rng = random.Random(3)
+    names = random_usernames(num_users)
+    degrees = {name: rng.randrange(500) for name in names}
+
+    start = time.perf_counter()
+    trie, used = measure_memory(lambda: AutocompleteTrie(degrees))
+    print(f"Construcción del trie: {time.perf_counter() - start:.2f} s, {used / 1e6:.1f} MB")
+
+    for prefix in ("m", "ma", "mar", "maría ló", "vargas", "sofía solís rojas12"):
+        start = time.perf_counter()
+        folded = prefix.casefold()
+        linear = sorted((u for u in names if any(k.startswith(folded) for k in AutocompleteTrie._keys(u))),
+                        key=lambda u: (-degrees[u], u))[:10]
+        linear_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results = trie.suggest(prefix, 10)
+        trie_us = (time.perf_counter() - start) / repeat * 1e6
+        print(f"'{prefix:<20}' lineal: {linear_ms:9.2f} ms   trie: {trie_us:8.1f} µs por tecla")
+        assert results == linear
+
+    start = time.perf_counter()
+    for name in rng.sample(names, repeat):
+        degrees[name] += 1
+        trie.update_score(name, degrees[name])
+    print(f"Actualización de grado: {(time.perf_counter() - start) / repeat * 1e6:.1f} µs")
+
+    # Sugerencias para enviar solicitudes: se excluyen los amigos (aquí los
+    # 2000 más populares, que llenan todas las cachés de los prefijos cortos)
+    friends = set(sorted(names, key=lambda u: (-degrees[u], u))[:2_000])
+    for prefix in ("m", "mar", "vargas"):
+        folded = prefix.casefold()
+        linear = sorted((u for u in names if u not in friends
+                         and any(k.startswith(folded) for k in AutocompleteTrie._keys(u))),
+                        key=lambda u: (-degrees[u], u))[:10]
+        start = time.perf_counter()
+        for _ in range(100):
+            results = trie.suggest(prefix, 10, accept=lambda u: u not in friends)
+        print(f"'{prefix:<20}' sin {len(friends)} amigos: {(time.perf_counter() - start) / 100 * 1e6:8.1f} µs")
+        assert results == linear
+
+    check_autocomplete_updates()
+
+
+def check_autocomplete_updates(trials=3_000, steps=20, seed=5):
+    """
+    Prueba aleatoria del trie contra un orden por fuerza bruta: redes chicas
+    de nombres con pocas letras (muchas claves por usuario y ancestros
+    compartidos) con altas, bajas y cambios de grado, con y sin filtro.
+    """
+    rng = random.Random(seed)
+    for _ in range(trials):
+        pool = sorted({" ".join("".join(rng.choice("ab") for _ in range(rng.randint(1, 3)))
+                                for _ in range(rng.randint(1, 2))) for _ in range(8)})
+        scores = {name: rng.randrange(10) for name in pool if rng.random() < 0.7}
+        trie = AutocompleteTrie(dict(scores), top_k=2)
+        prefixes = sorted({key[:i] for name in pool for key in AutocompleteTrie._keys(name)
+                           for i in range(1, len(key) + 1)})
+        for _ in range(steps):
+            name = rng.choice(pool)
+            if name in scores and rng.random() < 0.2:
+                del scores[name]
+                trie.remove(name)
+            else:
+                scores[name] = rng.randrange(10)
+                trie.add(name, scores[name])  # add de un usuario existente actualiza su grado
+            for prefix in prefixes:
+                matches = [u for u in scores if any(k.startswith(prefix) for k in AutocompleteTrie._keys(u))]
+                expected = sorted(matches, key=lambda u: (-scores[u], u))
+                excluded = set(rng.sample(pool, 3))
+                accepted = [u for u in expected if u not in excluded]
+                for limit in (2, 3):
+                    assert trie.suggest(prefix, limit) == expected[:limit], (prefix, limit)
+                    assert trie.suggest(prefix, limit, accept=lambda u: u not in excluded) == accepted[:limit]
+    print(f"Prueba aleatoria de altas, bajas y cambios de grado: {trials} redes correctas")
+
+
+def bench_fuzzy_search(num_users=1_000_000, repeat=20, linear_sample=50_000):
+    """Búsqueda difusa: índice de borrados (SymSpell) vs distancia contra cada nombre"""
+    print(f"\n=== Búsqueda difusa ({num_users} usuarios) ===")
+    names = random_usernames(num_users)
+
+    start = time.perf_counter()
+    index, used = measure_memory(lambda: FuzzyIndex(names))
+    print(f"Construcción del índice: {time.perf_counter() - start:.2f} s, {used / 1e6:.1f} MB "
+          f"({len(index.words)} palabras, {len(index.variants)} variantes)")
+
+    def linear_distance(words, name):
+        # Misma semántica que el índice: letras con distancia de edición, números exactos
+        name_words = FuzzyIndex.tokenize(name)
+        total = 0
+        for word in words:
+            if word.isdigit():
+                total += 0 if word in name_words else 3
+            else:
+                total += min((edit_distance(word, x, 2) for x in name_words if not x.isdigit()), default=3)
+        return total
+
+    for query in ("garsia", "maria garsia", "sofya rojaz", "vargs", "castro 1234"):
+        words = FuzzyIndex.tokenize(query)
+        # El recorrido lineal se mide sobre una muestra y se extrapola
+        start = time.perf_counter()
+        for name in names[:linear_sample]:
+            linear_distance(words, name)
+        linear_ms = (time.perf_counter() - start) * 1000 * num_users / linear_sample
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results = index.search(query, 2, limit=50)
+        index_ms = (time.perf_counter() - start) / repeat * 1000
+        expected = sorted((linear_distance(words, name), name) for name, _ in results)
+        assert [(n, d) for d, n in expected] == sorted(results, key=lambda r: (r[1], r[0]))
+        # Exhaustividad: en la muestra, todo nombre a distancia <= 2 debe aparecer
+        sample = names[:linear_sample]
+        in_sample = set(sample)
+        found = {name: d for name, d in index.search(query, 2, limit=num_users) if name in in_sample}
+        linear = {name: d for name in sample if (d := linear_distance(words, name)) <= 2}
+        assert found == linear, query
+        print(f"'{query:<14}' lineal (estimado): {linear_ms:9.1f} ms   índice: {index_ms:8.2f} ms   "
+              f"({len(results)} resultados)")
+
+    # Nombres con números: el primer usuario con un número también se indexa bajo él
+    small = FuzzyIndex(["Ana Lopez 123"])
+    assert small.words["123"] == {"Ana Lopez 123"}
+    assert small.search("ana lopez 123") == [("Ana Lopez 123", 0)]
+    assert small.search("ana lopes 123") == [("Ana Lopez 123", 1)]
+
+
+def bench_profile_search(num_users=200_000, repeat=20):
+    """Búsqueda en descripciones: índice invertido con BM25 vs recorrer todos los perfiles"""
+    print(f"\n=== Búsqueda en perfiles ({num_users} perfiles) ===")
+    rng = random.Random(5)
+    # Distribución sesgada de palabras (las primeras son mucho más frecuentes)
+    weights = [1 / (rank + 1) for rank in range(len(DESCRIPTION_WORDS))]
+    descriptions = {f"usuario_{i:07d}": " ".join(rng.choices(DESCRIPTION_WORDS, weights, k=rng.randrange(5, 30)))
+                    for i in range(num_users)}
+
+    start = time.perf_counter()
+    index, used = measure_memory(lambda: ProfileIndex(descriptions))
+    print(f"Construcción del índice: {time.perf_counter() - start:.2f} s, {used / 1e6:.1f} MB "
+          f"({len(index.postings)} términos)")
+
+    for query in ("fotografia", "música cine", "programación python datos", "futbol", "astronomía"):
+        terms = set(ProfileIndex.tokenize(query))
+        start = time.perf_counter()
+        linear = sum(1 for text in descriptions.values() if terms & set(ProfileIndex.tokenize(text)))
+        linear_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            total, page = index.search(query, 0, 20)
+        index_ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"'{query:<26}' lineal: {linear_ms:9.1f} ms   índice: {index_ms:8.2f} ms   ({total} perfiles)")
+        assert total == linear
+
+    start = time.perf_counter()
+    for username in rng.sample(list(descriptions), 1_000):
+        index.update(username, " ".join(rng.choices(DESCRIPTION_WORDS, k=15)))
+    print(f"Actualización incremental: {(time.perf_counter() - start) / 1_000 * 1e6:.1f} µs por perfil")
+
+
+def bench_response_cache(num_users=50_000, avg_degree=20, repeat=20):
+    """Lecturas frecuentes: construir y serializar cada vez vs bytes cacheados por versión"""
+    from Server import SocialNetworkServer, encode_message
+
+    print(f"\n=== Caché de respuestas ({num_users} usuarios, grado medio {avg_degree}) ===")
+    names, edges = random_graph(num_users, avg_degree)
+    server = SocialNetworkServer()
+    server.users = {}  # ignorar el archivo de datos local si existe
+    for name in names:
+        server.users[name] = {"password_hash": "", "friends": SortedNameSet(), "pending_requests": SortedNameSet(),
+                              "sent_requests": SortedNameSet(), "description": "", "photo_url": ""}
+    for a, b in edges:
+        server.users[names[a]]["friends"].add(names[b])
+        server.users[names[b]]["friends"].add(names[a])
+    server.usernames = SortedNameSet(names)
+    server.logged_in_users[("bench", 0)] = names[0]
+
+    for action in ("get_network", "get_all_users", "get_statistics"):
+        request = {"action": action}
+        start = time.perf_counter()
+        for _ in range(repeat):
+            encode_message(server.process_request(request, ("bench", 0)))
+        build_ms = (time.perf_counter() - start) / repeat * 1000
+        server.respond(request, ("bench", 0))  # llenar la caché
+        start = time.perf_counter()
+        for _ in range(repeat):
+            payload = server.respond(request, ("bench", 0))
+        cached_ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"{action:<16} sin caché: {build_ms:8.2f} ms   "
+              f"con caché: {cached_ms:8.3f} ms   ({len(payload) / 1e6:.1f} MB)")
+    print(f"Contadores: {server.response_cache.stats()}")
+
+
+def bench_layout(num_users=20_000, avg_degree=6, repeat=3):
+    """Disposición por fuerzas: repulsión exacta vs Barnes-Hut, y caché por versión"""
+    from Dibujo import NUMPY_AVAILABLE, LayoutCache, exact_repulsion, barnes_hut_repulsion
+    print(f"\n=== Disposición del dibujo ({num_users} usuarios) ===")
+    if not NUMPY_AVAILABLE:
+        print("NumPy no está instalado: se omite")
+        return
+    import numpy as np
+    rng = np.random.default_rng(5)
+    sample = rng.random((2_000, 2))
+    start = time.perf_counter()
+    exact = exact_repulsion(sample, 1 / len(sample))
+    exact_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    approx = barnes_hut_repulsion(sample, 1 / len(sample))
+    approx_ms = (time.perf_counter() - start) * 1000
+    error = np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1)
+    print(f"Repulsión (2000 nodos) exacta: {exact_ms:8.2f} ms   Barnes-Hut: {approx_ms:8.2f} ms   "
+          f"(error mediano {np.median(error):.2%})")
+
+    positions = rng.random((num_users, 2))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        barnes_hut_repulsion(positions, 1 / num_users)
+    print(f"Barnes-Hut por iteración ({num_users} nodos): "
+          f"{(time.perf_counter() - start) / repeat * 1000:8.2f} ms")
+
+    names, edges = random_graph(num_users, avg_degree)
+    adjacency = {name: set() for name in names}
+    for a, b in edges:
+        adjacency[names[a]].add(names[b])
+        adjacency[names[b]].add(names[a])
+    cache = LayoutCache()
+    for label, key in (("desde cero", 1), ("versión nueva (arranque tibio)", 2), ("misma versión", 2)):
+        start = time.perf_counter()
+        cache.get(key, adjacency)
+        print(f"Disposición {label:<31}: {time.perf_counter() - start:8.2f} s")
+
+
+BENCHMARKS = {
+    "amigos_ordenados": bench_sorted_friends,
+    "memoria": bench_memory_per_edge,
+    "amigos_comunes": bench_mutual_friends,
+    "busqueda": bench_trigram_search,
+    "filtro": bench_typing_filter,
+    "autocompletar": bench_autocomplete,
+    "difusa": bench_fuzzy_search,
+    "perfiles": bench_profile_search,
+    "cache_respuestas": bench_response_cache,
+    "disposicion": bench_layout,
+}
+
+
+def main():
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"Benchmark desconocido: {name}. Opciones: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()